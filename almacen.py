@@ -0,0 +1,188 @@
+"""
+Almacén persistente de trabajos y análisis
+==========================================
+Guarda en SQLite el estado de las conversiones (con el progreso por capítulo),
+el perfil de tiempos de las terminadas y los archivos analizados, para que un
+reinicio del servidor no pierda nada y los trabajos a medias puedan
+reanudarse desde el primer capítulo pendiente.
+
+De cada capítulo de un trabajo se guarda sólo su id y su título: el texto se
+vuelve a sacar del análisis (file_id y separador en los parámetros del
+trabajo) al reanudar. Los trabajos antiguos aún traen el texto en `contenido`.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+ESTADOS_PENDIENTES = ('en_cola', 'iniciando', 'convirtiendo')
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    job_id     TEXT PRIMARY KEY,
+    estado     TEXT NOT NULL,
+    datos      TEXT NOT NULL,
+    parametros TEXT NOT NULL,
+    creado     REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS capitulos_trabajo (
+    job_id    TEXT NOT NULL,
+    orden     INTEGER NOT NULL,
+    cap_id    INTEGER NOT NULL,
+    titulo    TEXT NOT NULL,
+    contenido TEXT NOT NULL DEFAULT '',
+    hecho     INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, orden)
+);
+CREATE TABLE IF NOT EXISTS perfiles (
+    job_id TEXT PRIMARY KEY,
+    datos  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS analisis (
+    file_id   TEXT PRIMARY KEY,
+    ruta      TEXT NOT NULL,
+    nombre    TEXT NOT NULL,
+    separador TEXT,
+    creado    REAL NOT NULL
+);
+"""
+
+
+class Almacen:
+    """Acceso a la base SQLite, seguro entre hilos."""
+
+    def __init__(self, ruta):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(ruta), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_ESQUEMA)
+
+    # --- Trabajos ---
+
+    def crear_trabajo(self, job_id, datos, parametros, capitulos):
+        """Registra un trabajo nuevo junto con los capítulos (id y título) que debe convertir."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO trabajos (job_id, estado, datos, parametros, creado) VALUES (?, ?, ?, ?, ?)",
+                (job_id, datos['estado'], json.dumps(datos), json.dumps(parametros), time.time())
+            )
+            self._db.executemany(
+                "INSERT INTO capitulos_trabajo (job_id, orden, cap_id, titulo, contenido) VALUES (?, ?, ?, ?, '')",
+                [(job_id, orden, c['id'], c['titulo']) for orden, c in enumerate(capitulos)]
+            )
+
+    def guardar_trabajo(self, job_id, datos):
+        """Actualiza el estado público del trabajo (sin la lista de completados)."""
+        datos = {k: v for k, v in datos.items() if k not in ('completados', 'en_curso')}
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE trabajos SET estado = ?, datos = ? WHERE job_id = ?",
+                (datos['estado'], json.dumps(datos), job_id)
+            )
+
+    def marcar_capitulo(self, job_id, cap_id):
+        """Anota un capítulo como terminado en cuanto se escribe su MP3."""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE capitulos_trabajo SET hecho = 1 WHERE job_id = ? AND cap_id = ?",
+                (job_id, cap_id)
+            )
+
+    def cargar_trabajos(self):
+        """Devuelve [(job_id, datos, parametros, completados)] de todos los trabajos."""
+        with self._lock:
+            filas = self._db.execute(
+                "SELECT job_id, datos, parametros FROM trabajos ORDER BY creado"
+            ).fetchall()
+            hechos = {}
+            for fila in self._db.execute(
+                "SELECT job_id, cap_id FROM capitulos_trabajo WHERE hecho = 1 ORDER BY orden"
+            ):
+                hechos.setdefault(fila['job_id'], []).append(fila['cap_id'])
+        return [
+            (f['job_id'], json.loads(f['datos']), json.loads(f['parametros']), hechos.get(f['job_id'], []))
+            for f in filas
+        ]
+
+    def contar_trabajos(self):
+        """{estado: número de trabajos} de todo el almacén."""
+        with self._lock:
+            filas = self._db.execute("SELECT estado, COUNT(*) AS n FROM trabajos GROUP BY estado").fetchall()
+        return {f['estado']: f['n'] for f in filas}
+
+    def obtener_trabajo(self, job_id):
+        """Estado público de un trabajo con la lista de completados, o None si no existe."""
+        with self._lock:
+            fila = self._db.execute("SELECT datos FROM trabajos WHERE job_id = ?", (job_id,)).fetchone()
+            if fila is None:
+                return None
+            hechos = [f['cap_id'] for f in self._db.execute(
+                "SELECT cap_id FROM capitulos_trabajo WHERE job_id = ? AND hecho = 1 ORDER BY orden", (job_id,)
+            )]
+        return dict(json.loads(fila['datos']), completados=hechos)
+
+    def capitulos_trabajo(self, job_id, con_contenido=True):
+        """Capítulos del trabajo en su orden original, con la marca de terminado.
+
+        Con `con_contenido`, los capítulos guardados con su texto (trabajos
+        antiguos) lo traen en 'contenido'; los demás no tienen esa clave.
+        """
+        columnas = "cap_id, titulo, contenido, hecho" if con_contenido else "cap_id, titulo, hecho"
+        with self._lock:
+            filas = self._db.execute(
+                f"SELECT {columnas} FROM capitulos_trabajo WHERE job_id = ? ORDER BY orden",
+                (job_id,)
+            ).fetchall()
+        capitulos = [{'id': f['cap_id'], 'titulo': f['titulo'], 'hecho': bool(f['hecho'])} for f in filas]
+        if con_contenido:
+            for cap, f in zip(capitulos, filas):
+                if f['contenido']:
+                    cap['contenido'] = f['contenido']
+        return capitulos
+
+    def parametros_trabajo(self, job_id):
+        with self._lock:
+            fila = self._db.execute("SELECT parametros FROM trabajos WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(fila['parametros']) if fila else None
+
+    def capitulo_trabajo(self, job_id, cap_id):
+        """Título y marca de terminado de un capítulo del trabajo, sin su contenido."""
+        with self._lock:
+            fila = self._db.execute(
+                "SELECT cap_id, titulo, hecho FROM capitulos_trabajo WHERE job_id = ? AND cap_id = ?",
+                (job_id, cap_id)
+            ).fetchone()
+        return {'id': fila['cap_id'], 'titulo': fila['titulo'], 'hecho': bool(fila['hecho'])} if fila else None
+
+    # --- Perfiles ---
+
+    def guardar_perfil(self, job_id, resumen):
+        """Guarda el resumen final del perfil de un trabajo (ver perfil.py)."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO perfiles (job_id, datos) VALUES (?, ?)", (job_id, json.dumps(resumen))
+            )
+
+    def obtener_perfil(self, job_id):
+        with self._lock:
+            fila = self._db.execute("SELECT datos FROM perfiles WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(fila['datos']) if fila else None
+
+    # --- Análisis ---
+
+    def guardar_analisis(self, file_id, ruta, nombre, separador=None):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO analisis (file_id, ruta, nombre, separador, creado) VALUES (?, ?, ?, ?, ?)",
+                (file_id, str(ruta), nombre, separador, time.time())
+            )
+
+    def obtener_analisis(self, file_id):
+        with self._lock:
+            fila = self._db.execute(
+                "SELECT ruta, nombre, separador FROM analisis WHERE file_id = ?", (file_id,)
+            ).fetchone()
+        return dict(fila) if fila else None
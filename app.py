@@ -7,17 +7,41 @@ Soporta: TXT, PDF, EPUB
 """
 
 import asyncio
+import json
 import os
 import re
-import subprocess
 import threading
+import time
 import uuid
+from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
+from urllib.parse import quote
 
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, g, render_template, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 
+from almacen import Almacen, ESTADOS_PENDIENTES
+from bucle import BucleCompartido, FlujoAsync
+from cache_analisis import CacheAnalisis
+from cache_audio import CacheAudio
+from catalogo_voces import CatalogoVoces
+from emision import Emisiones
+from empaquetado import zip_en_flujo
+from eventos import BusEventos
+from exportacion import ErrorExportacion, exportar_mp3
+import extraccion
+from indice_capitulos import IndiceCapitulos, respuesta_capitulos
+from limitador import LimitadorAdaptativo
+from metricas import TIPO_CONTENIDO, Registro, uso_disco
+from muestras import GeneradorMuestras
+from normalizacion import normalizar, idioma_de_voz
+from perfil import PerfilTrabajo
+from planificador import Planificador
+from sintetizadores import crear_sintetizador
+from sintesis import sintetizar_archivo
+
 try:
     import edge_tts
 except ImportError:
@@ -29,14 +53,138 @@ CORS(app)
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max
 app.config['UPLOAD_FOLDER'] = Path(__file__).parent / 'uploads'
 app.config['OUTPUT_FOLDER'] = Path(__file__).parent / 'output'
+app.config['CACHE_FOLDER'] = Path(__file__).parent / 'cache'
+app.config['DB_PATH'] = Path(__file__).parent / 'voco.db'
+app.config['ANALYSIS_FOLDER'] = app.config['UPLOAD_FOLDER'] / 'analisis'
+app.config['PDF_WORKERS'] = os.cpu_count() or 1  # Procesos para extraer PDFs grandes
+app.config['MAX_TRABAJOS'] = 3    # Trabajos convirtiendo a la vez; el resto espera en cola
+app.config['MAX_CAPITULOS'] = 8   # Capítulos en síntesis a la vez entre todos los trabajos
+app.config['TERMINADOS_EN_MEMORIA'] = 200  # Trabajos terminados en memoria; los anteriores se leen del almacén
+# Motor de síntesis: 'edge', u 'offline[:opciones]' para pruebas de carga (ver sintetizadores.py)
+app.config['SINTETIZADOR'] = os.environ.get('VOCO_SINTETIZADOR', 'edge')
+# Idiomas o locales cuyas muestras de voz se generan al arrancar (vacío: ninguno)
+app.config['PRECALENTAR_MUESTRAS'] = [
+    i for i in os.environ.get('VOCO_PRECALENTAR', 'es-ES,es-MX,es-US').split(',') if i.strip()
+]
 
 # Crear carpetas necesarias
 app.config['UPLOAD_FOLDER'].mkdir(exist_ok=True)
 app.config['OUTPUT_FOLDER'].mkdir(exist_ok=True)
 
-# Estado de las conversiones y archivos analizados
+# Estado de las conversiones (copia en memoria del almacén): los trabajos
+# pendientes y los últimos terminados; los demás se consultan con _trabajo()
 conversiones = {}
-archivos_analizados = {}
+terminados = deque()  # job_id de los trabajos terminados en memoria, del más antiguo al último
+
+# Progreso de los análisis en curso, por el 'progreso_id' que envía el cliente
+progreso_analisis = {}
+
+# Archivos analizados: memoria acotada por bytes y antigüedad, el resto se vuelca a disco
+archivos_analizados = CacheAnalisis(
+    app.config['ANALYSIS_FOLDER'],
+    dividir=lambda info: dividir_analisis(info, info.get('separador'))
+)
+
+# Persistencia en SQLite para sobrevivir a reinicios
+almacen = Almacen(app.config['DB_PATH'])
+
+# Event loop único para la síntesis, los trabajos y los flujos que esperan
+# datos; con asgi.py es el del propio servidor
+bucle = BucleCompartido()
+
+# Cambios de progreso de los trabajos, para los flujos SSE de /eventos
+eventos = BusEventos()
+ESTADOS_FINALES = ('completado', 'error')
+ESPERA_SSE = 15  # Segundos entre comentarios de keep-alive en un flujo SSE
+
+# Línea de tiempo por capítulo de cada trabajo, para /estado/<job_id>/perfil.
+# Al terminar se guarda su resumen en el almacén y sale de aquí con el trabajo.
+perfiles = {}
+
+
+def _al_pausar(pausado):
+    # Las pausas del limitador afectan a todos los trabajos: evento global y
+    # anotación en el perfil de cada trabajo que está convirtiendo
+    eventos.publicar(None, 'pausa' if pausado else 'reanudacion', {'limitador': limitador.estado()})
+    for job_id, perfil in list(perfiles.items()):
+        if conversiones.get(job_id, {}).get('estado') == 'convirtiendo':
+            perfil.pausa(pausado)
+
+
+# Limitador compartido por todas las llamadas de síntesis (trabajos y muestras)
+limitador = LimitadorAdaptativo(al_pausar=_al_pausar)
+
+# Cola global de trabajos y reparto justo de capítulos entre clientes
+planificador = Planificador(app.config['MAX_TRABAJOS'], app.config['MAX_CAPITULOS'])
+
+# Motor de síntesis de capítulos y muestras; el de Edge reutiliza sus conexiones
+sintetizador = crear_sintetizador(app.config['SINTETIZADOR'])
+
+# Audio ya sintetizado, compartido con la CLI (misma carpeta). Cada motor
+# tiene su propio formato en la clave, así que el audio offline no se mezcla.
+cache_audio = CacheAudio(app.config['CACHE_FOLDER'], formato=sintetizador.formato)
+
+# Audio de los capítulos que se están sintetizando, por (job_id, cap_id)
+emisiones = Emisiones()
+
+# Capítulos pedidos por un oyente, que cada trabajo lanza antes que el resto.
+# La cola de un trabajo existe desde que se encola hasta que termina.
+capitulos_prioritarios = {}
+ESPERA_ESCUCHA = 10      # Segundos que /escuchar retiene la petición a que empiece el capítulo
+REINTENTO_ESCUCHA = 5    # Retry-After del 202 cuando aún no ha empezado
+
+# --- Métricas para /metrics (formato Prometheus) ---
+
+metricas = Registro()
+metrica_peticiones = metricas.histograma(
+    'voco_peticion_segundos', 'Tiempo de respuesta por ruta (hasta el inicio del cuerpo)',
+    ('metodo', 'ruta', 'codigo'))
+metrica_extraccion = metricas.histograma(
+    'voco_extraccion_segundos', 'Tiempo de extracción del texto por formato', ('formato',),
+    (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+metrica_errores_extraccion = metricas.contador(
+    'voco_extraccion_errores_total', 'Extracciones de texto fallidas por formato', ('formato',))
+metrica_sintesis = metricas.histograma(
+    'voco_sintesis_segundos', 'Tiempo de texto_a_audio por capítulo o muestra', ('motor',),
+    (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200))
+metrica_caracteres = metricas.contador(
+    'voco_sintesis_caracteres_total', 'Caracteres convertidos a audio (su rate() da caracteres/s)', ('motor',))
+metrica_errores_sintesis = metricas.contador(
+    'voco_sintesis_errores_total', 'Llamadas a texto_a_audio fallidas por tipo de error', ('motor', 'error'))
+metrica_tts = metricas.histograma(
+    'voco_tts_segundos', 'Duración de cada llamada al motor TTS, de la conexión al último byte', ('motor',))
+metrica_primer_audio = metricas.histograma(
+    'voco_tts_primer_audio_segundos', 'Tiempo hasta el primer audio de cada llamada al motor TTS', ('motor',))
+metricas.medidor('voco_tts_reintentos_total', 'Llamadas al motor TTS reintentadas por el limitador',
+                 lambda: limitador.limitaciones, tipo='counter')
+metricas.medidor('voco_tts_tasa', 'Peticiones por segundo que permite ahora el limitador',
+                 lambda: limitador.tasa)
+metricas.medidor('voco_trabajos', 'Trabajos de conversión por estado',
+                 lambda: _trabajos_por_estado(), ('estado',))
+metricas.medidor('voco_conversiones', 'Trabajos en memoria (dict conversiones)', lambda: len(conversiones))
+metricas.medidor('voco_archivos_analizados', 'Análisis en memoria (archivos_analizados)',
+                 lambda: len(archivos_analizados))
+metricas.medidor('voco_archivos_analizados_bytes', 'Bytes que ocupan los análisis en memoria',
+                 lambda: archivos_analizados.estado()['bytes'])
+# Recorrer la carpeta de salida es caro: como mucho una vez por minuto
+metricas.medidor('voco_salida_bytes', 'Bytes en la carpeta de salida',
+                 lambda: uso_disco(app.config['OUTPUT_FOLDER'])[0], cada=60)
+
+
+def _trabajos_por_estado():
+    # Del almacén: en memoria sólo quedan los últimos terminados
+    cuenta = dict.fromkeys(('en_cola', 'convirtiendo', 'completado', 'error'), 0)
+    cuenta.update(almacen.contar_trabajos())
+    return [({'estado': estado}, n) for estado, n in cuenta.items()]
+
+
+def _medir_tts(medida):
+    metrica_tts.observar(medida['preparacion'] + medida['transmision'], motor=sintetizador.nombre)
+    if medida['primer_audio'] is not None:
+        metrica_primer_audio.observar(medida['primer_audio'], motor=sintetizador.nombre)
+
+
+sintetizador.al_medir = _medir_tts
 
 # Voces legacy (defaults para español)
 VOCES = {
@@ -46,9 +194,7 @@ VOCES = {
     "dalia": {"id": "es-MX-DaliaNeural", "nombre": "Dalia", "region": "México", "genero": "Femenino"},
 }
 
-# --- Cache de voces multi-idioma ---
-_voces_cache = None
-_idiomas_cache = None
+# --- Voces multi-idioma ---
 
 NOMBRES_IDIOMAS = {
     'af': 'Afrikáans', 'sq': 'Albanés', 'am': 'Amárico', 'ar': 'Árabe',
@@ -96,111 +242,48 @@ NOMBRES_REGIONES = {
 }
 
 
-def _obtener_voces_edge():
-    """Obtiene y cachea todas las voces de edge-tts."""
-    global _voces_cache, _idiomas_cache
-    if _voces_cache is not None:
-        return _voces_cache, _idiomas_cache
-
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        todas = loop.run_until_complete(edge_tts.list_voices())
-    finally:
-        loop.close()
-
-    # Agrupar por locale
-    por_locale = {}
-    idiomas = {}
-
-    for v in todas:
-        locale = v['Locale']
-        parts = locale.split('-')
-        lang_code = parts[0]
-        region_code = parts[1] if len(parts) >= 2 else ''
-
-        nombre_voz = v['ShortName'].split('-')[-1].replace('Neural', '')
-        region_nombre = NOMBRES_REGIONES.get(region_code, region_code)
-
-        if locale not in por_locale:
-            por_locale[locale] = []
-
-        por_locale[locale].append({
-            'id': v['ShortName'],
-            'nombre': nombre_voz,
-            'region': region_nombre,
-            'genero': 'Masculino' if v['Gender'] == 'Male' else 'Femenino',
-            'locale': locale
-        })
-
-        if lang_code not in idiomas:
-            idiomas[lang_code] = {
-                'codigo': lang_code,
-                'nombre': NOMBRES_IDIOMAS.get(lang_code, lang_code),
-                'locales': []
-            }
-
-        if locale not in [l['codigo'] for l in idiomas[lang_code]['locales']]:
-            idiomas[lang_code]['locales'].append({
-                'codigo': locale,
-                'nombre': f"{NOMBRES_IDIOMAS.get(lang_code, lang_code)} ({region_nombre})",
-                'voces_count': len(por_locale[locale])
-            })
-        else:
-            for l in idiomas[lang_code]['locales']:
-                if l['codigo'] == locale:
-                    l['voces_count'] = len(por_locale[locale])
-
-    _voces_cache = por_locale
-    _idiomas_cache = idiomas
-    return _voces_cache, _idiomas_cache
+# Catálogo de voces: copia en disco con TTL, refrescada en segundo plano.
+# Las respuestas se serializan igual que jsonify, una vez por cada lista nueva.
+catalogo_voces = CatalogoVoces(
+    app.config['CACHE_FOLDER'] / 'voces.json',
+    NOMBRES_IDIOMAS,
+    NOMBRES_REGIONES,
+    listar=lambda: bucle.ejecutar(edge_tts.list_voices()),
+    serializar=lambda datos: app.json.response(datos).get_data()
+)
 
 EXTENSIONES_PERMITIDAS = {'txt', 'pdf', 'epub'}
 
+# Capítulos sintetizándose a la vez dentro de un mismo trabajo
+CONCURRENCIA_DEFECTO = 1
+MAX_CONCURRENCIA = 8
+
 
 def archivo_permitido(nombre):
     return '.' in nombre and nombre.rsplit('.', 1)[1].lower() in EXTENSIONES_PERMITIDAS
 
 
-def extraer_texto_pdf(ruta):
+@contextmanager
+def _medir_extraccion(ruta):
+    formato = Path(ruta).suffix.lower().lstrip('.') or 'txt'
     try:
-        from PyPDF2 import PdfReader
-        reader = PdfReader(ruta)
-        return ''.join(p.extract_text() or '' for p in reader.pages)
-    except ImportError:
-        raise Exception("PyPDF2 no instalado")
-
+        with metrica_extraccion.medir(formato=formato):
+            yield
+    except Exception:
+        metrica_errores_extraccion.inc(formato=formato)
+        raise
 
-def extraer_texto_epub(ruta):
-    """Extrae texto de EPUB usando pandoc."""
-    try:
-        result = subprocess.run(
-            ['pandoc', str(ruta), '-t', 'plain', '--wrap=none'],
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-        if result.returncode == 0:
-            return result.stdout
-        else:
-            raise Exception(f"Error pandoc: {result.stderr}")
-    except FileNotFoundError:
-        raise Exception("Pandoc no instalado. Ejecuta: sudo apt install pandoc")
-    except subprocess.TimeoutExpired:
-        raise Exception("Timeout al procesar EPUB")
 
+def leer_libro(ruta, progreso=None):
+    """Devuelve (texto, secciones) del libro; ver extraccion.leer_libro.
 
-def leer_archivo(ruta):
-    ruta = Path(ruta)
-    ext = ruta.suffix.lower()
-    
-    if ext == '.pdf':
-        return extraer_texto_pdf(str(ruta))
-    elif ext == '.epub':
-        return extraer_texto_epub(str(ruta))
-    else:  # .txt
-        with open(ruta, 'r', encoding='utf-8') as f:
-            return f.read()
+    Los PDF se reparten entre PDF_WORKERS procesos.
+    """
+    with _medir_extraccion(ruta):
+        try:
+            return extraccion.leer_libro(ruta, app.config['PDF_WORKERS'], progreso)
+        except ImportError:
+            raise Exception("PyPDF2 no instalado")
 
 
 def dividir_por_capitulos(texto, separador_custom=None):
@@ -208,116 +291,329 @@ def dividir_por_capitulos(texto, separador_custom=None):
     
     Patrones por defecto: CAPÍTULO X, CAPITULO X, Chapter X, Parte X, etc.
     Si se proporciona separador_custom, se usa ese como patrón de división.
+    Los análisis usan directamente su IndiceCapitulos para no copiar el texto.
     """
-    if separador_custom and separador_custom.strip():
-        sep = separador_custom.strip()
-        # Escapar para regex y capturar el separador
-        patron = f'({re.escape(sep)})'
-        matches = list(re.finditer(patron, texto))
-    else:
-        # Patrones predeterminados ampliados
-        patron = r'(CAP[IÍ]TULO\s+\d+|CHAPTER\s+\d+|PARTE\s+\d+|SECCI[OÓ]N\s+\d+|Cap[ií]tulo\s+\d+|Chapter\s+\d+|Parte\s+\d+)'
-        matches = list(re.finditer(patron, texto, re.IGNORECASE))
-    
-    if not matches:
-        # Si no hay capítulos, dividir en chunks de ~5000 caracteres
-        chunks = []
-        texto_limpio = texto.strip()
-        chunk_size = 5000
-        for i in range(0, len(texto_limpio), chunk_size):
-            chunk = texto_limpio[i:i+chunk_size]
-            chunks.append((f"parte_{(i//chunk_size)+1:03d}", chunk))
-        return chunks if chunks else [("completo", texto)]
-    
-    capitulos = []
-    for i, match in enumerate(matches):
-        nombre_original = match.group(1).strip()
-        inicio = match.end()
-        fin = matches[i + 1].start() if i + 1 < len(matches) else len(texto)
-        contenido = texto[inicio:fin].strip()
-        nombre_limpio = re.sub(r'[^\w\s]', '', nombre_original).replace(' ', '_').lower()
-        
-        # Extraer número del capítulo para mostrar bonito
-        num_match = re.search(r'\d+', nombre_original)
-        num_cap = num_match.group() if num_match else str(i+1)
-        
-        # Título legible
-        if separador_custom:
-            titulo = f"Parte {i+1}"
-        else:
-            titulo = f"Capítulo {num_cap}"
-        
-        capitulos.append({
-            'id': i,
-            'nombre': nombre_limpio if nombre_limpio else f'parte_{i+1}',
-            'titulo': titulo,
-            'chars': len(contenido),
-            'contenido': contenido
-        })
-    
-    return capitulos
+    capitulos = IndiceCapitulos(texto).capitulos(separador_custom)
+    return [dict(c, contenido=texto[c['inicio']:c['fin']]) if isinstance(c, dict) else c for c in capitulos]
 
 
-def limpiar_texto(texto):
-    texto = re.sub(r'\n{3,}', '\n\n', texto)
-    texto = re.sub(r'[—–]', ', ', texto)
-    texto = re.sub(r'[^\w\s.,;:!?¿¡\'\"()áéíóúüñÁÉÍÓÚÜÑ\-]', ' ', texto)
-    return re.sub(r' +', ' ', texto).strip()
+def dividir_analisis(info, separador=None):
+    """Capítulos de un análisis para el separador dado, reutilizando su índice.
 
+    Los capítulos son rangos del texto ('inicio'/'fin'); el contenido se
+    extrae sólo de los que se van a convertir.
+    """
+    if info.get('indice') is None:
+        info['indice'] = IndiceCapitulos(info['texto'], info.get('secciones'))
+    return info['indice'].capitulos(separador)
 
-async def texto_a_audio(texto, archivo, voz):
-    communicate = edge_tts.Communicate(texto, voz)
-    await communicate.save(archivo)
 
+def limpiar_texto(texto, idioma='es'):
+    """Limpia el texto para voz con las reglas del idioma (ver normalizacion.py)."""
+    return normalizar(texto, idioma)
 
-def procesar_libro(job_id, capitulos_seleccionados, voz_id, carpeta_salida, nombre_libro):
-    """Procesa solo los capítulos seleccionados con pausas preventivas."""
-    import time
-    
-    CAPS_ANTES_PAUSA = 15  # Pausar cada 15 capítulos
-    DURACION_PAUSA = 90   # Segundos de pausa (1.5 minutos)
-    
+
+async def texto_a_audio(texto, archivo, voz, emision=None):
+    """Sintetiza por segmentos de frase en paralelo y une el resultado en `archivo`.
+
+    Devuelve False si el audio salió de la cache y True si se sintetizó.
+    """
+    motor = sintetizador.nombre
+    try:
+        with metrica_sintesis.medir(motor=motor):
+            sintetizado = await sintetizar_archivo(texto, archivo, voz, limitador, cache=cache_audio, emision=emision,
+                                     sintetizador=sintetizador)
+    except Exception as e:
+        metrica_errores_sintesis.inc(motor=motor, error=type(e).__name__)
+        raise
+    metrica_caracteres.inc(len(texto), motor=motor)
+    return sintetizado
+
+
+def _archivo_capitulo(carpeta_salida, nombre_libro, cap, por_id=True):
+    """Ruta del MP3 de un capítulo. Nombre: libro_NNN_capitulo_X.mp3
+
+    Los títulos pueden repetirse (dos "Capítulo 2" si el texto cita otro
+    capítulo), así que el nombre lleva el id. Los trabajos creados antes
+    siguen con su nombre antiguo, sin id (por_id=False).
+    """
+    # Los títulos del índice de un EPUB pueden traer cualquier carácter
+    titulo = re.sub(r'[^\w\s-]', '', cap['titulo']).strip().lower().replace(' ', '_')
+    if por_id:
+        return Path(carpeta_salida) / f"{nombre_libro}_{cap['id'] + 1:03d}_{titulo}.mp3"
+    return Path(carpeta_salida) / f"{nombre_libro}_{titulo}.mp3"
+
+
+def _mp3_capitulo(parametros, cap):
+    """Ruta del MP3 de un capítulo con el esquema de nombres de su trabajo."""
+    return _archivo_capitulo(parametros['carpeta_salida'], parametros['nombre_libro'], cap,
+                             parametros.get('nombre_por_id', False))
+
+
+def _publicar(job_id, tipo, **datos):
+    """Publica un cambio del trabajo con los campos de progreso de /estado."""
+    estado = conversiones[job_id]
+    eventos.publicar(job_id, tipo, dict(
+        datos,
+        estado=estado['estado'],
+        actual=estado.get('actual', 0),
+        total=estado['total'],
+        capitulo=estado.get('capitulo', ''),
+        en_curso=list(estado.get('en_curso', [])),
+    ))
+
+
+async def procesar_libro(job_id, capitulos_seleccionados, voz_id, carpeta_salida, nombre_libro, concurrencia=1,
+                         cliente='local'):
+    """Procesa solo los capítulos seleccionados (o los pendientes, al reanudar).
+
+    El ritmo de peticiones lo marca el limitador compartido. Corre como tarea
+    del event loop compartido y mantiene hasta `concurrencia` capítulos
+    sintetizándose a la vez, cada uno con un turno del planificador a nombre
+    de `cliente`; los capítulos pueden terminar en cualquier orden.
+    """
+    perfil = perfiles[job_id] = PerfilTrabajo()
     try:
-        total = len(capitulos_seleccionados)
-        conversiones[job_id]['total'] = total
         conversiones[job_id]['estado'] = 'convirtiendo'
-        conversiones[job_id]['completados'] = []  # IDs de capítulos ya convertidos
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        for idx, cap in enumerate(capitulos_seleccionados, 1):
-            conversiones[job_id]['actual'] = idx
-            conversiones[job_id]['capitulo'] = cap['titulo']
-            
-            # Pausa preventiva cada 15 capítulos para evitar rate limiting
-            if idx > 1 and (idx - 1) % CAPS_ANTES_PAUSA == 0:
-                conversiones[job_id]['estado'] = 'pausando'
-                conversiones[job_id]['pausa_restante'] = DURACION_PAUSA
-                for seg in range(DURACION_PAUSA, 0, -1):
-                    conversiones[job_id]['pausa_restante'] = seg
-                    time.sleep(1)
-                conversiones[job_id]['estado'] = 'convirtiendo'
-            
-            contenido_limpio = limpiar_texto(cap['contenido'])
-            if len(contenido_limpio) < 50:
-                conversiones[job_id]['completados'].append(cap['id'])
-                continue
-            
-            # Nombre: libro_capitulo_X.mp3
-            archivo_salida = carpeta_salida / f"{nombre_libro}_{cap['titulo'].lower().replace(' ', '_')}.mp3"
-            loop.run_until_complete(texto_a_audio(contenido_limpio, str(archivo_salida), voz_id))
-            
-            # Marcar como completado
-            conversiones[job_id]['completados'].append(cap['id'])
-        
-        loop.close()
+        conversiones[job_id].setdefault('completados', [])  # IDs de capítulos ya convertidos
+        conversiones[job_id]['en_curso'] = []  # Títulos de capítulos en síntesis
+        almacen.guardar_trabajo(job_id, conversiones[job_id])
+        _publicar(job_id, 'inicio')
+
+        await _convertir_capitulos(
+            job_id, capitulos_seleccionados, voz_id, carpeta_salida, nombre_libro, concurrencia, cliente
+        )
+
         conversiones[job_id]['estado'] = 'completado'
         conversiones[job_id]['carpeta'] = str(carpeta_salida)
-        
+
     except Exception as e:
         conversiones[job_id]['estado'] = 'error'
         conversiones[job_id]['error'] = str(e)
+    perfil.terminar()
+
+    almacen.guardar_trabajo(job_id, conversiones[job_id])
+    almacen.guardar_perfil(job_id, perfil.resumen())
+    if conversiones[job_id]['estado'] == 'error':
+        _publicar(job_id, 'error', error=conversiones[job_id]['error'])
+    else:
+        _publicar(job_id, 'completado', carpeta=conversiones[job_id]['carpeta'])
+    _recordar_terminado(job_id)
+
+
+def _recordar_terminado(job_id):
+    """Deja el trabajo entre los terminados en memoria y saca de ella los más antiguos."""
+    terminados.append(job_id)
+    while len(terminados) > app.config['TERMINADOS_EN_MEMORIA']:
+        antiguo = terminados.popleft()
+        conversiones.pop(antiguo, None)
+        perfiles.pop(antiguo, None)
+
+
+def _trabajo(job_id):
+    """Estado del trabajo, de memoria o (si ya salió de ella) del almacén; None si no existe."""
+    datos = conversiones.get(job_id)
+    return datos if datos is not None else almacen.obtener_trabajo(job_id)
+
+
+async def _convertir_capitulos(job_id, capitulos, voz_id, carpeta_salida, nombre_libro, concurrencia, cliente):
+    """Lanza los capítulos con como máximo `concurrencia` en vuelo."""
+    estado = conversiones[job_id]
+    total = estado['total']
+    semaforo = asyncio.Semaphore(concurrencia)
+    en_curso = {}  # orden -> título, en orden de lanzamiento
+    errores = []
+    perfil = perfiles[job_id]
+    por_id = almacen.parametros_trabajo(job_id).get('nombre_por_id', False)
+
+    def actualizar_progreso():
+        # 'actual' cuenta los terminados más el que está en marcha, como en modo secuencial
+        estado['en_curso'] = list(en_curso.values())
+        estado['capitulo'] = ', '.join(estado['en_curso'])
+        if en_curso:
+            estado['actual'] = min(len(estado['completados']) + 1, total)
+        else:
+            estado['actual'] = len(estado['completados'])
+
+    async def convertir(orden, cap):
+        try:
+            # Fuera del loop: un capítulo largo no debe frenar al resto de trabajos
+            contenido_limpio = await asyncio.get_running_loop().run_in_executor(
+                None, limpiar_texto, cap['contenido'], idioma_de_voz(voz_id)
+            )
+            perfil.marcar(cap['id'], 'limpio', caracteres=len(contenido_limpio))
+            escritos = 0
+            if len(contenido_limpio) >= 50:
+                archivo_salida = _archivo_capitulo(carpeta_salida, nombre_libro, cap, por_id)
+                perfil.marcar(cap['id'], 'inicio_sintesis')
+                with emisiones.abrir((job_id, cap['id'])) as emision:
+                    sintetizado = await texto_a_audio(contenido_limpio, str(archivo_salida), voz_id, emision)
+                if not sintetizado:
+                    # Copiado de la cache: no hay primer byte ni síntesis que medir
+                    perfil.marcar(cap['id'], 'cache')
+                elif emision.primer_dato is not None:
+                    perfil.marcar(cap['id'], 'primer_byte', emision.primer_dato)
+                escritos = archivo_salida.stat().st_size
+            perfil.marcar(cap['id'], 'fin', bytes=escritos)
+            # Marcar como completado
+            estado['completados'].append(cap['id'])
+            almacen.marcar_capitulo(job_id, cap['id'])
+        except Exception as e:
+            perfil.marcar(cap['id'], 'fin', error=str(e))
+            errores.append(e)
+        finally:
+            del en_curso[orden]
+            actualizar_progreso()
+            if cap['id'] in estado['completados']:
+                _publicar(job_id, 'capitulo_fin', cap_id=cap['id'], titulo=cap['titulo'])
+            planificador.liberar_turno()
+            semaforo.release()
+
+    pendientes = {cap['id']: (idx, cap) for idx, cap in enumerate(capitulos, 1)}
+    prioritarios = capitulos_prioritarios.get(job_id, deque())
+    tareas = []
+    while pendientes:
+        await semaforo.acquire()
+        # Turno global: los clientes se alternan capítulo a capítulo
+        await asyncio.wrap_future(planificador.pedir_turno(cliente))
+        if errores:
+            planificador.liberar_turno()
+            semaforo.release()
+            break
+        # El capítulo que alguien quiere escuchar pasa delante; si no, el siguiente en orden
+        cap_id = next(iter(pendientes))
+        while prioritarios:
+            pedido = prioritarios.popleft()
+            if pedido in pendientes:
+                cap_id = pedido
+                break
+        idx, cap = pendientes.pop(cap_id)
+        perfil.marcar(cap['id'], 'lanzado', titulo=cap['titulo'])
+        en_curso[idx] = cap['titulo']
+        actualizar_progreso()
+        _publicar(job_id, 'capitulo_inicio', cap_id=cap['id'], titulo=cap['titulo'])
+        tareas.append(asyncio.create_task(convertir(idx, cap)))
+
+    await asyncio.gather(*tareas)
+    if errores:
+        raise errores[0]
+
+
+def _lanzar_trabajo(job_id, capitulos, parametros):
+    """Pone el trabajo en la cola del planificador, que lo arranca cuando haya hueco."""
+    async def ejecutar():
+        try:
+            await procesar_libro(job_id, capitulos, parametros['voz_id'], Path(parametros['carpeta_salida']),
+                           parametros['nombre_libro'], parametros['concurrencia'],
+                           parametros.get('cliente', 'local'))
+        finally:
+            capitulos_prioritarios.pop(job_id, None)
+            planificador.terminar(job_id)
+
+    conversiones[job_id]['estado'] = 'en_cola'
+    capitulos_prioritarios[job_id] = deque()
+    almacen.guardar_trabajo(job_id, conversiones[job_id])
+    _publicar(job_id, 'en_cola')
+    planificador.encolar(job_id, lambda: bucle.lanzar(ejecutar()))
+
+
+def reanudar_trabajos():
+    """Carga los trabajos guardados y relanza los que quedaron a medias.
+
+    Cada trabajo sigue desde su primer capítulo pendiente; los MP3 que ya
+    están en la carpeta de salida se dan por buenos.
+    """
+    for job_id, datos, parametros, completados in almacen.cargar_trabajos():
+        datos['completados'] = completados
+        conversiones[job_id] = datos
+        if datos['estado'] not in ESTADOS_PENDIENTES:
+            _recordar_terminado(job_id)
+            continue
+
+        carpeta_salida = Path(parametros['carpeta_salida'])
+        carpeta_salida.mkdir(exist_ok=True)
+        pendientes = []
+        for cap in almacen.capitulos_trabajo(job_id):
+            if cap['hecho']:
+                continue
+            if _mp3_capitulo(parametros, cap).exists():
+                # El MP3 llegó a escribirse pero la caída impidió anotarlo
+                completados.append(cap['id'])
+                almacen.marcar_capitulo(job_id, cap['id'])
+                continue
+            pendientes.append(cap)
+
+        try:
+            _recuperar_contenido(parametros, pendientes)
+        except Exception as e:
+            datos['estado'] = 'error'
+            datos['error'] = f"No se puede reanudar: {e}"
+            almacen.guardar_trabajo(job_id, datos)
+            _recordar_terminado(job_id)
+            print(f"   ❌ {job_id}: {datos['error']}")
+            continue
+
+        print(f"   ↻ Reanudando {job_id}: {len(pendientes)} capítulos pendientes")
+        _lanzar_trabajo(job_id, pendientes, parametros)
+
+
+def _recuperar_contenido(parametros, capitulos):
+    """Rellena el texto de los capítulos a reanudar dividiendo otra vez su análisis.
+
+    Se usa el separador con el que se creó el trabajo, así que los ids de los
+    capítulos son los mismos aunque el archivo se haya re-analizado después.
+    """
+    faltan = [cap for cap in capitulos if 'contenido' not in cap]
+    if not faltan:
+        return
+    info = _obtener_analisis(parametros['file_id']) if parametros.get('file_id') else None
+    if info is None:
+        raise ValueError("el archivo subido ya no existe")
+    indice = info.get('indice')
+    if indice is None:
+        dividir_analisis(info, parametros.get('separador'))
+        indice = info['indice']
+    por_id = {c['id']: c for c in indice.capitulos(parametros.get('separador')) if isinstance(c, dict)}
+    for cap in faltan:
+        original = por_id.get(cap['id'])
+        if original is None or original['titulo'] != cap['titulo']:
+            raise ValueError(f"el capítulo {cap['id']} ({cap['titulo']}) ya no está en el archivo")
+        cap['contenido'] = indice.contenido(original)
+
+
+def _obtener_analisis(file_id):
+    """Devuelve el análisis en memoria o volcado, o lo reconstruye desde el almacén."""
+    info = archivos_analizados.get(file_id)
+    if info is not None:
+        return info
+    guardado = almacen.obtener_analisis(file_id)
+    if guardado is None or not Path(guardado['ruta']).exists():
+        return None
+    texto, secciones = leer_libro(guardado['ruta'])
+    info = {
+        'ruta': guardado['ruta'],
+        'nombre': guardado['nombre'],
+        'texto': texto,
+        'separador': guardado['separador'],
+        'secciones': secciones
+    }
+    info['capitulos'] = dividir_analisis(info, guardado['separador'])
+    archivos_analizados[file_id] = info
+    return info
+
+
+@app.before_request
+def _iniciar_medida():
+    g.inicio_peticion = time.perf_counter()
+
+
+@app.after_request
+def _medir_peticion(respuesta):
+    # Por la regla y no por la URL, para no crear una serie por cada job_id
+    ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+    metrica_peticiones.observar(time.perf_counter() - g.inicio_peticion,
+                                metodo=request.method, ruta=ruta, codigo=respuesta.status_code)
+    return respuesta
 
 
 @app.route('/ping')
@@ -326,6 +622,12 @@ def ping():
     return jsonify({"status": "ok", "message": "Voco Server Online", "version": "1.0.0"})
 
 
+@app.route('/metrics')
+def metricas_prometheus():
+    """Métricas del servidor en formato de texto de Prometheus."""
+    return Response(metricas.texto(), content_type=TIPO_CONTENIDO)
+
+
 @app.route('/')
 def index():
     return render_template('index.html', voces=VOCES)
@@ -334,29 +636,27 @@ def index():
 @app.route('/idiomas')
 def listar_idiomas():
     """Devuelve la lista de idiomas disponibles."""
-    _, idiomas = _obtener_voces_edge()
-    resultado = []
-    for code, info in sorted(idiomas.items(), key=lambda x: x[1]['nombre']):
-        resultado.append({
-            'codigo': code,
-            'nombre': info['nombre'],
-            'locales': sorted(info['locales'], key=lambda l: l['nombre'])
-        })
-    return jsonify(resultado)
+    try:
+        cuerpo = catalogo_voces.respuesta_idiomas()
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    return Response(cuerpo, mimetype='application/json')
 
 
 @app.route('/voces/<locale>')
 def voces_por_locale(locale):
-    """Devuelve las voces disponibles para un locale específico."""
-    voces, _ = _obtener_voces_edge()
-    # Si pasan solo el código de idioma (ej: 'es'), buscar todos los locales
-    resultado = []
-    for loc_key, loc_voces in voces.items():
-        if loc_key == locale or loc_key.startswith(locale + '-'):
-            resultado.extend(loc_voces)
-    if not resultado:
+    """Devuelve las voces disponibles para un locale específico.
+
+    Acepta también sólo el código de idioma (ej: 'es') y un filtro opcional
+    ?genero=Femenino|Masculino.
+    """
+    try:
+        cuerpo = catalogo_voces.respuesta_voces(locale, request.args.get('genero'))
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    if cuerpo is None:
         return jsonify({'error': f'No se encontraron voces para {locale}'}), 404
-    return jsonify(resultado)
+    return Response(cuerpo, mimetype='application/json')
 
 
 @app.route('/analizar', methods=['POST'])
@@ -378,22 +678,47 @@ def analizar():
     ruta_archivo = app.config['UPLOAD_FOLDER'] / f"{file_id}_{nombre_seguro}"
     archivo.save(str(ruta_archivo))
     
+    # Progreso por páginas consultable en /progreso-analisis/<progreso_id>
+    progreso_id = request.form.get('progreso_id')
+    if progreso_id:
+        progreso_analisis[progreso_id] = {'etapa': 'extrayendo', 'paginas': 0, 'total': 0}
+
+    def progreso(paginas, total):
+        if progreso_id:
+            progreso_analisis[progreso_id] = {'etapa': 'extrayendo', 'paginas': paginas, 'total': total}
+    
     try:
-        texto = leer_archivo(ruta_archivo)
-        capitulos = dividir_por_capitulos(texto)
-        
-        # Guardar para uso posterior
-        archivos_analizados[file_id] = {
+        texto, secciones = leer_libro(ruta_archivo, progreso)
+        if progreso_id:
+            progreso_analisis[progreso_id]['etapa'] = 'dividiendo'
+        info = {
             'ruta': str(ruta_archivo),
             'nombre': nombre_seguro,
             'texto': texto,
-            'capitulos': capitulos
+            'separador': None,
+            'secciones': secciones
         }
+        capitulos = dividir_analisis(info)
+        info['capitulos'] = capitulos
+        
+        # Guardar para uso posterior
+        archivos_analizados[file_id] = info
+        almacen.guardar_analisis(file_id, ruta_archivo, nombre_seguro)
         
         return _respuesta_capitulos(file_id, nombre_seguro, capitulos)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    finally:
+        progreso_analisis.pop(progreso_id, None)
+
+
+@app.route('/progreso-analisis/<progreso_id>')
+def estado_analisis(progreso_id):
+    """Páginas extraídas hasta ahora de un /analizar en curso."""
+    if progreso_id not in progreso_analisis:
+        return jsonify({'error': 'Análisis no encontrado'}), 404
+    return jsonify(progreso_analisis[progreso_id])
 
 
 @app.route('/re-analizar', methods=['POST'])
@@ -403,49 +728,36 @@ def re_analizar():
     file_id = data.get('file_id')
     separador = data.get('separador', '')
     
-    if not file_id or file_id not in archivos_analizados:
+    try:
+        info = _obtener_analisis(file_id) if file_id else None
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if info is None:
         return jsonify({'error': 'Archivo no encontrado. Vuelve a subirlo.'}), 400
     
-    info = archivos_analizados[file_id]
     texto = info.get('texto')
     
     if not texto:
         # Re-leer el archivo si no está en cache
         try:
-            texto = leer_archivo(info['ruta'])
+            texto, info['secciones'] = leer_libro(info['ruta'])
             info['texto'] = texto
+            info['indice'] = None
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
-    capitulos = dividir_por_capitulos(texto, separador_custom=separador if separador else None)
+    capitulos = dividir_analisis(info, separador or None)
     info['capitulos'] = capitulos
+    info['separador'] = separador or None
+    archivos_analizados[file_id] = info  # Volver a medir su tamaño
+    almacen.guardar_analisis(file_id, info['ruta'], info['nombre'], separador or None)
     
     return _respuesta_capitulos(file_id, info['nombre'], capitulos)
 
 
 def _respuesta_capitulos(file_id, nombre, capitulos):
     """Genera la respuesta JSON para capítulos."""
-    caps_info = []
-    for cap in capitulos:
-        if isinstance(cap, dict):
-            caps_info.append({
-                'id': cap['id'],
-                'titulo': cap['titulo'],
-                'chars': cap['chars']
-            })
-        else:
-            caps_info.append({
-                'id': 0,
-                'titulo': cap[0],
-                'chars': len(cap[1])
-            })
-    
-    return jsonify({
-        'file_id': file_id,
-        'nombre': nombre,
-        'capitulos': caps_info,
-        'total': len(caps_info)
-    })
+    return jsonify(respuesta_capitulos(file_id, nombre, capitulos))
 
 
 @app.route('/convertir', methods=['POST'])
@@ -458,7 +770,17 @@ def convertir():
     voz_id_directa = data.get('voz_id')  # ShortName directo de edge-tts
     capitulos_ids = data.get('capitulos', [])  # Lista de IDs de capítulos
     
-    if file_id not in archivos_analizados:
+    try:
+        concurrencia = int(data.get('concurrencia', CONCURRENCIA_DEFECTO))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Concurrencia inválida'}), 400
+    concurrencia = max(1, min(concurrencia, MAX_CONCURRENCIA))
+    
+    try:
+        archivo_info = _obtener_analisis(file_id) if file_id else None
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if archivo_info is None:
         return jsonify({'error': 'Archivo no encontrado. Vuelve a subirlo.'}), 400
     
     # Determinar voz: prioridad a voz_id directa
@@ -472,14 +794,14 @@ def convertir():
         voz_id = VOCES['jorge']['id']
         voz_nombre = 'Jorge'
     
-    archivo_info = archivos_analizados[file_id]
-    
     # Filtrar capítulos seleccionados
     todos_caps = archivo_info['capitulos']
     if capitulos_ids:
         capitulos_seleccionados = [c for c in todos_caps if isinstance(c, dict) and c['id'] in capitulos_ids]
     else:
         capitulos_seleccionados = [c for c in todos_caps if isinstance(c, dict)]
+    indice = archivo_info['indice']
+    capitulos_seleccionados = [dict(c, contenido=indice.contenido(c)) for c in capitulos_seleccionados]
     
     if not capitulos_seleccionados:
         return jsonify({'error': 'No hay capítulos para convertir'}), 400
@@ -491,35 +813,149 @@ def convertir():
     carpeta_salida.mkdir(exist_ok=True)
     
     conversiones[job_id] = {
-        'estado': 'iniciando',
+        'estado': 'en_cola',
         'total': len(capitulos_seleccionados),
         'actual': 0,
         'capitulo': '',
-        'voz': voz_nombre
+        'voz': voz_nombre,
+        'concurrencia': concurrencia
     }
+    parametros = {
+        'voz_id': voz_id,
+        'carpeta_salida': str(carpeta_salida),
+        'nombre_libro': nombre_base,
+        'concurrencia': concurrencia,
+        'cliente': data.get('cliente') or request.remote_addr or 'local',
+        # Para volver a sacar el texto de los capítulos al reanudar
+        'file_id': file_id,
+        'separador': archivo_info.get('separador'),
+        'nombre_por_id': True
+    }
+    almacen.crear_trabajo(job_id, conversiones[job_id], parametros, capitulos_seleccionados)
     
-    thread = threading.Thread(
-        target=procesar_libro,
-        args=(job_id, capitulos_seleccionados, voz_id, carpeta_salida, nombre_base)
-    )
-    thread.start()
+    _lanzar_trabajo(job_id, capitulos_seleccionados, parametros)
     
     return jsonify({'job_id': job_id})
 
 
+def _estado_trabajo(job_id, datos=None):
+    datos = datos or _trabajo(job_id)
+    respuesta = dict(datos, limitador=limitador.estado(), sintesis=sintetizador.estado())
+    if respuesta['estado'] == 'en_cola':
+        respuesta['posicion_cola'] = planificador.posicion(job_id)
+    return respuesta
+
+
 @app.route('/estado/<job_id>')
 def estado(job_id):
-    if job_id not in conversiones:
+    datos = _trabajo(job_id)
+    if datos is None:
         return jsonify({'error': 'Trabajo no encontrado'}), 404
-    return jsonify(conversiones[job_id])
+    return jsonify(_estado_trabajo(job_id, datos))
+
+
+@app.route('/estado/<job_id>/perfil')
+def perfil_trabajo(job_id):
+    """Línea de tiempo por capítulo y percentiles de cada etapa (ver perfil.py)."""
+    datos = _trabajo(job_id)
+    if datos is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    perfil = perfiles.get(job_id)
+    resumen = perfil.resumen() if perfil is not None else almacen.obtener_perfil(job_id)
+    if resumen is None:
+        # En cola todavía, o cortado por un reinicio antes de terminar
+        return jsonify({'error': 'El trabajo no tiene perfil'}), 404
+    return jsonify(dict(resumen, job_id=job_id, estado=datos['estado']))
+
+
+def _mensaje_sse(evento_id, datos):
+    return f"id: {evento_id}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+def _flujo_eventos(jobs):
+    """Respuesta SSE con los cambios de `jobs` hasta que todos terminen.
+
+    Al conectar (o si el cliente se reconecta con un Last-Event-ID que ya no
+    está en el historial) se manda primero un evento 'estado' por trabajo con
+    el mismo contenido que /estado; después sólo los cambios.
+    """
+    ultimo = request.headers.get('Last-Event-ID') or request.args.get('desde')
+    try:
+        ultimo = int(ultimo) if ultimo else None
+    except ValueError:
+        ultimo = None
+
+    abiertos = set(jobs)  # Trabajos cuyo final aún no se ha enviado
+
+    def instantanea():
+        leido = eventos.ultimo_id()
+        mensajes = []
+        for j in jobs:
+            datos = dict(_estado_trabajo(j), tipo='estado', job_id=j, id=leido)
+            if datos['estado'] in ESTADOS_FINALES:
+                abiertos.discard(j)
+            mensajes.append(_mensaje_sse(leido, datos))
+        return mensajes, leido
+
+    async def generar():
+        nonlocal ultimo
+        yield "retry: 3000\n\n"
+        if ultimo is None or eventos.perdido(ultimo):
+            mensajes, ultimo = instantanea()
+            for mensaje in mensajes:
+                yield mensaje
+        while abiertos:
+            nuevos, leido = await eventos.esperar(ultimo, jobs, ESPERA_SSE)
+            if leido == ultimo:
+                # Reconexión posterior al evento final: ya no llegará nada más
+                abiertos.difference_update(j for j in jobs if _trabajo(j)['estado'] in ESTADOS_FINALES)
+                yield ": ping\n\n"
+                continue
+            if eventos.perdido(ultimo):
+                # Han pasado más eventos de los que caben en el historial
+                mensajes, ultimo = instantanea()
+                for mensaje in mensajes:
+                    yield mensaje
+                continue
+            for evento in nuevos:
+                if evento['tipo'] in ESTADOS_FINALES:
+                    abiertos.discard(evento['job_id'])
+                yield _mensaje_sse(evento['id'], evento)
+            ultimo = leido
+
+    return Response(FlujoAsync(generar(), bucle), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@app.route('/eventos/<job_id>')
+def eventos_trabajo(job_id):
+    """Flujo SSE de progreso de un trabajo (sustituye al sondeo de /estado)."""
+    if _trabajo(job_id) is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return _flujo_eventos([job_id])
+
+
+@app.route('/eventos')
+def eventos_trabajos():
+    """Flujo SSE de varios trabajos a la vez: /eventos?jobs=id1,id2"""
+    jobs = [j for j in request.args.get('jobs', '').split(',') if j]
+    if not jobs:
+        return jsonify({'error': 'Indica los trabajos en ?jobs='}), 400
+    desconocidos = [j for j in jobs if _trabajo(j) is None]
+    if desconocidos:
+        return jsonify({'error': f"Trabajos no encontrados: {', '.join(desconocidos)}"}), 404
+    return _flujo_eventos(jobs)
 
 
 @app.route('/descargas/<job_id>')
 def listar_descargas(job_id):
-    if job_id not in conversiones:
+    datos = _trabajo(job_id)
+    if datos is None:
         return jsonify({'error': 'No encontrado'}), 404
     
-    carpeta = conversiones[job_id].get('carpeta')
+    carpeta = datos.get('carpeta')
     if not carpeta:
         return jsonify({'archivos': []})
     
@@ -531,14 +967,140 @@ def listar_descargas(job_id):
 
 @app.route('/descargar/<job_id>/<nombre>')
 def descargar(job_id, nombre):
-    if job_id not in conversiones:
+    datos = _trabajo(job_id)
+    if datos is None:
         return "No encontrado", 404
-    carpeta = conversiones[job_id].get('carpeta')
+    carpeta = datos.get('carpeta')
     if not carpeta:
         return "No disponible", 404
     return send_from_directory(carpeta, nombre, as_attachment=True)
 
 
+def _archivos_trabajo(job_id):
+    """[(orden, cap, ruta)] de los MP3 ya escritos del trabajo, en el orden del libro."""
+    parametros = almacen.parametros_trabajo(job_id)
+    if parametros is None:
+        return []
+    archivos = []
+    for orden, cap in enumerate(almacen.capitulos_trabajo(job_id, con_contenido=False), 1):
+        ruta = _mp3_capitulo(parametros, cap)
+        if ruta.exists():
+            archivos.append((orden, cap, ruta))
+    return archivos
+
+
+@app.route('/descargar-zip/<job_id>')
+def descargar_zip(job_id):
+    """Todos los MP3 del trabajo en un ZIP sin compresión, generado mientras se envía.
+
+    Funciona también con el trabajo en marcha: incluye los capítulos
+    terminados hasta ese momento. Los nombres llevan el número de orden
+    delante para que queden ordenados.
+    """
+    if _trabajo(job_id) is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    archivos = _archivos_trabajo(job_id)
+    if not archivos:
+        return jsonify({'error': 'Todavía no hay capítulos terminados'}), 404
+    nombre_libro = almacen.parametros_trabajo(job_id)['nombre_libro']
+    contenido = zip_en_flujo((f"{orden:03d}_{ruta.name}", ruta) for orden, _, ruta in archivos)
+    return Response(contenido, mimetype='application/zip', headers={
+        'Content-Disposition': f"attachment; filename*=UTF-8''{quote(nombre_libro)}.zip",
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@app.route('/exportar/<job_id>', methods=['POST'])
+def exportar(job_id):
+    """Une los capítulos de un trabajo terminado en un único MP3 con marcas de capítulo.
+
+    Copia las tramas sin recodificar, así que tarda segundos incluso en libros
+    muy largos. El archivo queda en la carpeta del trabajo y se descarga con
+    /descargar.
+    """
+    datos = _trabajo(job_id)
+    if datos is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    if datos['estado'] != 'completado':
+        return jsonify({'error': 'El trabajo aún no ha terminado'}), 409
+    parametros = almacen.parametros_trabajo(job_id)
+    nombre_libro = parametros['nombre_libro']
+    destino = Path(parametros['carpeta_salida']) / f"{nombre_libro}.mp3"
+    capitulos = [(cap['titulo'], ruta) for _, cap, ruta in _archivos_trabajo(job_id)]
+    try:
+        marcas = exportar_mp3(capitulos, destino, nombre_libro)
+    except ErrorExportacion as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'archivo': destino.name,
+        'size': destino.stat().st_size,
+        'capitulos': [dict(m, inicio=round(m['inicio'], 3), fin=round(m['fin'], 3)) for m in marcas],
+        'url': f"/descargar/{job_id}/{quote(destino.name)}"
+    })
+
+
+@app.route('/escuchar/<job_id>/<int:cap_id>')
+def escuchar(job_id, cap_id):
+    """Audio de un capítulo mientras se sintetiza, o el MP3 terminado si ya existe.
+
+    Si el capítulo aún no ha empezado se adelanta al resto del trabajo y se
+    espera a que arranque hasta ESPERA_ESCUCHA segundos; pasado ese tiempo se
+    responde 202 con Retry-After para que el cliente vuelva a pedirlo. El
+    audio se envía por trozos (chunked) a medida que llega del sintetizador.
+    """
+    estado_trabajo = _trabajo(job_id)
+    if estado_trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    parametros = almacen.parametros_trabajo(job_id)
+    cap = almacen.capitulo_trabajo(job_id, cap_id)
+    if parametros is None or cap is None:
+        return jsonify({'error': 'Capítulo no encontrado'}), 404
+    ruta = _mp3_capitulo(parametros, cap)
+    clave = (job_id, cap_id)
+
+    emision = emisiones.get(clave)
+    if emision is None and not ruta.exists():
+        # Sólo los trabajos en cola o en marcha tienen cola de prioridad
+        prioritarios = capitulos_prioritarios.get(job_id)
+        if prioritarios is not None and cap_id not in prioritarios:
+            prioritarios.append(cap_id)
+        limite = time.monotonic() + ESPERA_ESCUCHA
+        while emision is None and not ruta.exists():
+            if (estado_trabajo['estado'] not in ESTADOS_PENDIENTES
+                    or cap_id in estado_trabajo.get('completados', [])):
+                # Terminó sin audio (capítulo demasiado corto o error)
+                return jsonify({'error': 'El capítulo no tiene audio'}), 404
+            if time.monotonic() > limite:
+                return jsonify({'estado': 'esperando', 'mensaje': 'El capítulo aún no ha empezado'}), 202, {
+                    'Retry-After': str(REINTENTO_ESCUCHA),
+                    'Cache-Control': 'no-store',
+                }
+            emision = emisiones.esperar(clave, 1.0)
+
+    if emision is None:
+        return send_file(ruta, mimetype='audio/mpeg', conditional=True)
+
+    async def generar():
+        enviados = 0
+        async for trozo in emision.leer(respaldo=ruta):
+            enviados += len(trozo)
+            yield trozo
+        if not enviados and ruta.exists():
+            # Salió de la cache sin pasar por el sintetizador: mandar el archivo
+            with open(ruta, 'rb') as f:
+                while True:
+                    bloque = f.read(64 * 1024)
+                    if not bloque:
+                        break
+                    yield bloque
+
+    # Sin Content-Length: Werkzeug responde con Transfer-Encoding: chunked
+    return Response(FlujoAsync(generar(), bucle), mimetype='audio/mpeg', headers={
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no',
+    })
+
+
 # Carpeta para muestras de voz
 SAMPLES_FOLDER = Path(__file__).parent / 'samples'
 SAMPLES_FOLDER.mkdir(exist_ok=True)
@@ -559,9 +1121,57 @@ TEXTOS_MUESTRA = {
 }
 
 
+ESPERA_MUESTRA = 60     # Segundos máximos que una petición espera su muestra
+
+# Genera cada muestra una sola vez aunque varios usuarios la pidan a la vez. El
+# precalentado espera mientras haya trabajos: el limitador es de los capítulos.
+muestras = GeneradorMuestras(SAMPLES_FOLDER, texto_a_audio, TEXTOS_MUESTRA, TEXTO_MUESTRA, bucle=bucle,
+                             ocupado=planificador.ocupado)
+
+
+def _voces_muestra(idiomas):
+    """Voces cuyas muestras conviene tener en disco: las de `idiomas` (o locales) y las clásicas."""
+    voces = [v['id'] for v in VOCES.values()]
+    for prefijo in idiomas:
+        voces.extend(v['id'] for v in catalogo_voces.voces(prefijo))
+    return voces
+
+
+def precalentar_muestras(idiomas=None):
+    """Encola en segundo plano las muestras que falten. Devuelve cuántas se encolaron.
+
+    Sin `idiomas` se usan los de app.config['PRECALENTAR_MUESTRAS'].
+    """
+    if idiomas is None:
+        idiomas = app.config['PRECALENTAR_MUESTRAS']
+    return muestras.precalentar(_voces_muestra(idiomas))
+
+
+def _precalentar_al_arrancar():
+    if not app.config['PRECALENTAR_MUESTRAS']:
+        return
+    try:
+        print(f"🔥 Precalentando {precalentar_muestras()} muestras de voz")
+    except RuntimeError as e:
+        print(f"⚠️ No se pudieron precalentar las muestras: {e}")
+
+
+@app.route('/precalentar-muestras', methods=['POST'])
+def precalentar_muestras_api():
+    """Genera en segundo plano las muestras de los idiomas o locales indicados (o de los configurados)."""
+    datos = request.get_json(silent=True) or {}
+    idiomas = [i for i in datos.get('idiomas') or app.config['PRECALENTAR_MUESTRAS']
+               if i.split('-')[0] in TEXTOS_MUESTRA]
+    try:
+        encoladas = precalentar_muestras(idiomas)
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({'idiomas': idiomas, 'encoladas': encoladas, **muestras.estado()}), 202
+
+
 @app.route('/probar-voz/<voz_key>')
 def probar_voz(voz_key):
-    """Genera y devuelve un audio de muestra para la voz (acepta key legacy o ShortName)."""
+    """Devuelve un audio de muestra para la voz (acepta key legacy o ShortName)."""
     # Determinar el voz_id real
     if voz_key in VOCES:
         voz_id = VOCES[voz_key]['id']
@@ -569,28 +1179,49 @@ def probar_voz(voz_key):
         # Asumir que es un ShortName directo (ej: en-US-JennyNeural)
         voz_id = voz_key
 
-    # Nombre seguro para el archivo
-    safe_name = voz_id.replace('-', '_').lower()
-    archivo_muestra = SAMPLES_FOLDER / f"muestra_{safe_name}.mp3"
+    try:
+        archivo_muestra = muestras.obtener(voz_id, timeout=ESPERA_MUESTRA)
+    except Exception as e:
+        return jsonify({'error': f'Error al generar muestra: {str(e)}'}), 500
+
+    return send_from_directory(SAMPLES_FOLDER, archivo_muestra.name)
+
+
+_servicios_arrancados = False
+_lock_servicios = threading.Lock()
 
-    if not archivo_muestra.exists():
-        # Detectar idioma para el texto de muestra
-        lang_code = voz_id.split('-')[0] if '-' in voz_id else 'es'
-        texto = TEXTOS_MUESTRA.get(lang_code, TEXTOS_MUESTRA.get('en', TEXTO_MUESTRA))
 
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+def arrancar_servicios():
+    """Reanuda los trabajos y pone en marcha el catálogo y las muestras de voz.
+
+    Sólo actúa la primera vez que se llama: desde el arranque de asgi.py o de
+    este script, o en la primera petición con cualquier otro servidor WSGI.
+    """
+    global _servicios_arrancados
+    with _lock_servicios:
+        if _servicios_arrancados:
+            return
         try:
-            loop.run_until_complete(texto_a_audio(texto, str(archivo_muestra), voz_id))
-        except Exception as e:
-            return jsonify({'error': f'Error al generar muestra: {str(e)}'}), 500
+            reanudar_trabajos()
+            catalogo_voces.iniciar()
         finally:
-            loop.close()
+            # Aunque falle no se reintenta: reanudaría dos veces los mismos trabajos
+            _servicios_arrancados = True
+    # La lista de voces puede tardar en llegar: se precalienta sin bloquear el arranque
+    threading.Thread(target=_precalentar_al_arrancar, daemon=True).start()
 
-    return send_from_directory(SAMPLES_FOLDER, archivo_muestra.name)
+
+@app.before_request
+def _arrancar_en_primera_peticion():
+    # gunicorn, flask run...: nadie llama a arrancar_servicios antes de servir
+    if not _servicios_arrancados:
+        arrancar_servicios()
 
 
 if __name__ == '__main__':
     print("\n🎧 Conversor de Audiolibros")
     print("   Abre http://localhost:5000 en tu navegador\n")
+    # Con el recargador de debug el script corre dos veces: arrancar ya sólo en el proceso que sirve
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        arrancar_servicios()
     app.run(debug=True, port=5000, host='0.0.0.0')
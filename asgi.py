@@ -0,0 +1,195 @@
+"""
+Modo ASGI
+=========
+Sirve la misma API de app.py desde un servidor ASGI, con su event loop como
+loop compartido de toda la síntesis:
+
+    pip install uvicorn
+    uvicorn asgi:app --port 5000
+
+Los trabajos, las muestras de voz y la lista de voces corren como tareas de
+ese loop, y los flujos que esperan datos (SSE de /eventos, audio en curso de
+/escuchar) se envían desde él sin ocupar ningún hilo. Las vistas de Flask,
+que son cortas, se ejecutan en un grupo de hilos; las respuestas y su JSON
+son exactamente los de app.py.
+"""
+
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.wsgi import FileWrapper
+
+import app as voco
+from bucle import FlujoAsync
+from empaquetado import TAMANO_BLOQUE
+
+HILOS_VISTAS = 64                   # Vistas de Flask atendiéndose a la vez
+CUERPO_EN_MEMORIA = 1024 * 1024     # Cuerpos de petición mayores van a un temporal
+
+_vistas = ThreadPoolExecutor(HILOS_VISTAS, thread_name_prefix='vista')
+
+
+async def _leer_cuerpo(receive):
+    cuerpo = tempfile.SpooledTemporaryFile(CUERPO_EN_MEMORIA)
+    while True:
+        mensaje = await receive()
+        if mensaje['type'] == 'http.disconnect':
+            return None
+        cuerpo.write(mensaje.get('body', b''))
+        if not mensaje.get('more_body'):
+            cuerpo.seek(0)
+            return cuerpo
+
+
+def _entorno(scope, cuerpo):
+    """Entorno WSGI (PEP 3333) equivalente a la petición ASGI."""
+    servidor = scope.get('server') or ('localhost', 80)
+    entorno = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': servidor[0],
+        'SERVER_PORT': str(servidor[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': cuerpo,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        # send_file lee por bloques grandes: cada bloque es un salto entre hilos
+        'wsgi.file_wrapper': lambda f, tamano=TAMANO_BLOQUE: FileWrapper(f, max(tamano, TAMANO_BLOQUE)),
+    }
+    for nombre, valor in scope.get('headers', []):
+        nombre = nombre.decode('latin-1').upper().replace('-', '_')
+        valor = valor.decode('latin-1')
+        if nombre in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            entorno[nombre] = valor
+            continue
+        clave = f"HTTP_{nombre}"
+        entorno[clave] = f"{entorno[clave]},{valor}" if clave in entorno else valor
+    return entorno
+
+
+def _despachar(entorno):
+    """Ejecuta la vista de Flask. Devuelve (estado, cabeceras, cuerpo)."""
+    with voco.app.request_context(entorno):
+        try:
+            respuesta = voco.app.full_dispatch_request()
+        except Exception as e:
+            respuesta = voco.app.make_response(voco.app.handle_exception(e))
+    if isinstance(respuesta.response, FlujoAsync):
+        # Se recorre en el loop; las cabeceras, como las pondría Werkzeug
+        cabeceras = respuesta.get_wsgi_headers(entorno)
+        return respuesta.status_code, cabeceras.to_wsgi_list(), respuesta.response
+    cuerpo, estado, cabeceras = respuesta.get_wsgi_response(entorno)
+    return int(estado.split(' ', 1)[0]), cabeceras, cuerpo
+
+
+def _bytes(trozo):
+    return trozo.encode('utf-8') if isinstance(trozo, str) else trozo
+
+
+def _leer_bloque(iterador):
+    """Siguiente trozo del cuerpo WSGI (en un hilo), juntando los pequeños; b'' al acabar."""
+    partes, tamano = [], 0
+    for trozo in iterador:
+        trozo = _bytes(trozo)
+        partes.append(trozo)
+        tamano += len(trozo)
+        if tamano >= TAMANO_BLOQUE:
+            break
+    return b''.join(partes)
+
+
+async def _enviar_cuerpo(cuerpo, send):
+    loop = asyncio.get_running_loop()
+    if isinstance(cuerpo, FlujoAsync):
+        async for trozo in cuerpo:
+            await send({'type': 'http.response.body', 'body': _bytes(trozo), 'more_body': True})
+    else:
+        iterador = iter(cuerpo)
+        while True:
+            bloque = await loop.run_in_executor(_vistas, _leer_bloque, iterador)
+            if not bloque:
+                break
+            await send({'type': 'http.response.body', 'body': bloque, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+async def _esperar_desconexion(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _cerrar(cuerpo):
+    if isinstance(cuerpo, FlujoAsync):
+        await cuerpo.generador.aclose()
+    elif hasattr(cuerpo, 'close'):
+        await asyncio.get_running_loop().run_in_executor(_vistas, cuerpo.close)
+
+
+async def _http(scope, receive, send):
+    cuerpo_peticion = await _leer_cuerpo(receive)
+    if cuerpo_peticion is None:
+        return
+    loop = asyncio.get_running_loop()
+    # Sin lifespan los servicios arrancan en la primera petición, ya con este loop
+    voco.bucle.usar(loop)
+    try:
+        estado, cabeceras, cuerpo = await loop.run_in_executor(
+            _vistas, _despachar, _entorno(scope, cuerpo_peticion)
+        )
+    finally:
+        cuerpo_peticion.close()
+
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': estado,
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in cabeceras],
+        })
+        # Un flujo SSE o de audio puede durar mucho: se corta si el cliente se va
+        envio = asyncio.ensure_future(_enviar_cuerpo(cuerpo, send))
+        corte = asyncio.ensure_future(_esperar_desconexion(receive))
+        try:
+            await asyncio.wait({envio, corte}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for tarea in (envio, corte):
+                tarea.cancel()
+            await asyncio.gather(envio, corte, return_exceptions=True)
+        if not envio.cancelled() and envio.exception():
+            raise envio.exception()
+    finally:
+        await _cerrar(cuerpo)
+
+
+async def _ciclo_de_vida(receive, send):
+    while True:
+        mensaje = await receive()
+        if mensaje['type'] == 'lifespan.startup':
+            try:
+                voco.bucle.usar(asyncio.get_running_loop())
+                voco.arrancar_servicios()
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensaje['type'] == 'lifespan.shutdown':
+            await voco.sintetizador.cerrar()
+            _vistas.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """Aplicación ASGI: la API de app.py sobre un único event loop."""
+    if scope['type'] == 'lifespan':
+        await _ciclo_de_vida(receive, send)
+    elif scope['type'] == 'http':
+        await _http(scope, receive, send)
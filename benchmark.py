@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Benchmark del procesado de texto
+================================
+Mide sobre libros sintéticos (libros_sinteticos.py) las etapas del análisis
+de un libro, sin importar app.py (que crea sus carpetas y su base de datos al
+cargarse): leer el .txt (extraccion.leer_archivo), indexar los capítulos
+(indice_capitulos.py), normalizarlos uno a uno (normalizacion.py), serializar
+la respuesta de la API (respuesta_capitulos, codificada como jsonify) y leer
+el mismo libro en EPUB (extraccion.leer_libro) e indexarlo por sus secciones.
+
+De cada etapa se guarda el tiempo (mínimo y mediana de varias repeticiones)
+y, de una pasada aparte con tracemalloc (que ralentiza): el pico de memoria
+asignada durante la etapa, la memoria y el número de bloques que siguen
+vivos al terminar (la diferencia entre dos instantáneas) y las recolecciones
+de la generación 0 del GC. tracemalloc sólo ve los bloques vivos; las
+recolecciones sirven de recuento de asignaciones: cada una salta cuando los
+objetos con GC creados superan en gc.get_threshold()[0] a los liberados.
+
+    python benchmark.py                          # corpus completo (hasta 50 MB)
+    python benchmark.py --rapido                 # corpus pequeños
+    python benchmark.py --salida base.json
+    python benchmark.py --comparar base.json     # diferencias con otra versión
+"""
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import extraccion
+from indice_capitulos import IndiceCapitulos, respuesta_capitulos
+from libros_sinteticos import escribir_epub, escribir_libro
+from normalizacion import normalizar
+
+MB = 1024 * 1024
+TODOS = ('es', 'en', 'fr', 'de', 'pt', 'it', 'ru', 'ja')
+
+CORPUS = [
+    {'nombre': 'es_1mb_300caps', 'tamano': 1 * MB, 'capitulos': 300, 'idiomas': ('es',)},
+    {'nombre': 'mixto_10mb_2000caps', 'tamano': 10 * MB, 'capitulos': 2000, 'idiomas': TODOS},
+    {'nombre': 'es_50mb_5000caps', 'tamano': 50 * MB, 'capitulos': 5000, 'idiomas': ('es',)},
+    {'nombre': 'sin_capitulos_5mb', 'tamano': 5 * MB, 'capitulos': 0, 'idiomas': ('es', 'en')},
+]
+CORPUS_RAPIDO = [
+    {'nombre': 'es_1mb_300caps', 'tamano': 1 * MB, 'capitulos': 300, 'idiomas': ('es',)},
+    {'nombre': 'mixto_2mb_1000caps', 'tamano': 2 * MB, 'capitulos': 1000, 'idiomas': TODOS},
+    {'nombre': 'sin_capitulos_1mb', 'tamano': 1 * MB, 'capitulos': 0, 'idiomas': ('es', 'en')},
+]
+REPETICIONES = 3
+UMBRAL = 0.10   # Empeoramiento relativo que --comparar marca como regresión
+
+
+def _contenido(indice, cap):
+    # Sin capítulos el índice devuelve tuplas (nombre, trozo)
+    return indice.contenido(cap) if isinstance(cap, dict) else cap[1]
+
+
+def etapas(ruta, ruta_epub, idioma):
+    """[(nombre, función)] en orden; cada función recibe el resultado de la anterior."""
+    def leer(_):
+        return extraccion.leer_archivo(ruta)
+
+    def indexar(texto):
+        indice = IndiceCapitulos(texto)
+        return indice, indice.capitulos()
+
+    def normalizar_capitulos(datos):
+        indice, capitulos = datos
+        for cap in capitulos:
+            normalizar(_contenido(indice, cap), idioma)
+        return datos
+
+    def responder(datos):
+        # Las mismas opciones que el proveedor JSON de Flask fuera de depuración
+        cuerpo = respuesta_capitulos('benchmark', ruta.stem, datos[1])
+        return json.dumps(cuerpo, ensure_ascii=True, sort_keys=True, separators=(',', ':'))
+
+    def leer_epub(_):
+        return extraccion.leer_libro(ruta_epub)
+
+    def indexar_secciones(datos):
+        texto, secciones = datos
+        return IndiceCapitulos(texto, secciones).capitulos()
+
+    return [
+        ('leer_archivo', leer),
+        ('indice_capitulos', indexar),
+        ('normalizar', normalizar_capitulos),
+        ('respuesta_capitulos', responder),
+        ('leer_epub', leer_epub),
+        ('indice_secciones', indexar_secciones),
+    ]
+
+
+def medir_tiempo(funcion, entrada, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        resultado = funcion(entrada)
+        tiempos.append(time.perf_counter() - inicio)
+        del resultado
+    return tiempos
+
+
+def _recolecciones():
+    return gc.get_stats()[0]['collections']
+
+
+def medir_memoria(funcion, entrada):
+    """(resultado, medidas) de una ejecución con tracemalloc."""
+    gc.collect()
+    recolecciones = _recolecciones()
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    base = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    resultado = funcion(entrada)
+    actual, pico = tracemalloc.get_traced_memory()
+    diferencia = tracemalloc.take_snapshot().compare_to(antes, 'filename')
+    tracemalloc.stop()
+    return resultado, {
+        'pico_memoria': pico - base,
+        'memoria_retenida': actual - base,
+        'bloques_retenidos': sum(d.count_diff for d in diferencia),
+        'recolecciones_gc': _recolecciones() - recolecciones,
+    }
+
+
+def medir_corpus(corpus, carpeta, repeticiones):
+    ruta = Path(carpeta) / f"{corpus['nombre']}.txt"
+    ruta_epub = ruta.with_suffix('.epub')
+    tamano = escribir_libro(ruta, corpus['tamano'], corpus['capitulos'], corpus['idiomas'])
+    tamano_epub = escribir_epub(ruta_epub, corpus['tamano'], corpus['capitulos'], corpus['idiomas'])
+    resultado = {
+        'bytes': tamano,
+        'bytes_epub': tamano_epub,
+        'capitulos_generados': corpus['capitulos'],
+        'idiomas': list(corpus['idiomas']),
+        'etapas': {},
+    }
+    entrada = None
+    for nombre, funcion in etapas(ruta, ruta_epub, corpus['idiomas'][0]):
+        tiempos = medir_tiempo(funcion, entrada, repeticiones)
+        salida, memoria = medir_memoria(funcion, entrada)
+        medida = {
+            'tiempo_min': min(tiempos),
+            'tiempo_mediana': statistics.median(tiempos),
+            'mb_s': round(tamano / MB / min(tiempos), 2) if min(tiempos) else None,
+            **memoria,
+        }
+        if nombre == 'indice_capitulos':
+            medida['capitulos'] = len(salida[1])
+        elif nombre == 'indice_secciones':
+            medida['capitulos'] = len(salida)
+        resultado['etapas'][nombre] = medida
+        print(f"   {nombre:22} {medida['tiempo_min'] * 1000:10.1f} ms"
+              f"  pico {memoria['pico_memoria'] / MB:8.1f} MB"
+              f"  retenidos {memoria['memoria_retenida'] / MB:8.1f} MB"
+              f" en {memoria['bloques_retenidos']:8,d} bloques"
+              f"  gc {memoria['recolecciones_gc']:6,d}")
+        entrada = salida
+    ruta.unlink()
+    ruta_epub.unlink()
+    return resultado
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def comparar(actual, anterior, umbral=UMBRAL):
+    """Imprime las diferencias con resultados anteriores. Devuelve cuántas regresiones hay."""
+    regresiones = 0
+    print(f"\n📊 Comparación con {anterior.get('commit') or 'resultados anteriores'}"
+          f" ({anterior.get('fecha', '?')})\n")
+    for nombre, corpus in actual['corpus'].items():
+        previo = anterior.get('corpus', {}).get(nombre)
+        if previo is None:
+            continue
+        print(f"   {nombre}")
+        for etapa, medida in corpus['etapas'].items():
+            antes = previo['etapas'].get(etapa)
+            if antes is None:
+                continue
+            tiempo = medida['tiempo_min'] / antes['tiempo_min'] - 1 if antes['tiempo_min'] else 0
+            pico = medida['pico_memoria'] / antes['pico_memoria'] - 1 if antes['pico_memoria'] else 0
+            marca = "⚠️ " if tiempo > umbral or pico > umbral else "  "
+            regresiones += marca != "  "
+            print(f"   {marca}{etapa:22} tiempo {tiempo:+7.1%}   pico {pico:+7.1%}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del procesado de texto con libros sintéticos")
+    parser.add_argument("--rapido", action="store_true", help="Usar corpus pequeños")
+    parser.add_argument("--repeticiones", "-r", type=int, default=REPETICIONES,
+                        help=f"Repeticiones para medir el tiempo (defecto: {REPETICIONES})")
+    parser.add_argument("--corpus", "-c", action="append",
+                        help="Medir sólo este corpus (se puede repetir)")
+    parser.add_argument("--salida", "-o", help="Guardar los resultados en este JSON")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--umbral", type=float, default=UMBRAL,
+                        help=f"Empeoramiento que cuenta como regresión (defecto: {UMBRAL})")
+    args = parser.parse_args()
+
+    lista = CORPUS_RAPIDO if args.rapido else CORPUS
+    if args.corpus:
+        lista = [c for c in CORPUS + CORPUS_RAPIDO if c['nombre'] in args.corpus]
+        lista = list({c['nombre']: c for c in lista}.values())
+
+    resultados = {
+        'version': 3,
+        'umbral_gc': gc.get_threshold()[0],
+        'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'repeticiones': args.repeticiones,
+        'corpus': {},
+    }
+    with tempfile.TemporaryDirectory() as carpeta:
+        for corpus in lista:
+            print(f"\n📚 {corpus['nombre']}")
+            resultados['corpus'][corpus['nombre']] = medir_corpus(corpus, carpeta, args.repeticiones)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados: {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            regresiones = comparar(resultados, json.load(f), args.umbral)
+        if regresiones:
+            print(f"\n⚠️  {regresiones} etapas han empeorado más de un {args.umbral:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
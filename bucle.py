@@ -0,0 +1,135 @@
+"""
+Event loop compartido
+=====================
+Un único event loop de larga vida para toda la síntesis: trabajos, muestras
+de voz, lista de voces y los flujos que esperan datos (SSE, audio en curso).
+
+Con el servidor de desarrollo de Flask el loop vive en un hilo propio que se
+arranca la primera vez que hace falta; en modo ASGI (asgi.py) se usa el loop
+del propio servidor. Desde los hilos de Flask se le mandan corrutinas con
+lanzar()/ejecutar().
+"""
+
+import asyncio
+import threading
+
+
+class BucleCompartido:
+    """Event loop común al que cualquier hilo puede mandar corrutinas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def usar(self, loop):
+        """Adopta un loop que ya está corriendo (el del servidor ASGI)."""
+        with self._lock:
+            if self._loop is not None and self._loop is not loop:
+                raise RuntimeError("Ya hay un event loop compartido en marcha")
+            self._loop = loop
+
+    def obtener(self):
+        """El loop compartido; si no hay ninguno se arranca en un hilo aparte."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='bucle-sintesis', daemon=True).start()
+            return self._loop
+
+    def lanzar(self, corrutina):
+        """Programa la corrutina en el loop y devuelve su concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(corrutina, self.obtener())
+
+    def ejecutar(self, corrutina, timeout=None):
+        """Ejecuta la corrutina en el loop y espera su resultado desde otro hilo."""
+        loop = self.obtener()
+        if _loop_actual() is loop:
+            corrutina.close()
+            raise RuntimeError("ejecutar() bloquearía el propio event loop compartido")
+        return asyncio.run_coroutine_threadsafe(corrutina, loop).result(timeout)
+
+
+def _loop_actual():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class Avisos:
+    """Corrutinas esperando un cambio de un objeto protegido por un lock de hilos.
+
+    nuevo() se llama con ese lock tomado, igual que avisar(): así no se pierde
+    un aviso entre comprobar el estado y ponerse a esperar.
+    """
+
+    def __init__(self):
+        self._esperas = {}   # asyncio.Future -> loop
+
+    def nuevo(self):
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._esperas[futuro] = loop
+        return futuro
+
+    def descartar(self, futuro):
+        self._esperas.pop(futuro, None)
+
+    def avisar(self):
+        for futuro, loop in self._esperas.items():
+            try:
+                loop.call_soon_threadsafe(_resolver, futuro)
+            except RuntimeError:
+                pass  # Loop ya cerrado
+        self._esperas.clear()
+
+
+def _resolver(futuro):
+    if not futuro.done():
+        futuro.set_result(None)
+
+
+async def esperar_aviso(futuro, timeout):
+    """Espera un futuro de Avisos.nuevo() como mucho `timeout` segundos."""
+    try:
+        await asyncio.wait_for(futuro, timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+class FlujoAsync:
+    """Cuerpo de respuesta hecho con un generador asíncrono del loop compartido.
+
+    El adaptador ASGI lo recorre directamente en el loop; el servidor WSGI de
+    Flask lo recorre como iterable normal, pidiendo cada trozo al loop desde
+    su hilo.
+    """
+
+    def __init__(self, generador, bucle):
+        self.generador = generador
+        self.bucle = bucle
+
+    def __aiter__(self):
+        return self.generador
+
+    def __iter__(self):
+        fin = object()
+
+        async def siguiente():
+            try:
+                return await self.generador.__anext__()
+            except StopAsyncIteration:
+                return fin
+
+        while True:
+            trozo = self.bucle.ejecutar(siguiente())
+            if trozo is fin:
+                return
+            yield trozo
+
+    def close(self):
+        """Lo llama el servidor WSGI al acabar o cortarse la respuesta."""
+        try:
+            self.bucle.ejecutar(self.generador.aclose())
+        except (RuntimeError, StopAsyncIteration):
+            pass
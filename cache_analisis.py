@@ -0,0 +1,242 @@
+"""
+Cache acotada de archivos analizados
+====================================
+Mantiene en memoria el texto y los capítulos de los archivos subidos, con un
+tope de bytes y de antigüedad. Las entradas que salen de memoria se vuelcan a
+disco en forma compacta (texto comprimido, separador elegido y secciones
+del EPUB) y se recargan al pedirlas, volviendo a dividir el texto en capítulos.
+La compresión y la lectura del disco se hacen fuera del lock.
+"""
+
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+MAX_BYTES = 512 * 1024 ** 2       # Memoria total para textos y capítulos
+TTL = 2 * 3600                    # Segundos sin uso antes de volcar a disco
+TTL_DISCO = 7 * 24 * 3600         # Segundos que se conserva un volcado
+_INTERVALO_PURGA = 3600
+_SIN_VOLCADO = object()           # La entrada no tiene un volcado al día en disco
+
+
+def _medir(info):
+    """Bytes aproximados que ocupan el texto, su índice y los capítulos."""
+    total = sys.getsizeof(info.get('texto') or '')
+    if info.get('indice') is not None:
+        total += info['indice'].tamano()
+    for cap in info.get('capitulos') or []:
+        total += sys.getsizeof(cap.get('contenido', '')) if isinstance(cap, dict) else sys.getsizeof(cap[1])
+    return total
+
+
+class CacheAnalisis:
+    """Diccionario file_id -> análisis con LRU por bytes, caducidad y volcado a disco.
+
+    El lock sólo protege las estructuras en memoria: las entradas que salen se
+    apartan en `_pendientes` y quien las saca las escribe después, fuera del
+    lock (archivo temporal y os.replace), igual que las lecturas del disco.
+    Una entrada que se recargó del disco y no ha cambiado de separador no se
+    reescribe; sólo se renueva la fecha de su volcado.
+    """
+
+    def __init__(self, carpeta, dividir, max_bytes=MAX_BYTES, ttl=TTL, ttl_disco=TTL_DISCO):
+        self.carpeta = Path(carpeta)
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        self.dividir = dividir            # dividir(info) -> capítulos
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.ttl_disco = ttl_disco
+
+        self._lock = threading.RLock()
+        # file_id -> [info, bytes, último uso, separador del volcado en disco]
+        self._entradas = OrderedDict()
+        self._pendientes = {}             # file_id -> (info, separador en disco) por volcar
+        self._bytes = 0
+        self._ultima_purga = 0.0
+        self.volcados = 0
+        self.recargas = 0
+
+    def _ruta_volcado(self, file_id):
+        return self.carpeta / f"{file_id}.json.gz"
+
+    def _escribir(self, ruta, info):
+        """Escribe la forma compacta del análisis en un temporal y devuelve su ruta."""
+        temporal = ruta.with_name(f"{ruta.name}.{uuid.uuid4().hex[:8]}.tmp")
+        datos = {
+            'ruta': info['ruta'],
+            'nombre': info['nombre'],
+            'separador': info.get('separador'),
+            'secciones': info.get('secciones'),
+            'texto': info['texto'],
+        }
+        try:
+            with gzip.open(temporal, 'wt', encoding='utf-8', compresslevel=3) as f:
+                json.dump(datos, f, ensure_ascii=False)
+        except BaseException:
+            _borrar(temporal)
+            raise
+        return temporal
+
+    def _volcar(self, salientes):
+        """Escribe en disco las entradas que han salido de memoria. Sin el lock."""
+        for file_id, pendiente in salientes:
+            info, en_disco = pendiente
+            ruta = self._ruta_volcado(file_id)
+            temporal = None
+            try:
+                try:
+                    if en_disco == info.get('separador'):
+                        os.utime(ruta)   # El volcado sigue al día: sólo renovar su antigüedad
+                    else:
+                        temporal = self._escribir(ruta, info)
+                except FileNotFoundError:
+                    temporal = self._escribir(ruta, info)   # Purgado entretanto
+            except BaseException:
+                with self._lock:
+                    if self._pendientes.get(file_id) is pendiente:
+                        del self._pendientes[file_id]
+                raise
+            with self._lock:
+                # Si entretanto salió otra versión, la escribe quien la sacó
+                if self._pendientes.get(file_id) is pendiente:
+                    del self._pendientes[file_id]
+                    if temporal is not None:
+                        os.replace(temporal, ruta)
+                        temporal = None
+                        self.volcados += 1
+                    entrada = self._entradas.get(file_id)
+                    if entrada is not None and entrada[0] is info:
+                        entrada[3] = info.get('separador')
+            if temporal is not None:
+                _borrar(temporal)
+
+    def _sacar(self, file_id, salientes):
+        """Quita una entrada de memoria y la aparta para volcarla. Requiere el lock."""
+        info, tamano, _, en_disco = self._entradas.pop(file_id)
+        self._bytes -= tamano
+        if info.get('texto'):
+            pendiente = (info, en_disco)
+            self._pendientes[file_id] = pendiente
+            salientes.append((file_id, pendiente))
+
+    def _caducar(self, salientes):
+        """Saca lo que lleva demasiado sin usarse. Requiere el lock.
+
+        Devuelve True si toca purgar los volcados viejos (ver _purgar).
+        """
+        ahora = time.time()
+        while self._entradas:
+            file_id, entrada = next(iter(self._entradas.items()))
+            if ahora - entrada[2] < self.ttl:
+                break
+            self._sacar(file_id, salientes)
+
+        if ahora - self._ultima_purga > _INTERVALO_PURGA:
+            self._ultima_purga = ahora
+            return True
+        return False
+
+    def _purgar(self):
+        """Borra los volcados que nadie ha usado en ttl_disco. Sin el lock."""
+        ahora = time.time()
+        for ruta in self.carpeta.glob('*.json.gz'):
+            try:
+                if ahora - ruta.stat().st_mtime > self.ttl_disco:
+                    ruta.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _guardar(self, file_id, info, salientes, en_disco=_SIN_VOLCADO):
+        """Mete (o vuelve a medir) una entrada y saca las que sobren. Requiere el lock."""
+        anterior = self._entradas.pop(file_id, None)
+        if anterior is not None:
+            self._bytes -= anterior[1]
+            if anterior[0] is info:
+                en_disco = anterior[3]
+        tamano = _medir(info)
+        self._entradas[file_id] = [info, tamano, time.time(), en_disco]
+        self._bytes += tamano
+        while self._bytes > self.max_bytes and len(self._entradas) > 1:
+            self._sacar(next(iter(self._entradas)), salientes)
+        return self._caducar(salientes)
+
+    def _terminar(self, salientes, purgar):
+        """Lo que queda pendiente tras soltar el lock: escribir lo sacado y purgar."""
+        if purgar:
+            self._purgar()
+        self._volcar(salientes)
+
+    def __setitem__(self, file_id, info):
+        """Guarda (o vuelve a medir tras modificarlo) un análisis."""
+        salientes = []
+        with self._lock:
+            purgar = self._guardar(file_id, info, salientes)
+        self._terminar(salientes, purgar)
+
+    def get(self, file_id, default=None):
+        salientes = []
+        with self._lock:
+            purgar = self._caducar(salientes)
+            entrada = self._entradas.get(file_id)
+            if entrada is not None:
+                entrada[2] = time.time()
+                self._entradas.move_to_end(file_id)
+                info = entrada[0]
+            elif file_id in self._pendientes:
+                # Sacado pero aún escribiéndose: vuelve tal cual
+                info, en_disco = self._pendientes[file_id]
+                purgar = self._guardar(file_id, info, salientes, en_disco) or purgar
+            else:
+                info = None
+        self._terminar(salientes, purgar)
+        if info is not None:
+            return info
+
+        try:
+            with gzip.open(self._ruta_volcado(file_id), 'rt', encoding='utf-8') as f:
+                info = json.load(f)
+        except FileNotFoundError:
+            return default
+        info['capitulos'] = self.dividir(info)
+
+        salientes = []
+        with self._lock:
+            entrada = self._entradas.get(file_id)
+            if entrada is not None:
+                return entrada[0]   # Otra petición lo recargó a la vez
+            self.recargas += 1
+            purgar = self._guardar(file_id, info, salientes, info.get('separador'))
+        self._terminar(salientes, purgar)
+        return info
+
+    def __contains__(self, file_id):
+        with self._lock:
+            if file_id in self._entradas or file_id in self._pendientes:
+                return True
+        return self._ruta_volcado(file_id).exists()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def estado(self):
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'bytes': self._bytes,
+                'pendientes': len(self._pendientes),
+                'volcados': self.volcados,
+                'recargas': self.recargas,
+            }
+
+
+def _borrar(ruta):
+    try:
+        os.unlink(ruta)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,174 @@
+"""
+Cache de audio sintetizado
+==========================
+Guarda el MP3 de cada (texto limpio, voz, formato) bajo el hash de esa tupla,
+en una carpeta con tamaño máximo que se vacía por LRU (los aciertos tocan el
+mtime del archivo). Las peticiones idénticas que llegan mientras otra está en
+vuelo esperan a la primera en lugar de llamar otra vez al servicio.
+
+Puede compartirse entre hilos y event loops, y entre el servidor y la CLI si
+apuntan a la misma carpeta.
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+# Formato por defecto de edge-tts; forma parte de la clave
+FORMATO_SALIDA = "audio-24khz-48kbitrate-mono-mp3"
+TAMANO_MAX_CACHE = 2 * 1024 ** 3  # 2 GB
+
+
+class CacheAudio:
+    """Cache direccionada por contenido con desalojo LRU por tamaño en disco."""
+
+    def __init__(self, carpeta, tamano_max=TAMANO_MAX_CACHE, formato=FORMATO_SALIDA):
+        self.carpeta = Path(carpeta)
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        self.tamano_max = tamano_max
+        self.formato = formato
+
+        self._lock = threading.Lock()
+        self._indice = OrderedDict()   # clave -> bytes, del menos al más reciente
+        self._tamano = 0
+        self._en_vuelo = {}            # clave -> Future de la primera petición
+        self.aciertos = 0
+        self.fallos = 0
+        self._cargar_indice()
+
+    def _cargar_indice(self):
+        """Reconstruye el índice LRU a partir de los mtime en disco."""
+        entradas = []
+        for ruta in self.carpeta.glob('*/*.mp3'):
+            st = ruta.stat()
+            entradas.append((st.st_mtime, ruta.stem, st.st_size))
+        for _, clave, tamano in sorted(entradas):
+            self._indice[clave] = tamano
+            self._tamano += tamano
+
+    def clave(self, texto, voz):
+        h = hashlib.sha256()
+        for parte in (voz, self.formato, texto):
+            h.update(parte.encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def _ruta(self, clave):
+        return self.carpeta / clave[:2] / f"{clave}.mp3"
+
+    def _buscar(self, clave):
+        """Devuelve la ruta si la entrada existe, marcándola como usada. Requiere el lock."""
+        ruta = self._ruta(clave)
+        if clave in self._indice:
+            try:
+                os.utime(ruta)
+            except FileNotFoundError:
+                self._tamano -= self._indice.pop(clave)
+                return None
+            self._indice.move_to_end(clave)
+            return ruta
+        if ruta.exists():
+            # La escribió otro proceso que comparte la carpeta
+            self._registrar(clave, ruta.stat().st_size)
+            return ruta
+        return None
+
+    def _registrar(self, clave, tamano):
+        """Añade una entrada y desaloja las menos usadas. Requiere el lock."""
+        if clave in self._indice:
+            self._tamano -= self._indice.pop(clave)
+        self._indice[clave] = tamano
+        self._tamano += tamano
+        while self._tamano > self.tamano_max and len(self._indice) > 1:
+            vieja, tam = self._indice.popitem(last=False)
+            self._tamano -= tam
+            try:
+                self._ruta(vieja).unlink()
+            except FileNotFoundError:
+                pass
+
+    async def materializar(self, texto, voz, destino, generar):
+        """Deja en `destino` el audio de (texto, voz).
+
+        Si no está en cache se llama a `generar(ruta)` para crearlo; si otra
+        petición idéntica ya lo está generando se espera a que termine.
+        Devuelve True si lo generó esta llamada y False si salió de la cache.
+        """
+        clave = self.clave(texto, voz)
+        while True:
+            with self._lock:
+                ruta = self._buscar(clave)
+                if ruta is None:
+                    futuro = self._en_vuelo.get(clave)
+                    propietario = futuro is None
+                    if propietario:
+                        futuro = Future()
+                        self._en_vuelo[clave] = futuro
+
+            if ruta is not None:
+                try:
+                    _copiar(ruta, destino)
+                except FileNotFoundError:
+                    continue  # Desalojada entre la búsqueda y la copia
+                with self._lock:
+                    self.aciertos += 1
+                return False
+
+            if not propietario:
+                await asyncio.wrap_future(futuro)
+                continue
+
+            ruta = self._ruta(clave)
+            ruta.parent.mkdir(exist_ok=True)
+            temporal = ruta.with_name(f"{clave}.{uuid.uuid4().hex[:8]}.tmp")
+            try:
+                await generar(str(temporal))
+                os.replace(temporal, ruta)
+                with self._lock:
+                    self.fallos += 1
+                    self._registrar(clave, ruta.stat().st_size)
+                    del self._en_vuelo[clave]
+                _copiar(ruta, destino)
+                futuro.set_result(None)
+                return True
+            except Exception as e:
+                with self._lock:
+                    self._en_vuelo.pop(clave, None)
+                futuro.set_exception(e)
+                raise
+            except BaseException:
+                # Cancelada: las peticiones en espera lo intentarán ellas mismas
+                with self._lock:
+                    self._en_vuelo.pop(clave, None)
+                futuro.set_result(None)
+                raise
+            finally:
+                if temporal.exists():
+                    temporal.unlink()
+
+    def estado(self):
+        with self._lock:
+            return {
+                'entradas': len(self._indice),
+                'bytes': self._tamano,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+            }
+
+
+def _copiar(origen, destino):
+    """Enlaza (o copia si no se puede) el audio cacheado al destino de forma atómica."""
+    temporal = f"{destino}.part"
+    if os.path.exists(temporal):
+        os.unlink(temporal)
+    try:
+        os.link(origen, temporal)
+    except OSError:
+        shutil.copyfile(origen, temporal)
+    os.replace(temporal, destino)
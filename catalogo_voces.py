@@ -0,0 +1,179 @@
+"""
+Catálogo de voces de edge-tts
+=============================
+Guarda en disco la lista de voces del servicio con una caducidad (TTL) y la
+refresca en segundo plano: mientras tanto se sigue sirviendo la copia
+anterior, así que sólo la primera ejecución sin copia en disco espera a la
+red.
+
+Cada vez que llega una lista nueva se construyen de una pasada los índices
+por prefijo de locale ('es', 'es-MX', 'zh-CN-liaoning') y género, y las
+respuestas ya serializadas de /idiomas y /voces/<locale>.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+TTL = 24 * 3600          # Segundos antes de pedir otra vez la lista al servicio
+ESPERA_PRIMERA = 30      # Segundos que espera una petición si aún no hay catálogo
+
+
+def _listar_voces():
+    import edge_tts
+    return asyncio.run(edge_tts.list_voices())
+
+
+def _serializar(datos):
+    return json.dumps(datos).encode('utf-8')
+
+
+class _Instantanea:
+    """Catálogo construido a partir de una lista de voces; no se modifica."""
+
+    def __init__(self, todas, nombres_idiomas, nombres_regiones, serializar):
+        por_locale = {}
+        idiomas = {}
+        for v in todas:
+            locale = v['Locale']
+            partes = locale.split('-')
+            lang_code = partes[0]
+            region_code = partes[1] if len(partes) >= 2 else ''
+            region_nombre = nombres_regiones.get(region_code, region_code)
+
+            if locale not in por_locale:
+                por_locale[locale] = []
+                idioma = idiomas.setdefault(lang_code, {
+                    'codigo': lang_code,
+                    'nombre': nombres_idiomas.get(lang_code, lang_code),
+                    'locales': {}
+                })
+                idioma['locales'][locale] = {
+                    'codigo': locale,
+                    'nombre': f"{nombres_idiomas.get(lang_code, lang_code)} ({region_nombre})",
+                    'voces_count': 0
+                }
+            por_locale[locale].append({
+                'id': v['ShortName'],
+                'nombre': v['ShortName'].split('-')[-1].replace('Neural', ''),
+                'region': region_nombre,
+                'genero': 'Masculino' if v['Gender'] == 'Male' else 'Femenino',
+                'locale': locale
+            })
+            idiomas[lang_code]['locales'][locale]['voces_count'] += 1
+
+        # Prefijos de locale por partes completas: 'zh', 'zh-CN', 'zh-CN-liaoning'
+        self.por_prefijo = {}
+        for locale, voces in por_locale.items():
+            partes = locale.split('-')
+            for n in range(1, len(partes) + 1):
+                self.por_prefijo.setdefault('-'.join(partes[:n]), []).extend(voces)
+        self.por_genero = {}
+        for prefijo, voces in self.por_prefijo.items():
+            for voz in voces:
+                self.por_genero.setdefault((prefijo, voz['genero']), []).append(voz)
+
+        self.idiomas = [
+            {
+                'codigo': code,
+                'nombre': info['nombre'],
+                'locales': sorted(info['locales'].values(), key=lambda l: l['nombre'])
+            }
+            for code, info in sorted(idiomas.items(), key=lambda x: x[1]['nombre'])
+        ]
+        self.respuesta_idiomas = serializar(self.idiomas)
+        self.respuestas_voces = {p: serializar(v) for p, v in self.por_prefijo.items()}
+        self.respuestas_genero = {c: serializar(v) for c, v in self.por_genero.items()}
+
+
+class CatalogoVoces:
+    """Voces disponibles con copia en disco, TTL y refresco en segundo plano."""
+
+    def __init__(self, ruta, nombres_idiomas, nombres_regiones, ttl=TTL,
+                 listar=_listar_voces, serializar=_serializar):
+        self.ruta = Path(ruta)
+        self.nombres_idiomas = nombres_idiomas
+        self.nombres_regiones = nombres_regiones
+        self.ttl = ttl
+        self.listar = listar              # listar() -> lista de voces de edge-tts
+        self.serializar = serializar      # serializar(datos) -> bytes de la respuesta
+
+        self._lock = threading.Lock()
+        self._listo = threading.Event()
+        self._refrescando = False
+        self._instantanea = None
+        self.obtenido = 0.0
+        self.error = None
+        self._cargar_disco()
+
+    def _cargar_disco(self):
+        try:
+            with open(self.ruta, encoding='utf-8') as f:
+                guardado = json.load(f)
+            self._publicar(guardado['voces'], guardado['obtenido'])
+            self._listo.set()
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+    def _publicar(self, todas, obtenido):
+        # Se sustituye de golpe: quien esté leyendo la anterior no ve estados a medias
+        self._instantanea = _Instantanea(todas, self.nombres_idiomas, self.nombres_regiones, self.serializar)
+        self.obtenido = obtenido
+
+    def _refrescar(self):
+        try:
+            todas = self.listar()
+            obtenido = time.time()
+            self._publicar(todas, obtenido)
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            temporal = self.ruta.with_suffix('.tmp')
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump({'obtenido': obtenido, 'voces': todas}, f, ensure_ascii=False)
+            os.replace(temporal, self.ruta)
+            self.error = None
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            with self._lock:
+                self._refrescando = False
+            self._listo.set()   # Despierta a quien espera, aunque sea para darle el error
+
+    def refrescar(self):
+        """Pide la lista al servicio en un hilo aparte, si no se está pidiendo ya."""
+        with self._lock:
+            if self._refrescando:
+                return
+            self._refrescando = True
+            if self._instantanea is None:
+                self._listo.clear()
+        threading.Thread(target=self._refrescar, daemon=True).start()
+
+    def iniciar(self):
+        """Refresca en segundo plano si no hay copia o está caducada."""
+        if self._instantanea is None or time.time() - self.obtenido > self.ttl:
+            self.refrescar()
+
+    def _actual(self):
+        """Instantánea vigente; si no hay ninguna espera a la primera descarga."""
+        self.iniciar()
+        if self._instantanea is None:
+            self._listo.wait(ESPERA_PRIMERA)
+        if self._instantanea is None:
+            raise RuntimeError(self.error or 'El catálogo de voces aún no está disponible')
+        return self._instantanea
+
+    def respuesta_idiomas(self):
+        return self._actual().respuesta_idiomas
+
+    def respuesta_voces(self, prefijo, genero=None):
+        """JSON de las voces del locale o idioma `prefijo`, o None si no hay ninguna."""
+        instantanea = self._actual()
+        if genero:
+            return instantanea.respuestas_genero.get((prefijo, genero))
+        return instantanea.respuestas_voces.get(prefijo)
+
+    def voces(self, prefijo):
+        return self._actual().por_prefijo.get(prefijo, [])
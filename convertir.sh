@@ -1,5 +1,7 @@
 #!/bin/bash
 # Script auxiliar para ejecutar el conversor de audiolibros
+# Acepta un libro, o una carpeta o patrón para convertir en lote (p. ej. desde cron):
+#   ./convertir.sh ./bandeja --jobs 8 --tasa 4
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 VENV_PYTHON="$SCRIPT_DIR/venv/bin/python"
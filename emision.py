@@ -0,0 +1,198 @@
+"""
+Emisión progresiva de audio
+===========================
+Mientras un capítulo se sintetiza, su MP3 se va publicando en orden en una
+EmisionAudio; cualquier número de oyentes la lee desde el principio y recibe
+cada trozo en cuanto llega. El registro Emisiones guarda las que están en
+curso por clave (job_id, cap_id).
+
+En memoria sólo queda la cola de lo último escrito (COLA_MEMORIA bytes): quien
+escribe vuelca el mismo audio en un archivo (volcar_en) y el oyente que se
+queda atrás lo lee de ahí. Si el archivo ya se renombró al terminar, se sigue
+desde el MP3 definitivo que indique el oyente.
+
+Se escribe y se lee desde el event loop compartido (ver bucle.py), pero las
+peticiones de Flask consultan el registro desde sus hilos, así que el estado
+va protegido con locks de hilos.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from bucle import Avisos, esperar_aviso
+
+ESPERA_LECTURA = 30          # Segundos máximos sin datos antes de volver a comprobar
+COLA_MEMORIA = 256 * 1024    # Bytes más recientes que se sirven desde memoria
+BLOQUE_DISCO = 64 * 1024     # Bytes por lectura del volcado en disco
+
+
+class EmisionAudio:
+    """Audio de un capítulo en curso, legible por varios oyentes a la vez."""
+
+    def __init__(self, cola_memoria=COLA_MEMORIA):
+        self._lock = threading.Lock()
+        self._avisos = Avisos()
+        self._cola = deque()      # Trozos más recientes, desde la posición _inicio_cola
+        self._inicio_cola = 0
+        self.cola_memoria = cola_memoria
+        self.ruta = None          # Archivo con todo lo escrito (mientras se escribe)
+        self.cerrada = False
+        self.bytes = 0
+        self.primer_dato = None   # Instante (monotonic) del primer trozo escrito
+
+    def volcar_en(self, ruta):
+        """Indica el archivo donde quien escribe deja ya en disco cada trozo antes de publicarlo."""
+        with self._lock:
+            self.ruta = str(ruta)
+
+    def escribir(self, datos):
+        if not datos:
+            return
+        with self._lock:
+            if self.primer_dato is None:
+                self.primer_dato = time.monotonic()
+            self._cola.append(bytes(datos))
+            self.bytes += len(datos)
+            # Sin archivo de respaldo no se puede soltar nada de memoria
+            exceso = self.bytes - self._inicio_cola - self.cola_memoria if self.ruta is not None else 0
+            while exceso > 0:
+                primero = self._cola[0]
+                if len(primero) <= exceso:
+                    self._cola.popleft()
+                    recorte = len(primero)
+                else:
+                    self._cola[0] = primero[exceso:]
+                    recorte = exceso
+                self._inicio_cola += recorte
+                exceso -= recorte
+            self._avisos.avisar()
+
+    def rebobinar(self, posicion):
+        """Descarta lo escrito desde `posicion` (un reintento vuelve a escribirlo)."""
+        with self._lock:
+            if posicion >= self.bytes:
+                return
+            if posicion <= self._inicio_cola:
+                self._cola.clear()
+                self._inicio_cola = posicion
+            else:
+                fin = self.bytes
+                while fin - len(self._cola[-1]) >= posicion:
+                    fin -= len(self._cola.pop())
+                if fin > posicion:
+                    ultimo = self._cola.pop()
+                    self._cola.append(ultimo[:len(ultimo) - (fin - posicion)])
+            self.bytes = posicion
+
+    def cerrar(self):
+        with self._lock:
+            self.cerrada = True
+            self._avisos.avisar()
+
+    async def _esperar(self, cambio):
+        """Espera un aviso si cambio() sigue siendo False (se evalúa con el lock)."""
+        with self._lock:
+            if cambio():
+                return
+            aviso = self._avisos.nuevo()
+        try:
+            await esperar_aviso(aviso, ESPERA_LECTURA)
+        finally:
+            with self._lock:
+                self._avisos.descartar(aviso)
+
+    async def leer(self, respaldo=None):
+        """Generador asíncrono con todo el audio desde el principio, hasta que se cierre.
+
+        `respaldo` es el MP3 terminado, del que se lee lo que ya no está en
+        memoria si el volcado en curso ha desaparecido.
+        """
+        posicion = 0
+        while True:
+            with self._lock:
+                if posicion < self._inicio_cola:
+                    ruta, hasta = self.ruta, self._inicio_cola
+                    nuevos = None
+                else:
+                    nuevos = []
+                    inicio = self._inicio_cola
+                    for trozo in self._cola:
+                        if inicio + len(trozo) > posicion:
+                            nuevos.append(trozo[max(0, posicion - inicio):])
+                        inicio += len(trozo)
+                    cerrada = self.cerrada
+
+            if nuevos is None:
+                try:
+                    datos = _leer_rango(ruta, posicion, hasta)
+                except FileNotFoundError:
+                    # Renombrado al terminar: seguir desde el MP3 definitivo
+                    await self._esperar(lambda: self.cerrada)
+                    if not self.cerrada or respaldo is None:
+                        continue
+                    try:
+                        datos = _leer_rango(respaldo, posicion, self.bytes)
+                    except FileNotFoundError:
+                        return
+                if not datos:
+                    return
+                posicion += len(datos)
+                yield datos
+                continue
+
+            if nuevos:
+                for trozo in nuevos:
+                    posicion += len(trozo)
+                    yield trozo
+                continue
+            if cerrada:
+                return
+            await self._esperar(lambda: self.cerrada or self.bytes > posicion)
+
+
+def _leer_rango(ruta, desde, hasta):
+    """Como mucho BLOQUE_DISCO bytes de `ruta` desde `desde` sin pasar de `hasta`."""
+    with open(ruta, 'rb') as f:
+        f.seek(desde)
+        return f.read(min(BLOQUE_DISCO, hasta - desde))
+
+
+class Emisiones:
+    """Emisiones en curso por clave, con espera a que aparezca una."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._activas = {}
+
+    @contextmanager
+    def abrir(self, clave):
+        """Registra una emisión mientras dura el bloque y la cierra al salir.
+
+        Quien escribe debe dejar el MP3 definitivo en disco antes de salir, para
+        que un oyente que llegue después lo encuentre.
+        """
+        emision = EmisionAudio()
+        with self._cond:
+            self._activas[clave] = emision
+            self._cond.notify_all()
+        try:
+            yield emision
+        finally:
+            emision.cerrar()
+            with self._cond:
+                if self._activas.get(clave) is emision:
+                    del self._activas[clave]
+                self._cond.notify_all()
+
+    def get(self, clave):
+        with self._cond:
+            return self._activas.get(clave)
+
+    def esperar(self, clave, timeout):
+        """Espera a que cambien las emisiones (o `timeout`) y devuelve la de `clave`."""
+        with self._cond:
+            if clave not in self._activas:
+                self._cond.wait(timeout)
+            return self._activas.get(clave)
@@ -0,0 +1,146 @@
+"""
+ZIP en flujo
+============
+Genera un ZIP sin compresión (STORE) a medida que se envía, sin archivos
+temporales y con un solo bloque en memoria cada vez.
+
+Como los archivos ya están en disco, de cada uno se calcula primero el CRC-32
+y la cabecera local se escribe completa (CRC y tamaños), sin descriptores de
+datos: hay lectores en flujo, como ZipInputStream de Java, que no aceptan
+descriptores en entradas STORE. Las dos lecturas se hacen sobre el mismo
+descriptor abierto, así que un os.replace del archivo entre ambas no cambia
+lo que se envía. Las entradas, tamaños o posiciones que no caben en 32 bits
+usan las extensiones ZIP64.
+"""
+
+import os
+import struct
+import time
+import zlib
+
+TAMANO_BLOQUE = 256 * 1024
+
+_LOCAL = struct.Struct('<IHHHHHIIIHH')
+_CENTRAL = struct.Struct('<IHHHHHHIIIHHHHHII')
+_FIN = struct.Struct('<IHHHHIIH')
+_FIN_ZIP64 = struct.Struct('<IQHHIIQQQQ')
+_LOCALIZADOR_ZIP64 = struct.Struct('<IIQI')
+
+_FIRMA_LOCAL = 0x04034b50
+_FIRMA_CENTRAL = 0x02014b50
+_FIRMA_FIN = 0x06054b50
+_FIRMA_FIN_ZIP64 = 0x06064b50
+_FIRMA_LOCALIZADOR_ZIP64 = 0x07064b50
+
+_VERSION = 20           # 2.0: entradas STORE normales
+_VERSION_ZIP64 = 45     # 4.5: con extensiones ZIP64
+_CREADO_EN = 3 << 8     # Sistema de origen Unix, para que se respeten los permisos
+_NOMBRE_UTF8 = 1 << 11
+_PERMISOS = 0o100644 << 16
+_LIMITE_32 = 0xFFFFFFFF
+_LIMITE_16 = 0xFFFF
+
+
+def _fecha_dos(mtime):
+    """(hora, fecha) en formato MS-DOS, que sólo admite años de 1980 a 2107."""
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1                                   # 1980-01-01 00:00:00
+    if t.tm_year > 2107:
+        return (23 << 11) | (59 << 5) | 29, (127 << 9) | (12 << 5) | 31
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+def _crc(f, tamano, tamano_bloque):
+    """CRC-32 de los `tamano` primeros bytes de `f`; deja el archivo al principio."""
+    crc = 0
+    leidos = 0
+    while leidos < tamano:
+        bloque = f.read(min(tamano_bloque, tamano - leidos))
+        if not bloque:
+            raise OSError(f"{f.name}: el archivo se ha acortado mientras se leía")
+        crc = zlib.crc32(bloque, crc)
+        leidos += len(bloque)
+    f.seek(0)
+    return crc
+
+
+def _extra_zip64(*valores):
+    """Campo extra ZIP64 con los valores (tamaños, posición) que no caben en 32 bits."""
+    if not valores:
+        return b''
+    return struct.pack(f'<HH{len(valores)}Q', 1, 8 * len(valores), *valores)
+
+
+def _directorio_central(entradas, inicio):
+    """Directorio central y registro final del ZIP, que empieza en la posición `inicio`."""
+    partes = []
+    zip64 = False
+    for nombre, crc, tamano, hora, fecha, posicion in entradas:
+        grandes = [tamano, tamano] if tamano >= _LIMITE_32 else []
+        if posicion >= _LIMITE_32:
+            grandes.append(posicion)
+        extra = _extra_zip64(*grandes)
+        zip64 = zip64 or bool(grandes)
+        partes.append(_CENTRAL.pack(
+            _FIRMA_CENTRAL, _CREADO_EN | _VERSION_ZIP64, _VERSION_ZIP64 if grandes else _VERSION,
+            _NOMBRE_UTF8, 0, hora, fecha, crc,
+            min(tamano, _LIMITE_32), min(tamano, _LIMITE_32),
+            len(nombre), len(extra), 0, 0, 0, _PERMISOS, min(posicion, _LIMITE_32),
+        ) + nombre + extra)
+    central = b''.join(partes)
+
+    total = len(entradas)
+    fin = inicio + len(central)
+    if zip64 or total >= _LIMITE_16 or len(central) >= _LIMITE_32 or inicio >= _LIMITE_32:
+        partes = [central, _FIN_ZIP64.pack(
+            _FIRMA_FIN_ZIP64, _FIN_ZIP64.size - 12, _CREADO_EN | _VERSION_ZIP64, _VERSION_ZIP64,
+            0, 0, total, total, len(central), inicio,
+        ), _LOCALIZADOR_ZIP64.pack(_FIRMA_LOCALIZADOR_ZIP64, 0, fin, 1)]
+    else:
+        partes = [central]
+    partes.append(_FIN.pack(
+        _FIRMA_FIN, 0, 0, min(total, _LIMITE_16), min(total, _LIMITE_16),
+        min(len(central), _LIMITE_32), min(inicio, _LIMITE_32), 0,
+    ))
+    return b''.join(partes)
+
+
+def zip_en_flujo(archivos, tamano_bloque=TAMANO_BLOQUE):
+    """Generador de bytes del ZIP con `archivos`: iterable de (nombre en el ZIP, ruta).
+
+    Las rutas que desaparecen antes de leerlas se omiten.
+    """
+    entradas = []
+    posicion = 0
+    for nombre, ruta in archivos:
+        try:
+            f = open(ruta, 'rb')
+        except FileNotFoundError:
+            continue
+        with f:
+            st = os.fstat(f.fileno())
+            tamano = st.st_size
+            crc = _crc(f, tamano, tamano_bloque)
+            hora, fecha = _fecha_dos(st.st_mtime)
+            nombre = nombre.encode('utf-8')
+            grande = tamano >= _LIMITE_32
+            extra = _extra_zip64(tamano, tamano) if grande else b''
+            cabecera = _LOCAL.pack(
+                _FIRMA_LOCAL, _VERSION_ZIP64 if grande else _VERSION, _NOMBRE_UTF8, 0, hora, fecha, crc,
+                min(tamano, _LIMITE_32), min(tamano, _LIMITE_32), len(nombre), len(extra),
+            ) + nombre + extra
+            yield cabecera
+
+            enviados = 0
+            while enviados < tamano:
+                bloque = f.read(min(tamano_bloque, tamano - enviados))
+                if not bloque:
+                    raise OSError(f"{ruta}: el archivo se ha acortado mientras se enviaba")
+                enviados += len(bloque)
+                yield bloque
+        entradas.append((nombre, crc, tamano, hora, fecha, posicion))
+        posicion += len(cabecera) + tamano
+
+    yield _directorio_central(entradas, posicion)
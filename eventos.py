@@ -0,0 +1,73 @@
+"""
+Bus de eventos de progreso
+==========================
+Los trabajos publican aquí sólo los cambios (capítulo empezado o terminado,
+pausa del servicio, error, fin) y los flujos SSE los reparten a quien escucha.
+Cada evento lleva un id global creciente; se guarda un historial acotado para
+que un cliente que se reconecta con Last-Event-ID reciba lo que se perdió.
+
+Se puede publicar desde cualquier hilo (el event loop compartido, los de
+Flask), así que el estado va protegido con un lock; los flujos SSE esperan
+como corrutinas en el event loop compartido (ver bucle.py).
+"""
+
+import threading
+from collections import deque
+
+from bucle import Avisos, esperar_aviso
+
+HISTORIAL = 10000   # Eventos recientes que se pueden repetir al reconectar
+
+
+class BusEventos:
+    """Eventos numerados por trabajo (o globales, con job_id None)."""
+
+    def __init__(self, historial=HISTORIAL):
+        self._lock = threading.Lock()
+        self._avisos = Avisos()
+        self._eventos = deque(maxlen=historial)
+        self._ultimo = 0
+
+    def publicar(self, job_id, tipo, datos=None):
+        """Añade un evento y despierta a los flujos en espera. Devuelve su id."""
+        with self._lock:
+            self._ultimo += 1
+            evento = dict(datos or {}, id=self._ultimo, job_id=job_id, tipo=tipo)
+            self._eventos.append(evento)
+            self._avisos.avisar()
+            return self._ultimo
+
+    def ultimo_id(self):
+        with self._lock:
+            return self._ultimo
+
+    def perdido(self, ultimo_id):
+        """True si ya no quedan en el historial todos los eventos posteriores a `ultimo_id`."""
+        with self._lock:
+            return ultimo_id > self._ultimo or (
+                bool(self._eventos) and ultimo_id < self._eventos[0]['id'] - 1
+            )
+
+    async def esperar(self, ultimo_id, jobs, timeout):
+        """Espera eventos posteriores a `ultimo_id` (o `timeout` segundos).
+
+        Devuelve (eventos de `jobs` o globales, id hasta el que se ha leído).
+        Si no ha pasado nada, el id devuelto es el mismo que se pasó.
+        """
+        with self._lock:
+            aviso = self._avisos.nuevo() if self._ultimo <= ultimo_id else None
+        if aviso is not None:
+            try:
+                await esperar_aviso(aviso, timeout)
+            finally:
+                with self._lock:
+                    self._avisos.descartar(aviso)
+        with self._lock:
+            eventos = []
+            for evento in reversed(self._eventos):
+                if evento['id'] <= ultimo_id:
+                    break
+                if evento['job_id'] is None or evento['job_id'] in jobs:
+                    eventos.append(evento)
+            eventos.reverse()
+            return eventos, max(ultimo_id, self._ultimo)
@@ -0,0 +1,213 @@
+"""
+Exportación a un único MP3 con capítulos
+========================================
+Une los MP3 de los capítulos copiando sus tramas tal cual (sin decodificar
+ni recodificar) detrás de una etiqueta ID3v2.3 con marcas de capítulo
+CHAP/CTOC, que entienden la mayoría de reproductores de audiolibros y
+podcasts. La duración de cada capítulo se obtiene de las cabeceras MPEG
+(cabecera Xing/VBRI si la hay; si no, por tasa de bits constante), así que
+no hace falta recorrer el audio y un libro de 50 horas tarda lo que tarde
+copiar el archivo.
+
+No se genera M4B: su audio debe ser AAC y eso obligaría a recodificar.
+"""
+
+import os
+import struct
+import uuid
+
+_BLOQUE_COPIA = 1024 * 1024
+_BUSQUEDA_SYNC = 64 * 1024           # Bytes donde buscar la primera trama
+_MAX_ENTRADAS_CTOC = 255             # Límite del contador de un CTOC
+
+# Layer III: kbps por índice, según versión MPEG
+_TASAS_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_TASAS_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+_MUESTREOS = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+class ErrorExportacion(Exception):
+    pass
+
+
+def _cabecera_trama(datos, pos):
+    """Datos de la trama MPEG-1/2/2.5 Layer III en `pos`, o None si no hay una válida."""
+    if pos + 4 > len(datos):
+        return None
+    b = int.from_bytes(datos[pos:pos + 4], 'big')
+    version = (b >> 19) & 3
+    if (b >> 21) & 0x7FF != 0x7FF or version == 1 or (b >> 17) & 3 != 1:
+        return None
+    indice_tasa = (b >> 12) & 0xF
+    indice_muestreo = (b >> 10) & 3
+    if indice_tasa in (0, 15) or indice_muestreo == 3:
+        return None
+    tasa = (_TASAS_V1 if version == 3 else _TASAS_V2)[indice_tasa] * 1000
+    muestreo = _MUESTREOS[version][indice_muestreo]
+    muestras = 1152 if version == 3 else 576
+    relleno = (b >> 9) & 1
+    return {
+        'version': version,
+        'mono': (b >> 6) & 3 == 3,
+        'tasa': tasa,
+        'muestreo': muestreo,
+        'muestras': muestras,
+        'largo': muestras // 8 * tasa // muestreo + relleno,
+    }
+
+
+def _tamano_id3(cabecera):
+    """Bytes que ocupa una etiqueta ID3v2 a partir de sus 10 bytes de cabecera."""
+    t = cabecera[6:10]
+    tamano = (t[0] << 21) | (t[1] << 14) | (t[2] << 7) | t[3]
+    pie = 10 if cabecera[5] & 0x10 else 0
+    return 10 + tamano + pie
+
+
+def analizar_mp3(ruta):
+    """Devuelve (inicio, fin, segundos): rango de bytes del audio y su duración.
+
+    Se omiten las etiquetas ID3v2/ID3v1 y la trama Xing/Info/VBRI, para que
+    al concatenar no queden metadatos en mitad del archivo.
+    """
+    tamano = os.path.getsize(ruta)
+    with open(ruta, 'rb') as f:
+        inicio = 0
+        cabecera = f.read(10)
+        while cabecera[:3] == b'ID3' and len(cabecera) == 10:
+            inicio += _tamano_id3(cabecera)
+            f.seek(inicio)
+            cabecera = f.read(10)
+        fin = tamano
+        if tamano - inicio >= 128:
+            f.seek(tamano - 128)
+            if f.read(3) == b'TAG':
+                fin -= 128
+
+        f.seek(inicio)
+        datos = f.read(_BUSQUEDA_SYNC)
+
+    # Primera trama seguida de otra trama válida (descarta falsos sync)
+    trama = None
+    for pos in range(len(datos) - 3):
+        if datos[pos] != 0xFF:
+            continue
+        trama = _cabecera_trama(datos, pos)
+        if trama and (pos + trama['largo'] >= len(datos)
+                      or _cabecera_trama(datos, pos + trama['largo'])):
+            break
+        trama = None
+    if trama is None:
+        raise ErrorExportacion(f"{os.path.basename(ruta)} no parece un MP3 (Layer III)")
+    inicio += pos
+
+    # Cabecera de VBR: trae el número de tramas y no contiene audio
+    if trama['version'] == 3:
+        lado = 17 if trama['mono'] else 32
+    else:
+        lado = 9 if trama['mono'] else 17
+    xing = pos + 4 + lado
+    tramas = None
+    if datos[xing:xing + 4] in (b'Xing', b'Info'):
+        if struct.unpack('>I', datos[xing + 4:xing + 8])[0] & 1:
+            tramas = struct.unpack('>I', datos[xing + 8:xing + 12])[0]
+        inicio += trama['largo']
+    elif datos[pos + 36:pos + 40] == b'VBRI':
+        tramas = struct.unpack('>I', datos[pos + 50:pos + 54])[0]
+        inicio += trama['largo']
+
+    if tramas is not None:
+        segundos = tramas * trama['muestras'] / trama['muestreo']
+    else:
+        segundos = (fin - inicio) * 8 / trama['tasa']
+    return inicio, fin, segundos
+
+
+# --- ID3v2.3 ---
+
+def _trama_id3(identificador, contenido):
+    return identificador.encode('ascii') + struct.pack('>IH', len(contenido), 0) + contenido
+
+
+def _texto_id3(identificador, texto):
+    # Codificación 1: UTF-16 con BOM (ID3v2.3 no admite UTF-8)
+    return _trama_id3(identificador, b'\x01' + texto.encode('utf-16'))
+
+
+def _ctoc(elemento, hijos, titulo=None, raiz=False):
+    banderas = 0x03 if raiz else 0x01   # Nivel superior + ordenado
+    contenido = elemento.encode('latin-1') + b'\x00' + bytes([banderas, len(hijos)])
+    contenido += b''.join(h.encode('latin-1') + b'\x00' for h in hijos)
+    if titulo:
+        contenido += _texto_id3('TIT2', titulo)
+    return _trama_id3('CTOC', contenido)
+
+
+def etiqueta_capitulos(titulo, marcas):
+    """Etiqueta ID3v2.3 con TIT2, CTOC y un CHAP por marca {'titulo', 'inicio', 'fin'} (s)."""
+    tramas = []
+    if titulo:
+        tramas.append(_texto_id3('TIT2', titulo))
+
+    ids = [f"chp{i}" for i in range(len(marcas))]
+    if len(ids) <= _MAX_ENTRADAS_CTOC:
+        tramas.append(_ctoc('toc', ids, titulo, raiz=True))
+    else:
+        # Más de 255 capítulos: un CTOC raíz con CTOC hijos de hasta 255
+        grupos = [ids[i:i + _MAX_ENTRADAS_CTOC] for i in range(0, len(ids), _MAX_ENTRADAS_CTOC)]
+        hijos = [f"toc{n}" for n in range(len(grupos))]
+        tramas.append(_ctoc('toc', hijos, titulo, raiz=True))
+        tramas.extend(_ctoc(h, g) for h, g in zip(hijos, grupos))
+
+    for elemento, marca in zip(ids, marcas):
+        contenido = elemento.encode('latin-1') + b'\x00' + struct.pack(
+            '>IIII',
+            int(round(marca['inicio'] * 1000)),
+            int(round(marca['fin'] * 1000)),
+            0xFFFFFFFF, 0xFFFFFFFF,    # Sin desplazamientos en bytes: mandan los tiempos
+        ) + _texto_id3('TIT2', marca['titulo'])
+        tramas.append(_trama_id3('CHAP', contenido))
+
+    cuerpo = b''.join(tramas)
+    n = len(cuerpo)
+    tamano = bytes([(n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F])
+    return b'ID3\x03\x00\x00' + tamano + cuerpo
+
+
+def exportar_mp3(capitulos, destino, titulo=None):
+    """Une `capitulos` ([(título, ruta mp3)]) en `destino` con marcas de capítulo.
+
+    Devuelve las marcas [{'titulo', 'inicio', 'fin'}] en segundos. El archivo se
+    escribe con un nombre temporal y se renombra al terminar.
+    """
+    if not capitulos:
+        raise ErrorExportacion("No hay capítulos que exportar")
+
+    rangos, marcas = [], []
+    posicion = 0.0
+    for titulo_cap, ruta in capitulos:
+        inicio, fin, segundos = analizar_mp3(ruta)
+        rangos.append((ruta, inicio, fin))
+        marcas.append({'titulo': titulo_cap, 'inicio': posicion, 'fin': posicion + segundos})
+        posicion += segundos
+
+    temporal = f"{destino}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        with open(temporal, 'wb') as salida:
+            salida.write(etiqueta_capitulos(titulo, marcas))
+            for ruta, inicio, fin in rangos:
+                with open(ruta, 'rb') as f:
+                    f.seek(inicio)
+                    restante = fin - inicio
+                    while restante > 0:
+                        bloque = f.read(min(_BLOQUE_COPIA, restante))
+                        if not bloque:
+                            break
+                        salida.write(bloque)
+                        restante -= len(bloque)
+        os.replace(temporal, destino)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.unlink(temporal)
+        raise
+    return marcas
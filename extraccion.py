@@ -0,0 +1,366 @@
+"""
+Extracción de texto de libros
+=============================
+Motor común a la interfaz web y a la CLI. Los PDF grandes se reparten en
+bloques de páginas entre varios procesos y el texto se vuelve a montar en
+orden; cada bloque terminado se notifica como progreso por página.
+
+Los EPUB se leen sin herramientas externas: se recorre el spine del OPF y se
+analiza cada documento XHTML por separado, tomando los capítulos del índice.
+Si el índice enlaza varios capítulos dentro de un mismo documento
+(cap.xhtml#c2), el documento se parte en esas anclas.
+
+leer_libro y leer_archivo eligen el lector por la extensión (.txt, .pdf,
+.epub); no dependen de Flask y se pueden importar sin arrancar la app.
+"""
+
+import codecs
+import os
+import posixpath
+import re
+import subprocess
+import xml.etree.ElementTree as ET
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import unquote
+
+PAGINAS_POR_BLOQUE = 20   # Páginas mínimas por tarea del pool
+
+
+def _extraer_bloque(ruta, inicio, fin):
+    """Extrae las páginas [inicio, fin) en un proceso aparte."""
+    from PyPDF2 import PdfReader
+    reader = PdfReader(ruta)
+    return ''.join(reader.pages[i].extract_text() or '' for i in range(inicio, fin))
+
+
+def extraer_texto_pdf(ruta, workers=None, progreso=None):
+    """Extrae el texto de un PDF usando hasta `workers` procesos.
+
+    `progreso(paginas_hechas, total)` se llama a medida que avanzan las páginas.
+    Con un solo worker, o pocas páginas, se extrae en este mismo proceso.
+    """
+    from PyPDF2 import PdfReader
+
+    ruta = str(ruta)
+    reader = PdfReader(ruta)
+    total = len(reader.pages)
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1 or total < 2 * PAGINAS_POR_BLOQUE:
+        partes = []
+        for i, pagina in enumerate(reader.pages, 1):
+            partes.append(pagina.extract_text() or '')
+            if progreso:
+                progreso(i, total)
+        return ''.join(partes)
+
+    # Bloques pequeños para repartir bien la carga, pero no tanto que cada
+    # proceso pase más tiempo abriendo el PDF que extrayendo páginas
+    tamano = max(PAGINAS_POR_BLOQUE, -(-total // (workers * 4)))
+    bloques = [(i, min(i + tamano, total)) for i in range(0, total, tamano)]
+    partes = [None] * len(bloques)
+    hechas = 0
+    with ProcessPoolExecutor(max_workers=min(workers, len(bloques))) as pool:
+        futuros = {
+            pool.submit(_extraer_bloque, ruta, inicio, fin): n
+            for n, (inicio, fin) in enumerate(bloques)
+        }
+        for futuro in as_completed(futuros):
+            n = futuros[futuro]
+            partes[n] = futuro.result()
+            inicio, fin = bloques[n]
+            hechas += fin - inicio
+            if progreso:
+                progreso(hechas, total)
+    return ''.join(partes)
+
+
+# --- EPUB ---
+
+_NS = {
+    'c': 'urn:oasis:names:tc:opendocument:xmlns:container',
+    'opf': 'http://www.idpf.org/2007/opf',
+    'ncx': 'http://www.daisy.org/z3986/2005/ncx/',
+}
+_ETIQUETAS_BLOQUE = {
+    'p', 'div', 'section', 'article', 'blockquote', 'li', 'tr', 'pre',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'table', 'ul', 'ol', 'dd', 'dt',
+}
+_ETIQUETAS_OMITIDAS = {'head', 'script', 'style'}
+_TAMANO_LECTURA = 64 * 1024
+
+
+def _limpiar_texto(crudo):
+    lineas = (' '.join(linea.split()) for linea in crudo.split('\n'))
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lineas)).strip()
+
+
+class _TextoXHTML(HTMLParser):
+    """Convierte un documento XHTML en texto plano por párrafos.
+
+    Con `anclas` (ids de elementos) el texto se parte en trozos: uno con lo
+    anterior a la primera ancla y otro que empieza en cada ancla encontrada.
+    """
+
+    def __init__(self, anclas=()):
+        super().__init__(convert_charrefs=True)
+        self._anclas = set(anclas)
+        self._trozos = [[None, [], None]]   # [ancla, partes, primer h1-h3 como título de respaldo]
+        self.partes = self._trozos[0][1]
+        self._omitir = 0
+        self._en_encabezado = False
+        self._encabezado = []
+
+    def _cortar(self, attrs):
+        ancla = attrs.get('id') or attrs.get('name')
+        if ancla in self._anclas:
+            self._anclas.discard(ancla)
+            self._trozos.append([ancla, [], None])
+            self.partes = self._trozos[-1][1]
+
+    def handle_starttag(self, tag, attrs):
+        if self._anclas:
+            self._cortar(dict(attrs))
+        if tag in _ETIQUETAS_OMITIDAS:
+            self._omitir += 1
+        elif tag == 'br':
+            self.partes.append('\n')
+        elif tag in _ETIQUETAS_BLOQUE:
+            self.partes.append('\n\n')
+            if tag in ('h1', 'h2', 'h3') and self._trozos[-1][2] is None:
+                self._en_encabezado = True
+                self._encabezado = []
+
+    def handle_startendtag(self, tag, attrs):
+        if self._anclas:
+            self._cortar(dict(attrs))
+        if tag == 'br':
+            self.partes.append('\n')
+        elif tag in _ETIQUETAS_BLOQUE:
+            self.partes.append('\n\n')
+
+    def handle_endtag(self, tag):
+        if tag in _ETIQUETAS_OMITIDAS:
+            self._omitir = max(0, self._omitir - 1)
+        elif tag in _ETIQUETAS_BLOQUE:
+            self.partes.append('\n\n')
+            if self._en_encabezado:
+                self._en_encabezado = False
+                self._trozos[-1][2] = ' '.join(''.join(self._encabezado).split()) or None
+
+    def handle_data(self, data):
+        if self._omitir:
+            return
+        self.partes.append(data)
+        if self._en_encabezado:
+            self._encabezado.append(data)
+
+    def trozos(self):
+        """[(ancla o None, texto, encabezado)] en orden de aparición."""
+        return [(ancla, _limpiar_texto(''.join(partes)), encabezado)
+                for ancla, partes, encabezado in self._trozos]
+
+
+class _EnlacesNav(HTMLParser):
+    """Recoge (href, título) de los enlaces del <nav epub:type="toc"> de EPUB 3."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.enlaces = []
+        self._nav = 0
+        self._en_toc = False
+        self._href = None
+        self._texto = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'nav':
+            self._nav += 1
+            if attrs.get('epub:type') == 'toc' or attrs.get('role') == 'doc-toc':
+                self._en_toc = True
+        elif tag == 'a' and self._en_toc and attrs.get('href'):
+            self._href = attrs['href']
+            self._texto = []
+
+    def handle_endtag(self, tag):
+        if tag == 'nav':
+            self._nav -= 1
+            if self._nav == 0:
+                self._en_toc = False
+        elif tag == 'a' and self._href is not None:
+            self.enlaces.append((self._href, ' '.join(''.join(self._texto).split())))
+            self._href = None
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._texto.append(data)
+
+
+def _resolver(base, href):
+    """Ruta dentro del ZIP de un href relativo a `base`, sin fragmento."""
+    href = unquote(href.split('#', 1)[0])
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), href)) if href else ''
+
+
+def _destino(base, href):
+    """(ruta dentro del ZIP, fragmento o None) de un enlace del índice."""
+    fragmento = href.split('#', 1)[1] if '#' in href else ''
+    return _resolver(base, href), unquote(fragmento) or None
+
+
+def _leer_xhtml(zf, nombre, parser):
+    """Alimenta el parser con el documento en trozos, sin cargarlo entero."""
+    decodificador = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with zf.open(nombre) as f:
+        while True:
+            bloque = f.read(_TAMANO_LECTURA)
+            if not bloque:
+                break
+            parser.feed(decodificador.decode(bloque))
+    parser.feed(decodificador.decode(b'', final=True))
+    parser.close()
+    return parser
+
+
+def _indice_epub(zf, ruta_opf, manifiesto, spine_toc):
+    """Mapa documento -> [(fragmento o None, título)] del nav de EPUB 3 o del NCX de EPUB 2."""
+    titulos = {}   # (documento, fragmento) -> título, en el orden del índice
+    nav = next((m for m in manifiesto.values() if 'nav' in m['properties']), None)
+    if nav:
+        for href, titulo in _leer_xhtml(zf, nav['ruta'], _EnlacesNav()).enlaces:
+            titulos.setdefault(_destino(nav['ruta'], href), titulo)
+    elif spine_toc and spine_toc in manifiesto:
+        ruta_ncx = manifiesto[spine_toc]['ruta']
+        raiz = ET.fromstring(zf.read(ruta_ncx))
+        for punto in raiz.iter(f"{{{_NS['ncx']}}}navPoint"):
+            texto = punto.find('ncx:navLabel/ncx:text', _NS)
+            contenido = punto.find('ncx:content', _NS)
+            if contenido is not None and contenido.get('src'):
+                titulo = ' '.join((texto.text or '').split()) if texto is not None else ''
+                titulos.setdefault(_destino(ruta_ncx, contenido.get('src')), titulo)
+    por_documento = {}
+    for (ruta, fragmento), titulo in titulos.items():
+        if titulo:
+            por_documento.setdefault(ruta, []).append((fragmento, titulo))
+    return por_documento
+
+
+def iterar_epub(ruta):
+    """Recorre el spine del EPUB y devuelve (título, texto) por capítulo.
+
+    Cada documento se analiza por separado. Los que no aparecen en el índice
+    se añaden al capítulo anterior (capítulos partidos en varios archivos), y
+    los que el índice enlaza con varios #fragmentos se parten en esas anclas.
+    """
+    with zipfile.ZipFile(ruta) as zf:
+        contenedor = ET.fromstring(zf.read('META-INF/container.xml'))
+        ruta_opf = contenedor.find('.//c:rootfile', _NS).get('full-path')
+        opf = ET.fromstring(zf.read(ruta_opf))
+
+        manifiesto = {}
+        for item in opf.find('opf:manifest', _NS):
+            manifiesto[item.get('id')] = {
+                'ruta': _resolver(ruta_opf, item.get('href')),
+                'tipo': item.get('media-type', ''),
+                'properties': (item.get('properties') or '').split(),
+            }
+        spine = opf.find('opf:spine', _NS)
+        titulos = _indice_epub(zf, ruta_opf, manifiesto, spine.get('toc'))
+
+        titulo_actual, partes = None, []
+        titulo_pendiente = None
+        for itemref in spine.findall('opf:itemref', _NS):
+            item = manifiesto.get(itemref.get('idref'))
+            if item is None or 'html' not in item['tipo']:
+                continue
+            entradas = titulos.get(item['ruta'], [])
+            documento = _leer_xhtml(zf, item['ruta'], _TextoXHTML(f for f, _ in entradas if f))
+            trozos = documento.trozos()
+            por_ancla = {}
+            encontradas = {ancla for ancla, _, _ in trozos}
+            for fragmento, titulo in entradas:
+                # Un fragmento que no está en el documento titula su principio
+                por_ancla.setdefault(fragmento if fragmento in encontradas else None, titulo)
+
+            for ancla, texto, encabezado in trozos:
+                titulo_indice = por_ancla.get(ancla) or titulo_pendiente
+                if not texto:
+                    # Página o trozo sin texto (portada, separador): su título pasa al siguiente
+                    titulo_pendiente = titulo_indice
+                    continue
+                titulo_pendiente = None
+
+                if titulo_indice or not partes:
+                    if partes:
+                        yield titulo_actual, '\n\n'.join(partes)
+                    titulo_actual = titulo_indice or encabezado
+                    partes = [texto]
+                else:
+                    partes.append(texto)
+        if partes:
+            yield titulo_actual, '\n\n'.join(partes)
+
+
+def extraer_epub(ruta):
+    """Devuelve (texto, secciones) de un EPUB.
+
+    `secciones` son dicts con 'titulo', 'inicio' y 'fin' (posiciones en
+    `texto`), uno por capítulo del spine.
+    """
+    partes, secciones = [], []
+    posicion = 0
+    for n, (titulo, texto) in enumerate(iterar_epub(ruta), 1):
+        if partes:
+            partes.append('\n\n')
+            posicion += 2
+        partes.append(texto)
+        secciones.append({'titulo': titulo or f"Sección {n}", 'inicio': posicion, 'fin': posicion + len(texto)})
+        posicion += len(texto)
+    return ''.join(partes), secciones
+
+
+def extraer_texto_epub(ruta):
+    """Extrae texto de EPUB usando pandoc (respaldo del lector nativo)."""
+    try:
+        result = subprocess.run(
+            ['pandoc', str(ruta), '-t', 'plain', '--wrap=none'],
+            capture_output=True,
+            text=True,
+            timeout=120
+        )
+        if result.returncode == 0:
+            return result.stdout
+        else:
+            raise Exception(f"Error pandoc: {result.stderr}")
+    except FileNotFoundError:
+        raise Exception("Pandoc no instalado. Ejecuta: sudo apt install pandoc")
+    except subprocess.TimeoutExpired:
+        raise Exception("Timeout al procesar EPUB")
+
+
+def leer_libro(ruta, workers=None, progreso=None):
+    """Devuelve (texto, secciones) de un .txt, .pdf o .epub.
+
+    Sólo los EPUB traen secciones (una por capítulo del spine); el resto
+    None. Si el EPUB no se puede leer directamente se recurre a pandoc, sin
+    secciones.
+    """
+    ruta = Path(ruta)
+    ext = ruta.suffix.lower()
+    if ext == '.pdf':
+        return extraer_texto_pdf(str(ruta), workers, progreso), None
+    if ext == '.epub':
+        try:
+            return extraer_epub(str(ruta))
+        except Exception:
+            return extraer_texto_epub(ruta), None
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return f.read(), None
+
+
+def leer_archivo(ruta, workers=None, progreso=None):
+    """Como leer_libro, sólo el texto."""
+    return leer_libro(ruta, workers, progreso)[0]
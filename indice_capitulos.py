@@ -0,0 +1,203 @@
+"""
+Índice de capítulos por archivo
+===============================
+Guarda, para un texto ya leído, las posiciones donde aparece cada separador
+probado y los capítulos resultantes como rangos (inicio, fin) del texto, sin
+copiar su contenido. Volver a un separador ya usado es inmediato, y uno que
+contiene a otro ya indexado (p. ej. "Capítulo" -> "Capítulo ") sólo revisa
+las posiciones del primero.
+
+respuesta_capitulos arma el cuerpo que devuelve la API al analizar un libro.
+"""
+
+import re
+import sys
+import threading
+from array import array
+
+PATRON_CAPITULOS = re.compile(
+    r'(CAP[IÍ]TULO\s+\d+|CHAPTER\s+\d+|PARTE\s+\d+|SECCI[OÓ]N\s+\d+|Cap[ií]tulo\s+\d+|Chapter\s+\d+|Parte\s+\d+)',
+    re.IGNORECASE
+)
+TAMANO_TROZO = 5000  # Caracteres por parte cuando el texto no tiene capítulos
+
+_NO_ESPACIO = re.compile(r'\S')
+
+
+def respuesta_capitulos(file_id, nombre, capitulos):
+    """Cuerpo de la respuesta JSON con el resumen de los capítulos."""
+    caps_info = []
+    for cap in capitulos:
+        if isinstance(cap, dict):
+            caps_info.append({
+                'id': cap['id'],
+                'titulo': cap['titulo'],
+                'chars': cap['chars']
+            })
+        else:
+            caps_info.append({
+                'id': 0,
+                'titulo': cap[0],
+                'chars': len(cap[1])
+            })
+
+    return {
+        'file_id': file_id,
+        'nombre': nombre,
+        'capitulos': caps_info,
+        'total': len(caps_info)
+    }
+
+
+def _solapable(sep):
+    """True si un prefijo propio de `sep` es también sufijo (p. ej. "aba")."""
+    return any(sep[:i] == sep[-i:] for i in range(1, len(sep)))
+
+
+class IndiceCapitulos:
+    """Divisiones en capítulos de un texto, cacheadas por separador."""
+
+    def __init__(self, texto, secciones=None):
+        self.texto = texto
+        self.secciones = secciones       # Secciones del spine de un EPUB, si las hay
+        self._lock = threading.Lock()
+        self._posiciones = {}            # separador -> array de inicios de coincidencia
+        self._capitulos = {}             # (separador, titular como partes) -> capítulos
+
+    def capitulos(self, separador=None):
+        """Capítulos como dicts con 'inicio'/'fin' en lugar de 'contenido'.
+
+        Sin separador se usan las secciones del EPUB o los patrones por
+        defecto; si no hay ningún capítulo se devuelven tuplas
+        (nombre, trozo) de TAMANO_TROZO caracteres, como dividir_por_capitulos.
+        """
+        sep = separador.strip() if separador else ''
+        # Un separador sólo de espacios usa los patrones pero titula "Parte N"
+        clave = (sep, bool(separador))
+        with self._lock:
+            if clave not in self._capitulos:
+                if sep:
+                    self._capitulos[clave] = self._por_separador(sep)
+                elif self.secciones:
+                    self._capitulos[clave] = self._por_secciones()
+                else:
+                    self._capitulos[clave] = self._por_patron(titulo_parte=bool(separador))
+            return self._capitulos[clave]
+
+    def _buscar(self, sep):
+        """Posiciones de `sep`, partiendo de un separador indexado que esté contenido en él."""
+        if sep in self._posiciones:
+            return self._posiciones[sep]
+
+        # Sólo sirven bases que no puedan solaparse consigo mismas: así su
+        # lista de posiciones contiene todas sus apariciones
+        base = max((s for s in self._posiciones if s in sep and not _solapable(s)), key=len, default=None)
+        if base is not None:
+            desplazamiento = sep.index(base)
+            texto = self.texto
+            posiciones = array('q')
+            siguiente = 0
+            for p in self._posiciones[base]:
+                p -= desplazamiento
+                # Sin solapes entre coincidencias, igual que re.finditer
+                if p >= siguiente and texto.startswith(sep, p):
+                    posiciones.append(p)
+                    siguiente = p + len(sep)
+        else:
+            posiciones = array('q', (m.start() for m in re.finditer(re.escape(sep), self.texto)))
+        self._posiciones[sep] = posiciones
+        return posiciones
+
+    def _acotar(self, inicio, fin):
+        """Límites de texto[inicio:fin].strip() sin crear la subcadena."""
+        m = _NO_ESPACIO.search(self.texto, inicio, fin)
+        if m is None:
+            return inicio, inicio
+        inicio = m.start()
+        while fin > inicio and self.texto[fin - 1].isspace():
+            fin -= 1
+        return inicio, fin
+
+    def _por_separador(self, sep):
+        posiciones = self._buscar(sep)
+        if not posiciones:
+            return self._trozos()
+        capitulos = []
+        nombre_limpio = re.sub(r'[^\w\s]', '', sep).replace(' ', '_').lower()
+        total = len(posiciones)
+        for i, pos in enumerate(posiciones):
+            fin = posiciones[i + 1] if i + 1 < total else len(self.texto)
+            inicio, fin = self._acotar(pos + len(sep), fin)
+            capitulos.append({
+                'id': i,
+                'nombre': nombre_limpio if nombre_limpio else f'parte_{i+1}',
+                'titulo': f"Parte {i+1}",
+                'chars': fin - inicio,
+                'inicio': inicio,
+                'fin': fin
+            })
+        return capitulos
+
+    def _por_patron(self, titulo_parte=False):
+        matches = list(PATRON_CAPITULOS.finditer(self.texto))
+        if not matches:
+            return self._trozos()
+        capitulos = []
+        for i, match in enumerate(matches):
+            nombre_original = match.group(1).strip()
+            fin = matches[i + 1].start() if i + 1 < len(matches) else len(self.texto)
+            inicio, fin = self._acotar(match.end(), fin)
+            nombre_limpio = re.sub(r'[^\w\s]', '', nombre_original).replace(' ', '_').lower()
+            num_match = re.search(r'\d+', nombre_original)
+            num_cap = num_match.group() if num_match else str(i+1)
+            capitulos.append({
+                'id': i,
+                'nombre': nombre_limpio if nombre_limpio else f'parte_{i+1}',
+                'titulo': f"Parte {i+1}" if titulo_parte else f"Capítulo {num_cap}",
+                'chars': fin - inicio,
+                'inicio': inicio,
+                'fin': fin
+            })
+        return capitulos
+
+    def _por_secciones(self):
+        capitulos = []
+        vistos = {}
+        for i, sec in enumerate(self.secciones):
+            titulo = sec['titulo']
+            vistos[titulo] = vistos.get(titulo, 0) + 1
+            if vistos[titulo] > 1:
+                titulo = f"{titulo} ({vistos[titulo]})"
+            nombre_limpio = re.sub(r'[^\w\s]', '', titulo).strip().replace(' ', '_').lower()
+            capitulos.append({
+                'id': i,
+                'nombre': nombre_limpio if nombre_limpio else f'parte_{i+1}',
+                'titulo': titulo,
+                'chars': sec['fin'] - sec['inicio'],
+                'inicio': sec['inicio'],
+                'fin': sec['fin']
+            })
+        return capitulos
+
+    def _trozos(self):
+        """Sin capítulos: partes de ~TAMANO_TROZO caracteres."""
+        texto_limpio = self.texto.strip()
+        chunks = [
+            (f"parte_{(i // TAMANO_TROZO) + 1:03d}", texto_limpio[i:i + TAMANO_TROZO])
+            for i in range(0, len(texto_limpio), TAMANO_TROZO)
+        ]
+        return chunks if chunks else [("completo", self.texto)]
+
+    def contenido(self, cap):
+        """Texto de un capítulo del índice."""
+        return self.texto[cap['inicio']:cap['fin']]
+
+    def tamano(self):
+        """Bytes aproximados del índice (sin contar el texto)."""
+        with self._lock:
+            total = sum(p.itemsize * len(p) for p in self._posiciones.values())
+            for caps in self._capitulos.values():
+                for cap in caps:
+                    # Las tuplas de trozos sí guardan su texto
+                    total += 200 if isinstance(cap, dict) else sys.getsizeof(cap[1])
+            return total
@@ -0,0 +1,179 @@
+"""
+Libros sintéticos
+=================
+Genera textos de libro deterministas (misma semilla, mismo texto) para medir
+el procesado sin depender de archivos reales: tamaño en bytes UTF-8,
+número de capítulos con encabezados "Capítulo N" ("Chapter N" en inglés) y
+mezcla de idiomas. Con capitulos=0 no hay ningún encabezado y el
+troceado cae en el camino de partes de 5000 caracteres.
+
+El texto imita prosa: frases de longitud variable, diálogos con raya,
+comillas, abreviaturas, cifras, puntos suspensivos y algún símbolo que la
+normalización tiene que quitar. escribir_epub guarda el mismo libro como
+EPUB 3 (un XHTML por capítulo y su nav) para medir la extracción.
+"""
+
+import os
+import random
+import zipfile
+from html import escape
+
+# Palabras frecuentes por idioma
+VOCABULARIO = {
+    'es': "el la de que y en los se del las un por con no una su para es al lo como más pero sus le ya o "
+          "fue este ha sí porque esta son entre cuando muy sin sobre también me hasta hay donde quien "
+          "desde todo nos durante todos uno les ni contra otros ese eso ante ellos e esto mí antes "
+          "algunos qué unos yo otro otras otra él tanto esa estos mucho quienes nada muchos cual poco "
+          "ella estar estas algunas algo nosotros camino noche ciudad corazón mañana ventana silencio",
+    'en': "the of and to in is was that for it with as his on be at by had are but from or have not "
+          "they this which one you were her all she there would their we him been has when who will "
+          "more no if out so said what up its about into than them can only other new some could "
+          "time these two may then do first any my now such like our over man me even most made",
+    'fr': "de la le et les des en un du une que est pour qui dans par plus pas au sur ne se ce il sont "
+          "avec son elle nous comme mais ou si leur y dont cette aussi tout fait été deux ses même "
+          "peut entre où sans encore bien leurs donc ces vie temps jour homme nuit ville maison",
+    'de': "der die und in den von zu das mit sich des auf für ist im dem nicht ein eine als auch es an "
+          "werden aus er hat dass sie nach wird bei einer um am sind noch wie einem über einen so "
+          "zum war haben nur oder aber vor zur bis mehr durch man sein wurde sei Haus Nacht Stadt",
+    'pt': "de a o que e do da em um para é com não uma os no se na por mais as dos como mas foi ao "
+          "ele das tem à seu sua ou ser quando muito há nos já está eu também só pelo pela até isso "
+          "ela entre era depois sem mesmo aos ter seus quem nas me esse eles noite cidade casa",
+    'it': "di e il la che a per un in è non una sono le con si da del della al i dei gli come lo ma "
+          "anche più questo se ha nel alla ci loro sua suo mi essere tutto quando ancora fatto "
+          "notte città casa giorno uomo tempo vita mano occhi strada porta cuore parola",
+    'ru': "и в не на я быть он с что а по это она этот к но они мы как из у который то за свой что "
+          "весь год от так о для ты же все тот мочь вы человек такой его сказать только или ещё "
+          "бы себя один как уже до время если сам когда другой вот говорить наш мой знать",
+    'ja': "私 彼 彼女 時間 今日 明日 世界 日本 人 年 家 道 夜 朝 心 手 目 声 言葉 空 海 山 川 町 "
+          "学校 先生 友達 本 物語 仕事 電車 部屋 窓 雨 風 光 影 夢 記憶",
+}
+# Encabezados que reconoce el patrón por defecto; los demás idiomas usan "Capítulo N"
+ENCABEZADOS = {'es': 'Capítulo', 'en': 'Chapter', 'pt': 'Capítulo'}
+
+_ADORNOS = ['«{}»', '"{}"', '({})', '— {} —', '{}...', '{}…', '¡{}!', '¿{}?', '{} *', '{} #', '[{}]']
+_ABREVIATURAS = ['Sr.', 'Dra.', 'etc.', 'p. ej.', 'Mr.', 'No.', 'S.A.']
+
+
+def _frase(rng, palabras, idioma):
+    n = rng.randint(4, 28)
+    if idioma == 'ja':
+        frase = ''.join(rng.choice(palabras) + rng.choice(['は', 'が', 'を', 'に', 'の', 'で']) for _ in range(n // 2))
+        return frase + rng.choice(['。', '。', '！', '？'])
+    trozos = [rng.choice(palabras) for _ in range(n)]
+    trozos[0] = trozos[0].capitalize()
+    r = rng.random()
+    if r < 0.15:
+        i = rng.randrange(n)
+        trozos[i] = rng.choice(_ADORNOS).format(trozos[i])
+    elif r < 0.22:
+        trozos.insert(rng.randrange(n), rng.choice(_ABREVIATURAS))
+    elif r < 0.30:
+        trozos.insert(rng.randrange(n), f"{rng.randint(1, 3000):,}")
+    if rng.random() < 0.3:
+        trozos[rng.randrange(len(trozos))] += ','
+    return ' '.join(trozos) + rng.choice(['.', '.', '.', '.', '?', '!', '...', ';'])
+
+
+def _parrafo(rng, palabras, idioma):
+    frases = [_frase(rng, palabras, idioma) for _ in range(rng.randint(1, 8))]
+    if idioma != 'ja' and rng.random() < 0.2:
+        return '—' + ' '.join(frases)   # Diálogo
+    return ' '.join(frases)
+
+
+def _capitulos(tamano, capitulos, idiomas, semilla):
+    """(título o None, [párrafos]) de cada bloque del libro, en orden."""
+    rng = random.Random(semilla)
+    bloques = max(capitulos, 1)
+    objetivo = tamano // bloques
+    escritos = 0
+    for n in range(1, bloques + 1):
+        idioma = idiomas[(n - 1) % len(idiomas)]
+        palabras = VOCABULARIO[idioma].split()
+        titulo = None
+        if capitulos:
+            encabezado = ENCABEZADOS.get(idioma, 'Capítulo')
+            if rng.random() < 0.2:
+                encabezado = encabezado.upper()
+            titulo = f"{encabezado} {n}"
+            if rng.random() < 0.5:
+                titulo += ". " + _frase(rng, palabras, idioma).rstrip('.?!;…')
+            escritos += len(titulo.encode('utf-8')) + 2
+        # El último bloque completa hasta el tamaño pedido
+        limite = tamano if n == bloques else objetivo * n
+        parrafos = []
+        while escritos < limite:
+            parrafos.append(_parrafo(rng, palabras, idioma))
+            escritos += len(parrafos[-1].encode('utf-8')) + 2
+        yield titulo, parrafos
+
+
+def generar_libro(tamano, capitulos=300, idiomas=('es',), semilla=0):
+    """Texto de unos `tamano` bytes UTF-8 con `capitulos` encabezados repartidos por igual.
+
+    Cada capítulo usa un idioma de `idiomas` por turnos; los que no tienen
+    encabezado en ENCABEZADOS se titulan "Capítulo N", para que el patrón
+    por defecto encuentre siempre `capitulos`.
+    """
+    partes = []
+    for titulo, parrafos in _capitulos(tamano, capitulos, idiomas, semilla):
+        if titulo is not None:
+            partes.append(titulo + "\n\n")
+        partes.extend(p + "\n\n" for p in parrafos)
+    return ''.join(partes)
+
+
+def escribir_libro(ruta, tamano, capitulos=300, idiomas=('es',), semilla=0):
+    """Escribe el libro generado en `ruta` (UTF-8) y devuelve su tamaño en bytes."""
+    texto = generar_libro(tamano, capitulos, idiomas, semilla)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(texto)
+    return len(texto.encode('utf-8'))
+
+
+_CONTENEDOR = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>"""
+
+_XHTML = """<?xml version="1.0" encoding="UTF-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<head><title>{titulo}</title></head>
+<body>
+{cuerpo}
+</body>
+</html>"""
+
+
+def escribir_epub(ruta, tamano, capitulos=300, idiomas=('es',), semilla=0):
+    """Escribe el mismo libro que generar_libro como EPUB 3 y devuelve su tamaño en bytes.
+
+    Cada capítulo va en su propio XHTML, con el título en un <h1> y en el nav.
+    """
+    documentos, enlaces = [], []
+    for n, (titulo, parrafos) in enumerate(_capitulos(tamano, capitulos, idiomas, semilla), 1):
+        nombre = f"cap_{n:04d}.xhtml"
+        cuerpo = [f"<h1>{escape(titulo)}</h1>"] if titulo is not None else []
+        cuerpo.extend(f"<p>{escape(p)}</p>" for p in parrafos)
+        documentos.append((nombre, _XHTML.format(titulo=escape(titulo or ''), cuerpo='\n'.join(cuerpo))))
+        if titulo is not None:
+            enlaces.append(f'<li><a href="{nombre}">{escape(titulo)}</a></li>')
+
+    nav = _XHTML.format(titulo='Índice', cuerpo=f'<nav epub:type="toc"><ol>{"".join(enlaces)}</ol></nav>')
+    manifiesto = ['<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>']
+    manifiesto.extend(f'<item id="c{n}" href="{nombre}" media-type="application/xhtml+xml"/>'
+                      for n, (nombre, _) in enumerate(documentos, 1))
+    spine = ''.join(f'<itemref idref="c{n}"/>' for n in range(1, len(documentos) + 1))
+    opf = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<package xmlns="http://www.idpf.org/2007/opf" version="3.0">'
+           '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:title>Libro sintético</dc:title></metadata>'
+           f'<manifest>{"".join(manifiesto)}</manifest><spine>{spine}</spine></package>')
+
+    with zipfile.ZipFile(ruta, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        zf.writestr('META-INF/container.xml', _CONTENEDOR)
+        zf.writestr('OEBPS/content.opf', opf)
+        zf.writestr('OEBPS/nav.xhtml', nav)
+        for nombre, xhtml in documentos:
+            zf.writestr(f'OEBPS/{nombre}', xhtml)
+    return os.path.getsize(ruta)
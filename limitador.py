@@ -0,0 +1,139 @@
+"""
+Limitador adaptativo de peticiones al servicio TTS
+==================================================
+Sustituye las pausas fijas por un control AIMD: la tasa de peticiones crece
+poco a poco mientras las llamadas tienen éxito y se reduce a la mitad cuando
+el servicio limita o corta la conexión, reintentando con espera aleatoria.
+
+Es seguro compartirlo entre hilos y event loops distintos: el estado se protege
+con un lock y las esperas se hacen con asyncio.sleep en el loop de quien llama.
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+
+def _errores_transitorios():
+    """Errores que indican limitación o fallo de red y merecen reintento."""
+    errores = [ConnectionError, asyncio.TimeoutError]
+    try:
+        import aiohttp
+        errores.append(aiohttp.ClientError)
+    except ImportError:
+        pass
+    try:
+        from edge_tts.exceptions import NoAudioReceived, WebSocketError
+        errores.extend([NoAudioReceived, WebSocketError])
+    except ImportError:
+        pass
+    return tuple(errores)
+
+
+ERRORES_TRANSITORIOS = _errores_transitorios()
+
+
+class LimitadorAdaptativo:
+    """Reparte permisos de llamada a una tasa que se adapta al servicio."""
+
+    def __init__(
+        self,
+        tasa_inicial: float = 1.0,
+        tasa_min: float = 0.05,
+        tasa_max: float = 10.0,
+        incremento: float = 0.1,
+        factor_reduccion: float = 0.5,
+        reintentos: int = 5,
+        espera_base: float = 2.0,
+        espera_max: float = 90.0,
+        errores_reintentables: tuple = ERRORES_TRANSITORIOS,
+        al_pausar=None,
+    ):
+        if not 0 < tasa_min <= tasa_max:
+            raise ValueError(f"Tasas no válidas: mínima {tasa_min}, máxima {tasa_max}")
+        self.tasa = min(max(tasa_inicial, tasa_min), tasa_max)   # peticiones por segundo
+        self.tasa_min = tasa_min
+        self.tasa_max = tasa_max
+        self.incremento = incremento
+        self.factor_reduccion = factor_reduccion
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.errores_reintentables = errores_reintentables
+        # al_pausar(True) cuando una llamada empieza a esperar un reintento y
+        # al_pausar(False) cuando ya no queda ninguna esperando
+        self.al_pausar = al_pausar
+
+        self._lock = threading.Lock()
+        self._proximo = 0.0               # instante (monotonic) del siguiente permiso
+        self._en_espera = 0               # llamadas esperando un reintento
+        self.exitos = 0
+        self.limitaciones = 0
+
+    async def adquirir(self):
+        """Espera hasta que toque el siguiente permiso según la tasa actual."""
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._proximo)
+            self._proximo = turno + 1.0 / self.tasa
+        espera = turno - ahora
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+    def registrar_exito(self):
+        """Aumento aditivo de la tasa tras una llamada correcta."""
+        with self._lock:
+            self.exitos += 1
+            # Con éxito sostenido la tasa sube unas `incremento` pet/s por segundo
+            self.tasa = min(self.tasa_max, self.tasa + self.incremento / self.tasa)
+
+    def registrar_limitacion(self):
+        """Reducción multiplicativa y aplazamiento del siguiente permiso."""
+        with self._lock:
+            self.limitaciones += 1
+            self.tasa = max(self.tasa_min, self.tasa * self.factor_reduccion)
+            self._proximo = max(self._proximo, time.monotonic() + 1.0 / self.tasa)
+
+    async def ejecutar(self, fabrica):
+        """Ejecuta `fabrica()` (que devuelve una corrutina nueva) con reintentos.
+
+        Cada intento debe crear su propia corrutina: edge-tts no permite
+        reutilizar un Communicate ya consumido.
+        """
+        for intento in range(self.reintentos + 1):
+            await self.adquirir()
+            try:
+                resultado = await fabrica()
+            except self.errores_reintentables:
+                self.registrar_limitacion()
+                if intento == self.reintentos:
+                    raise
+                # Backoff exponencial con jitter completo
+                espera = random.uniform(0, min(self.espera_max, self.espera_base * 2 ** intento))
+                with self._lock:
+                    self._en_espera += 1
+                    empieza_pausa = self._en_espera == 1
+                if empieza_pausa and self.al_pausar:
+                    self.al_pausar(True)
+                try:
+                    await asyncio.sleep(espera)
+                finally:
+                    with self._lock:
+                        self._en_espera -= 1
+                        termina_pausa = self._en_espera == 0
+                    if termina_pausa and self.al_pausar:
+                        self.al_pausar(False)
+            else:
+                self.registrar_exito()
+                return resultado
+
+    def estado(self):
+        """Resumen para exponer en la API."""
+        with self._lock:
+            return {
+                'tasa': round(self.tasa, 3),
+                'reintentando': self._en_espera,
+                'exitos': self.exitos,
+                'limitaciones': self.limitaciones,
+            }
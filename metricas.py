@@ -0,0 +1,201 @@
+"""
+Métricas en formato Prometheus
+==============================
+Contadores, histogramas y medidores con etiquetas, y su volcado en el
+formato de texto que lee Prometheus (version 0.0.4), sin dependencias.
+
+Los contadores y los histogramas se actualizan en el momento (desde
+cualquier hilo o event loop). Los medidores se calculan al pedir las
+métricas con una función que devuelve un valor, o una lista de
+(etiquetas, valor); con `cada` el resultado se reutiliza esos segundos,
+para lo que sea caro de calcular (como recorrer una carpeta).
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TIPO_CONTENIDO = 'text/plain; version=0.0.4; charset=utf-8'
+LIMITES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _etiquetas(nombres, valores, extra=''):
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return '{' + ','.join(partes) + '}' if partes else ''
+
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = ''
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _clave(self, etiquetas):
+        if set(etiquetas) != set(self.etiquetas):
+            raise ValueError(f"{self.nombre}: etiquetas {sorted(etiquetas)}, se esperaban {list(self.etiquetas)}")
+        return tuple(str(etiquetas[n]) for n in self.etiquetas)
+
+    def _cabecera(self):
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+
+class Contador(_Metrica):
+    """Valor que sólo crece (peticiones, errores, caracteres...)."""
+
+    tipo = 'counter'
+
+    def inc(self, valor=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._series[clave] = self._series.get(clave, 0) + valor
+
+    def lineas(self):
+        with self._lock:
+            series = sorted(self._series.items())
+        return self._cabecera() + [
+            f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}" for clave, valor in series
+        ]
+
+
+class Histograma(_Metrica):
+    """Distribución de duraciones en cubetas acumuladas, con su suma y cuenta."""
+
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), limites=LIMITES):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = tuple(sorted(limites))
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * len(self.limites), 0.0, 0]
+            for i, limite in enumerate(self.limites):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    @contextmanager
+    def medir(self, **etiquetas):
+        """Observa lo que tarda el bloque, acabe bien o con excepción."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def lineas(self):
+        with self._lock:
+            series = sorted((clave, (list(c), s, n)) for clave, (c, s, n) in self._series.items())
+        lineas = self._cabecera()
+        infinito = 'le="+Inf"'
+        for clave, (cubetas, suma, cuenta) in series:
+            acumulado = 0
+            for limite, n in zip(self.limites, cubetas):
+                acumulado += n
+                le = f'le="{_numero(float(limite))}"'
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, le)} {acumulado}")
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, infinito)} {cuenta}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {cuenta}")
+        return lineas
+
+
+class Medidor(_Metrica):
+    """Valor calculado al pedir las métricas (tamaños, colas, uso de disco)."""
+
+    def __init__(self, nombre, ayuda, funcion, etiquetas=(), tipo='gauge', cada=0):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.tipo = tipo
+        self.funcion = funcion
+        self.cada = cada
+        self._calculado = None
+        self._instante = 0.0
+
+    def _valores(self):
+        with self._lock:
+            ahora = time.monotonic()
+            if self._calculado is None or ahora - self._instante >= self.cada:
+                valor = self.funcion()
+                if not isinstance(valor, list):
+                    valor = [({}, valor)]
+                self._calculado = [(self._clave(e), v) for e, v in valor]
+                self._instante = ahora
+            return self._calculado
+
+    def lineas(self):
+        return self._cabecera() + [
+            f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+            for clave, valor in sorted(self._valores())
+        ]
+
+
+class Registro:
+    """Conjunto de métricas de la aplicación, en el orden en que se crean."""
+
+    def __init__(self):
+        self._metricas = []
+
+    def _agregar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._agregar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), limites=LIMITES):
+        return self._agregar(Histograma(nombre, ayuda, etiquetas, limites))
+
+    def medidor(self, nombre, ayuda, funcion, etiquetas=(), tipo='gauge', cada=0):
+        return self._agregar(Medidor(nombre, ayuda, funcion, etiquetas, tipo, cada))
+
+    def texto(self):
+        """Todas las métricas en el formato de texto de Prometheus."""
+        lineas = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.lineas())
+        return '\n'.join(lineas) + '\n'
+
+
+def uso_disco(carpeta):
+    """(bytes, archivos) bajo `carpeta`, recorriéndola entera."""
+    total = archivos = 0
+    pendientes = [carpeta]
+    while pendientes:
+        try:
+            entradas = list(os.scandir(pendientes.pop()))
+        except OSError:
+            continue
+        for entrada in entradas:
+            try:
+                if entrada.is_dir(follow_symlinks=False):
+                    pendientes.append(entrada.path)
+                elif entrada.is_file(follow_symlinks=False):
+                    total += entrada.stat(follow_symlinks=False).st_size
+                    archivos += 1
+            except OSError:
+                pass
+    return total, archivos
@@ -60,7 +60,46 @@ export const API = {
         return await res.json();
     },
 
+    // Progress via Server-Sent Events. onChange receives the accumulated job
+    // status (same fields as /estado) after every change. Returns the EventSource.
+    subscribeJob(jobId, onChange) {
+        const status = { completados: [] };
+        const source = new EventSource(`${this.baseUrl}/eventos/${jobId}`);
+        source.onmessage = (e) => {
+            const event = JSON.parse(e.data);
+            if (event.tipo === 'estado') {
+                Object.keys(status).forEach(k => delete status[k]);
+            }
+            Object.assign(status, event);
+            status.completados = status.completados || [];
+            if (event.tipo === 'capitulo_fin' && !status.completados.includes(event.cap_id)) {
+                status.completados.push(event.cap_id);
+            }
+            onChange(status);
+        };
+        return source;
+    },
+
     getDownloadUrl(jobId, fileName) {
         return `${this.baseUrl}/descargar/${jobId}/${encodeURIComponent(fileName)}`;
+    },
+
+    // Every finished chapter in a single ZIP (one request instead of one per file)
+    getZipUrl(jobId) {
+        return `${this.baseUrl}/descargar-zip/${jobId}`;
+    },
+
+    // Joins a finished job into one MP3 with chapter markers; returns { archivo, url, capitulos }
+    async exportBook(jobId) {
+        const res = await fetch(`${this.baseUrl}/exportar/${jobId}`, { method: 'POST' });
+        if (!res.ok) throw new Error((await res.json()).error || 'Error exporting book');
+        const data = await res.json();
+        data.url = `${this.baseUrl}${data.url}`;
+        return data;
+    },
+
+    // Audio de un capítulo mientras se sintetiza (se adelanta en la cola del trabajo)
+    getStreamUrl(jobId, chapterId) {
+        return `${this.baseUrl}/escuchar/${jobId}/${chapterId}`;
     }
 };
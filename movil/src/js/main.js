@@ -183,29 +183,55 @@ async function startConversion() {
     }
 }
 
-async function monitorJob(jobId) {
-    const poll = setInterval(async () => {
-        try {
-            const status = await API.getJobStatus(jobId);
+// Returns true when the job has finished (completed or failed)
+async function showJobStatus(jobId, status) {
+    if (status.estado === 'en_cola') {
+        ui.statusText.textContent = status.posicion_cola
+            ? `En cola (posición ${status.posicion_cola})`
+            : "En cola";
+
+    } else if (status.estado === 'convirtiendo' || status.estado === 'iniciando') {
+        const pct = Math.round((status.actual / status.total) * 100);
+        ui.progressBar.style.width = `${pct}%`;
+        ui.statusText.textContent = `Convirtiendo: ${pct}% (${status.actual}/${status.total})`;
+
+    } else if (status.estado === 'completado') {
+        ui.progressBar.style.width = '100%';
+        ui.statusText.textContent = "¡Completado! Descargando a tu celular...";
+        await downloadResults(jobId);
+        ui.convertBtn.disabled = false;
+        return true;
 
-            if (status.estado === 'convirtiendo' || status.estado === 'iniciando') {
-                const pct = Math.round((status.actual / status.total) * 100);
-                ui.progressBar.style.width = `${pct}%`;
-                ui.statusText.textContent = `Convirtiendo: ${pct}% (${status.actual}/${status.total})`;
+    } else if (status.estado === 'error') {
+        ui.statusText.textContent = "Error en el servidor: " + status.error;
+        ui.convertBtn.disabled = false;
+        return true;
+    }
+    return false;
+}
 
-            } else if (status.estado === 'completado') {
-                clearInterval(poll);
-                ui.progressBar.style.width = '100%';
-                ui.statusText.textContent = "¡Completado! Descargando a tu celular...";
-                await downloadResults(jobId);
-                ui.convertBtn.disabled = false;
+function monitorJob(jobId) {
+    if (window.EventSource) {
+        // The server pushes only changes; EventSource reconnects with Last-Event-ID
+        let finished = false;
+        const source = API.subscribeJob(jobId, async (status) => {
+            if (finished) return;
+            if (status.estado === 'completado' || status.estado === 'error') {
+                finished = true;
+                source.close();
+            }
+            await showJobStatus(jobId, status);
+        });
+        return;
+    }
 
-            } else if (status.estado === 'error') {
+    const poll = setInterval(async () => {
+        try {
+            const status = await API.getJobStatus(jobId);
+            if (status.estado === 'completado' || status.estado === 'error') {
                 clearInterval(poll);
-                ui.statusText.textContent = "Error en el servidor: " + status.error;
-                ui.convertBtn.disabled = false;
             }
-
+            await showJobStatus(jobId, status);
         } catch (e) {
             console.error("Polling error", e);
         }
@@ -0,0 +1,135 @@
+"""
+Muestras de voz
+===============
+Genera los MP3 de prueba de cada voz como tareas del event loop compartido
+(ver bucle.py). Las peticiones simultáneas de la misma muestra comparten una
+única generación (single-flight) y el precalentamiento genera en segundo
+plano, con concurrencia acotada, las muestras de los idiomas más usados para
+que /probar-voz las sirva directamente desde disco.
+
+El precalentamiento tiene la prioridad más baja: con `ocupado` (por ejemplo,
+hay trabajos de conversión) no empieza ninguna muestra nueva hasta que deja
+de estarlo, para no gastar el cupo del limitador que comparten.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+
+from bucle import BucleCompartido
+
+CONCURRENCIA_PRECALENTADO = 2   # Muestras generándose a la vez al precalentar
+ESPERA_OCUPADO = 5              # Segundos entre comprobaciones mientras hay trabajo prioritario
+
+
+class GeneradorMuestras:
+    """Muestras en disco por voz, generadas una sola vez aunque se pidan a la vez."""
+
+    def __init__(self, carpeta, sintetizar, textos, texto_defecto,
+                 concurrencia=CONCURRENCIA_PRECALENTADO, bucle=None, ocupado=None):
+        self.carpeta = Path(carpeta)
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        self.sintetizar = sintetizar      # async sintetizar(texto, archivo, voz_id)
+        self.textos = textos              # código de idioma -> texto de muestra
+        self.texto_defecto = texto_defecto
+        self.concurrencia = concurrencia
+        self.bucle = bucle or BucleCompartido()
+        self.ocupado = ocupado or (lambda: False)   # True si el precalentado debe esperar
+
+        self._lock = threading.Lock()
+        self._en_vuelo = {}               # voz_id -> Future de la generación
+        self._cola = deque()              # Voces pendientes de precalentar
+        self._trabajadores = 0
+        self.generadas = 0
+
+    def ruta(self, voz_id):
+        return self.carpeta / f"muestra_{voz_id.replace('-', '_').lower()}.mp3"
+
+    def texto(self, voz_id):
+        lang_code = voz_id.split('-')[0] if '-' in voz_id else 'es'
+        return self.textos.get(lang_code, self.textos.get('en', self.texto_defecto))
+
+    def _lanzar(self, voz_id):
+        """Future de la muestra: ya resuelto si está en disco, o el de la generación en curso."""
+        ruta = self.ruta(voz_id)
+        with self._lock:
+            futuro = self._en_vuelo.get(voz_id)
+            if futuro is not None:
+                return futuro
+            futuro = Future()
+            if ruta.exists():
+                futuro.set_result(ruta)
+                return futuro
+            self._en_vuelo[voz_id] = futuro
+
+        async def generar():
+            try:
+                await self.sintetizar(self.texto(voz_id), str(ruta), voz_id)
+            except Exception as e:
+                futuro.set_exception(e)
+            except BaseException as e:
+                # Cancelada (p. ej. al parar el bucle): quien espera no se queda colgado
+                futuro.set_exception(e)
+                raise
+            else:
+                futuro.set_result(ruta)
+                with self._lock:
+                    self.generadas += 1
+            finally:
+                with self._lock:
+                    del self._en_vuelo[voz_id]
+
+        self.bucle.lanzar(generar())
+        return futuro
+
+    def obtener(self, voz_id, timeout=None):
+        """Ruta de la muestra, generándola (o esperando a quien ya la genera) si falta.
+
+        Una petición de usuario no hace cola tras el precalentamiento: las
+        voces en cola sólo entran en vuelo cuando un trabajador las toma.
+        """
+        return self._lanzar(voz_id).result(timeout)
+
+    # --- Precalentamiento ---
+
+    async def _trabajador(self):
+        while True:
+            while self.ocupado():
+                await asyncio.sleep(ESPERA_OCUPADO)
+            with self._lock:
+                if not self._cola:
+                    self._trabajadores -= 1
+                    return
+                voz_id = self._cola.popleft()
+            try:
+                await asyncio.wrap_future(self._lanzar(voz_id))
+            except Exception:
+                pass  # Se volverá a intentar cuando alguien la pida
+
+    def _arrancar_trabajadores(self):
+        with self._lock:
+            nuevos = min(self.concurrencia - self._trabajadores, len(self._cola))
+            self._trabajadores += max(nuevos, 0)
+        for _ in range(nuevos):
+            asyncio.get_running_loop().create_task(self._trabajador())
+
+    def precalentar(self, voces):
+        """Genera en segundo plano las muestras que falten. Devuelve cuántas se encolaron."""
+        with self._lock:
+            en_cola = set(self._cola)
+        nuevas = [v for v in dict.fromkeys(voces) if v not in en_cola and not self.ruta(v).exists()]
+        if nuevas:
+            with self._lock:
+                self._cola.extend(nuevas)
+            self.bucle.obtener().call_soon_threadsafe(self._arrancar_trabajadores)
+        return len(nuevas)
+
+    def estado(self):
+        with self._lock:
+            return {
+                'en_vuelo': len(self._en_vuelo),
+                'en_cola': len(self._cola),
+                'generadas': self.generadas,
+            }
@@ -0,0 +1,111 @@
+"""
+Normalización de texto para voz
+===============================
+Limpia el texto de un capítulo antes de sintetizarlo. Motor común a la
+interfaz web y a la CLI: recorre el texto una sola vez con un patrón que
+agrupa signos, espacios y saltos de línea, en lugar de encadenar varias
+sustituciones sobre el texto completo.
+
+Cada idioma tiene su juego de reglas: qué signos se conservan además de letras,
+dígitos y espacios, y qué caracteres se sustituyen. Con las reglas de español
+el resultado es idéntico a la limpieza original:
+
+    \\n{3,} -> \\n\\n, [—–] -> ", ", resto de signos -> " ", " +" -> " ", strip()
+"""
+
+import re
+
+# Signos que se conservaban siempre (además de \w y \s)
+_PUNTUACION_BASE = ".,;:!?¿¡'\"()-"
+_GUIONES = {'—': ', ', '–': ', '}
+
+REGLAS = {
+    'es': {'conservar': _PUNTUACION_BASE, 'sustituir': _GUIONES},
+    'en': {'conservar': _PUNTUACION_BASE + "’‘“”…", 'sustituir': _GUIONES},
+    'fr': {'conservar': _PUNTUACION_BASE + "«»’“”…", 'sustituir': _GUIONES},
+    'de': {'conservar': _PUNTUACION_BASE + "„“‚‘’»«…", 'sustituir': _GUIONES},
+    'pt': {'conservar': _PUNTUACION_BASE + "«»’“”…", 'sustituir': _GUIONES},
+    'it': {'conservar': _PUNTUACION_BASE + "«»’“”…", 'sustituir': _GUIONES},
+    'ru': {'conservar': _PUNTUACION_BASE + "«»„“…", 'sustituir': _GUIONES},
+    'ja': {'conservar': _PUNTUACION_BASE + "。、「」『』！？・…", 'sustituir': _GUIONES},
+    'zh': {'conservar': _PUNTUACION_BASE + "，。！？、；：「」《》“”…", 'sustituir': _GUIONES},
+    'ko': {'conservar': _PUNTUACION_BASE + "“”‘’…", 'sustituir': _GUIONES},
+    'ar': {'conservar': _PUNTUACION_BASE + "،؛؟«»…", 'sustituir': _GUIONES},
+}
+IDIOMA_DEFECTO = 'es'
+
+# Espacios que no son ' ' ni '\n' (todos están por debajo de U+3001): se
+# conservan siempre, como en la limpieza original
+_OTROS_ESPACIOS = ''.join(
+    c for c in map(chr, range(0x3001)) if c.isspace() and c not in ' \n'
+)
+_SALTOS = re.compile(r'\n{3,}')
+_ESPACIOS = re.compile(r' {2,}')
+_MAX_RACHA = 16        # Longitud máxima de una racha que se memoriza
+_MAX_RACHAS = 4096     # Rachas distintas memorizadas por normalizador
+
+
+class _Tabla(dict):
+    """Tabla de str.translate que decide cada carácter la primera vez que aparece."""
+
+    def __init__(self, conservar, sustituir):
+        super().__init__({ord(c): v for c, v in sustituir.items()})
+        self._permitido = re.compile(r'[\w\s' + re.escape(conservar) + r']')
+
+    def __missing__(self, codigo):
+        # None no sirve: borraría el carácter. Se guarda el propio carácter o un espacio.
+        caracter = chr(codigo)
+        valor = caracter if self._permitido.match(caracter) else ' '
+        self[codigo] = valor
+        return valor
+
+
+class Normalizador:
+    """Limpia texto para voz con las reglas de un idioma.
+
+    Un único patrón localiza las rachas de espacios, saltos de línea y signos
+    descartados; sólo esas rachas (cortas y poco frecuentes en prosa) pasan
+    por la tabla de traducción, y el resto del texto se copia tal cual.
+    """
+
+    def __init__(self, conservar=_PUNTUACION_BASE, sustituir=_GUIONES):
+        self._tabla = _Tabla(conservar, sustituir)
+        self._rachas = {}   # Las mismas rachas (" — ", "\n\n\n") se repiten mucho
+        conservar = re.escape(conservar)
+        racha = r'[^\w' + re.escape(_OTROS_ESPACIOS) + conservar + r']'
+        descartado = r'[^\w\s' + conservar + r']'
+        self._patron = re.compile(racha + r'{2,}|' + descartado)
+
+    def _sustituir(self, m):
+        original = m.group()
+        limpia = self._rachas.get(original)
+        if limpia is None:
+            # Cada racha está rodeada de caracteres que se conservan, así que
+            # aplicarle las reglas por separado da lo mismo que sobre todo el texto
+            limpia = _ESPACIOS.sub(' ', _SALTOS.sub('\n\n', original.translate(self._tabla)))
+            if len(original) <= _MAX_RACHA and len(self._rachas) < _MAX_RACHAS:
+                self._rachas[original] = limpia
+        return limpia
+
+    def __call__(self, texto):
+        return self._patron.sub(self._sustituir, texto).strip()
+
+
+_normalizadores = {}
+
+
+def normalizador(idioma=IDIOMA_DEFECTO):
+    """Normalizador (cacheado) para un código de idioma como 'es' o 'en'."""
+    idioma = idioma if idioma in REGLAS else IDIOMA_DEFECTO
+    if idioma not in _normalizadores:
+        _normalizadores[idioma] = Normalizador(**REGLAS[idioma])
+    return _normalizadores[idioma]
+
+
+def normalizar(texto, idioma=IDIOMA_DEFECTO):
+    return normalizador(idioma)(texto)
+
+
+def idioma_de_voz(voz_id):
+    """Código de idioma de un ShortName de edge-tts (es-MX-JorgeNeural -> es)."""
+    return voz_id.split('-')[0].lower() if voz_id and '-' in voz_id else IDIOMA_DEFECTO
@@ -0,0 +1,115 @@
+"""
+Perfil de tiempos de un trabajo
+===============================
+Línea de tiempo de cada capítulo de una conversión (cuándo se lanza, se
+limpia, empieza a sintetizarse, llega su primer byte o sale de la cache de
+audio y termina, y cuántos bytes escribe) y de cada pausa forzada del limitador mientras el trabajo
+corre. Los instantes son segundos desde que el trabajo empezó a convertir.
+
+resumen() agrega las etapas con percentiles para ver dónde se fue el
+tiempo de reloj:
+
+    cola         del inicio del trabajo a que el capítulo consigue turno
+    limpieza     normalización del texto (en un hilo)
+    primer_byte  del inicio de la síntesis al primer audio escrito en orden
+    sintesis     del inicio de la síntesis al MP3 completo en disco
+    cache        del inicio de la síntesis a tener copiado el audio de la cache
+    total        de que el capítulo consigue turno a que termina
+
+Los capítulos que salen de la cache no cuentan en primer_byte ni en sintesis.
+
+El perfil vive en memoria mientras el trabajo corre; app.py guarda su
+resumen en el almacén al terminar.
+"""
+
+import threading
+import time
+
+ETAPAS = {
+    'cola': (None, 'lanzado'),
+    'limpieza': ('lanzado', 'limpio'),
+    'primer_byte': ('inicio_sintesis', 'primer_byte'),
+    'sintesis': ('inicio_sintesis', 'fin'),
+    'cache': ('inicio_sintesis', 'cache'),
+    'total': ('lanzado', 'fin'),
+}
+SOLO_SINTETIZADOS = ('primer_byte', 'sintesis')   # Etapas sin los capítulos de la cache
+PERCENTILES = (50, 90, 99)
+
+
+def percentil(valores, p):
+    """Percentil `p` (0-100) por rango más cercano de una lista ordenada."""
+    if not valores:
+        return None
+    rango = max(1, -(-p * len(valores) // 100))
+    return valores[rango - 1]
+
+
+class PerfilTrabajo:
+    """Tiempos de los capítulos y pausas de un trabajo. Seguro entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origen = time.monotonic()
+        self._final = None
+        self.capitulos = {}   # cap_id -> línea de tiempo
+        self.pausas = []      # {'inicio', 'fin'}; 'fin' None mientras dura
+
+    def ahora(self):
+        """Segundos desde el inicio del trabajo (fijos una vez terminado)."""
+        return round((self._final or time.monotonic()) - self._origen, 4)
+
+    def marcar(self, cap_id, hito, instante=None, **datos):
+        """Anota `hito` del capítulo (ahora, o en el instante monotonic dado) y datos extra."""
+        momento = self.ahora() if instante is None else round(instante - self._origen, 4)
+        with self._lock:
+            linea = self.capitulos.setdefault(cap_id, {'cap_id': cap_id})
+            linea[hito] = momento
+            linea.update(datos)
+
+    def pausa(self, pausado):
+        """Abre (True) o cierra (False) una pausa forzada."""
+        with self._lock:
+            if pausado:
+                if not self.pausas or self.pausas[-1]['fin'] is not None:
+                    self.pausas.append({'inicio': self.ahora(), 'fin': None})
+            elif self.pausas and self.pausas[-1]['fin'] is None:
+                self.pausas[-1]['fin'] = self.ahora()
+
+    def terminar(self):
+        """Cierra la pausa que quede abierta y detiene el reloj del trabajo."""
+        self.pausa(False)
+        self._final = time.monotonic()
+
+    def resumen(self):
+        """Etapas con percentiles, pausas y la línea de tiempo de cada capítulo."""
+        with self._lock:
+            capitulos = sorted((dict(c) for c in self.capitulos.values()), key=lambda c: c.get('lanzado', 0))
+            pausas = [dict(p) for p in self.pausas]
+        ahora = self.ahora()
+
+        etapas = {}
+        for nombre, (desde, hasta) in ETAPAS.items():
+            duraciones = sorted(
+                c[hasta] - (c[desde] if desde else 0) for c in capitulos
+                if hasta in c and (desde is None or desde in c)
+                and not (nombre in SOLO_SINTETIZADOS and 'cache' in c)
+            )
+            etapa = {'capitulos': len(duraciones), 'suma': round(sum(duraciones), 3)}
+            for p in PERCENTILES:
+                valor = percentil(duraciones, p)
+                etapa[f'p{p}'] = None if valor is None else round(valor, 3)
+            etapa['max'] = round(duraciones[-1], 3) if duraciones else None
+            etapas[nombre] = etapa
+
+        pausado = sum((p['fin'] if p['fin'] is not None else ahora) - p['inicio'] for p in pausas)
+        terminados = [c for c in capitulos if 'fin' in c]
+        return {
+            'duracion': ahora,
+            'capitulos_terminados': len(terminados),
+            'bytes': sum(c.get('bytes', 0) for c in terminados),
+            'caracteres': sum(c.get('caracteres', 0) for c in terminados),
+            'etapas': etapas,
+            'pausas': {'numero': len(pausas), 'total': round(pausado, 3), 'lista': pausas},
+            'capitulos': capitulos,
+        }
@@ -0,0 +1,101 @@
+"""
+Planificador global de conversiones
+===================================
+Limita cuántos trabajos corren a la vez (el resto espera en una cola FIFO) y
+reparte los huecos de síntesis por capítulo en turno rotatorio entre clientes,
+para que un libro de miles de capítulos no acapare el servicio.
+
+Los turnos se entregan como concurrent.futures.Future, así que sirven para
+trabajos que corren en hilos y event loops distintos.
+"""
+
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+
+class Planificador:
+    """Cola de trabajos con tope de ejecución y turnos justos por capítulo."""
+
+    def __init__(self, max_trabajos=3, max_capitulos=8):
+        self.max_trabajos = max_trabajos
+        self._lock = threading.Lock()
+        self._cola = deque()           # (job_id, lanzar) en orden de llegada
+        self._corriendo = set()
+        self._libres = max_capitulos   # huecos de capítulo sin asignar
+        self._esperas = OrderedDict()  # cliente -> deque de Futures, en orden de turno
+
+    # --- Trabajos ---
+
+    def encolar(self, job_id, lanzar):
+        """Añade un trabajo; `lanzar()` se llama cuando le toque arrancar."""
+        with self._lock:
+            self._cola.append((job_id, lanzar))
+        self._despachar()
+
+    def terminar(self, job_id):
+        """Libera el hueco de un trabajo que ha acabado (bien o con error)."""
+        with self._lock:
+            self._corriendo.discard(job_id)
+        self._despachar()
+
+    def posicion(self, job_id):
+        """Posición (1 = el siguiente) del trabajo en la cola, o None si no espera."""
+        with self._lock:
+            for i, (jid, _) in enumerate(self._cola, 1):
+                if jid == job_id:
+                    return i
+        return None
+
+    def ocupado(self):
+        """True si hay trabajos convirtiendo o esperando en la cola."""
+        with self._lock:
+            return bool(self._cola or self._corriendo)
+
+    def _despachar(self):
+        arrancar = []
+        with self._lock:
+            while self._cola and len(self._corriendo) < self.max_trabajos:
+                job_id, lanzar = self._cola.popleft()
+                self._corriendo.add(job_id)
+                arrancar.append(lanzar)
+        for lanzar in arrancar:
+            lanzar()
+
+    # --- Turnos de capítulo ---
+
+    def pedir_turno(self, cliente):
+        """Devuelve un Future que se resuelve cuando el cliente puede lanzar un capítulo."""
+        futuro = Future()
+        with self._lock:
+            if self._libres > 0 and not self._esperas:
+                self._libres -= 1
+                futuro.set_running_or_notify_cancel()
+                futuro.set_result(None)
+            else:
+                self._esperas.setdefault(cliente, deque()).append(futuro)
+        return futuro
+
+    def liberar_turno(self):
+        """Devuelve un hueco y se lo entrega al siguiente cliente en la rueda."""
+        with self._lock:
+            self._libres += 1
+            while self._libres > 0 and self._esperas:
+                cliente, pendientes = next(iter(self._esperas.items()))
+                futuro = pendientes.popleft()
+                # El cliente pasa al final de la rueda (o sale si no espera más)
+                del self._esperas[cliente]
+                if pendientes:
+                    self._esperas[cliente] = pendientes
+                if futuro.set_running_or_notify_cancel():
+                    self._libres -= 1
+                    futuro.set_result(None)
+
+    def estado(self):
+        with self._lock:
+            return {
+                'en_cola': len(self._cola),
+                'corriendo': len(self._corriendo),
+                'capitulos_libres': self._libres,
+                'clientes_esperando': len(self._esperas),
+            }
@@ -0,0 +1,267 @@
+"""
+Sesión de síntesis con conexiones reutilizables
+===============================================
+edge_tts.Communicate abre un WebSocket nuevo (DNS, TLS y handshake) por cada
+llamada, y otro más por cada trozo de 4 KB del texto. El servicio admite
+varios turnos seguidos sobre la misma conexión, así que la sesión guarda las
+conexiones libres y las reutiliza: la configuración (speech.config) se manda
+una vez por conexión y después cada petición es sólo el SSML y su audio.
+Si el servicio rechaza la conexión con HTTP 429 se lanza Limitacion, que el
+limitador trata como una limitación: reduce la tasa y reintenta.
+
+Todas las conexiones salen de un único aiohttp.ClientSession con su
+conector, que conserva además la cache de DNS. Una conexión sólo atiende una
+petición a la vez; las peticiones simultáneas abren las que falten y al
+terminar se quedan hasta `max_libres` esperando la siguiente.
+
+Cada llamada registra por separado el tiempo de preparación (conseguir una
+conexión lista) y el de transmisión (del SSML al fin del turno). Con `url`
+se puede apuntar a un servidor WebSocket local que imite el protocolo.
+
+Es el motor 'edge' de sintetizadores.py.
+"""
+
+import asyncio
+import ssl
+import time
+from collections import deque
+from xml.sax.saxutils import escape
+
+import aiohttp
+import certifi
+from edge_tts.communicate import (
+    connect_id, date_to_string, get_headers_and_data, mkssml,
+    remove_incompatible_characters, split_text_by_byte_length, ssml_headers_plus_data,
+)
+from edge_tts.constants import SEC_MS_GEC_VERSION, WSS_HEADERS, WSS_URL
+from edge_tts.data_classes import TTSConfig
+from edge_tts.drm import DRM
+from edge_tts.exceptions import NoAudioReceived, UnexpectedResponse, UnknownResponse, WebSocketError
+
+from sintetizadores import Limitacion, Sintetizador
+
+MAX_LIBRES = 8            # Conexiones libres que se guardan para reutilizar
+INACTIVIDAD = 30          # Segundos tras los que una conexión libre se descarta
+TIMEOUT_CONEXION = 10
+TIMEOUT_LECTURA = 60
+MEDIDAS = 1000            # Llamadas recientes cuyos tiempos se conservan
+_BYTES_PETICION = 4096    # Máximo de texto (escapado, UTF-8) por SSML
+
+_CONFIGURACION = (
+    "Content-Type:application/json; charset=utf-8\r\n"
+    "Path:speech.config\r\n\r\n"
+    '{"context":{"synthesis":{"audio":{"metadataoptions":{'
+    '"sentenceBoundaryEnabled":"true","wordBoundaryEnabled":"false"},'
+    '"outputFormat":"audio-24khz-48kbitrate-mono-mp3"}}}}\r\n'
+)
+
+
+def _url_edge():
+    return (f"{WSS_URL}&ConnectionId={connect_id()}"
+            f"&Sec-MS-GEC={DRM.generate_sec_ms_gec()}"
+            f"&Sec-MS-GEC-Version={SEC_MS_GEC_VERSION}")
+
+
+class _Conexion:
+    def __init__(self, ws):
+        self.ws = ws
+        self.usada = time.monotonic()
+
+
+class SesionSintesis(Sintetizador):
+    """Síntesis con edge-tts sobre conexiones WebSocket que se mantienen abiertas."""
+
+    nombre = 'edge'
+
+    def __init__(self, url=None, max_libres=MAX_LIBRES, inactividad=INACTIVIDAD,
+                 timeout_conexion=TIMEOUT_CONEXION, timeout_lectura=TIMEOUT_LECTURA):
+        # Sin `url` se usa el servicio de Edge, con su token y cabeceras
+        self.url = url
+        self.max_libres = max_libres
+        self.inactividad = inactividad
+        self.timeout_conexion = timeout_conexion
+        self.timeout_lectura = timeout_lectura
+
+        self._loop = None
+        self._http = None
+        self._libres = []
+        self.medidas = deque(maxlen=MEDIDAS)
+        self.llamadas = 0
+        self.conexiones = 0
+        self.reutilizadas = 0
+
+    # --- Conexiones ---
+
+    def _preparar(self):
+        """Crea la ClientSession en el event loop actual la primera vez.
+
+        Las conexiones pertenecen a ese loop: para usar la sesión desde otro
+        hay que cerrarla antes con cerrar(), que la deja lista para empezar.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._http is not None and not self._http.closed:
+            raise RuntimeError("La sesión de síntesis está abierta en otro event loop: ciérrala con cerrar()")
+        self._libres = []
+        self._loop = loop
+        self._http = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(ttl_dns_cache=300),
+            trust_env=True,
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.timeout_conexion),
+        )
+
+    async def _abrir(self):
+        if self.url is not None:
+            return await self._http.ws_connect(self.url)
+        argumentos = dict(
+            compress=15,
+            headers=DRM.headers_with_muid(WSS_HEADERS),
+            ssl=ssl.create_default_context(cafile=certifi.where()),
+        )
+        try:
+            return await self._http.ws_connect(_url_edge(), **argumentos)
+        except aiohttp.WSServerHandshakeError as e:
+            if e.status != 403:
+                raise
+            # Reloj desajustado respecto al servicio: corregir el token y reintentar
+            DRM.handle_client_response_error(e)
+            return await self._http.ws_connect(_url_edge(), **argumentos)
+
+    async def _conectar(self):
+        try:
+            ws = await self._abrir()
+        except aiohttp.WSServerHandshakeError as e:
+            if e.status == 429:
+                raise Limitacion("El servicio limita las peticiones (HTTP 429)") from e
+            raise
+        await ws.send_str(f"X-Timestamp:{date_to_string()}\r\n" + _CONFIGURACION)
+        self.conexiones += 1
+        return _Conexion(ws)
+
+    async def _tomar(self):
+        """Una conexión libre y viva si la hay; si no, una nueva. Devuelve (conexión, reutilizada)."""
+        self._preparar()
+        ahora = time.monotonic()
+        while self._libres:
+            conexion = self._libres.pop()
+            if not conexion.ws.closed and ahora - conexion.usada < self.inactividad:
+                return conexion, True
+            await conexion.ws.close()
+        return await self._conectar(), False
+
+    async def _devolver(self, conexion):
+        conexion.usada = time.monotonic()
+        if len(self._libres) < self.max_libres and not conexion.ws.closed:
+            self._libres.append(conexion)
+        else:
+            await conexion.ws.close()
+
+    async def cerrar(self):
+        """Cierra las conexiones libres y la sesión HTTP."""
+        libres, self._libres = self._libres, []
+        for conexion in libres:
+            await conexion.ws.close()
+        if self._http is not None:
+            await self._http.close()
+        self._http = None
+        self._loop = None
+
+    # --- Protocolo ---
+
+    async def _turno(self, ws, ssml):
+        """Manda un SSML y devuelve su audio trozo a trozo hasta turn.end."""
+        await ws.send_str(ssml_headers_plus_data(connect_id(), date_to_string(), ssml))
+        while True:
+            mensaje = await ws.receive(timeout=self.timeout_lectura)
+            if mensaje.type == aiohttp.WSMsgType.TEXT:
+                datos = mensaje.data.encode('utf-8')
+                cabeceras, _ = get_headers_and_data(datos, datos.find(b"\r\n\r\n"))
+                ruta = cabeceras.get(b"Path")
+                if ruta == b"turn.end":
+                    return
+                if ruta not in (b"response", b"turn.start", b"audio.metadata"):
+                    raise UnknownResponse(f"Respuesta desconocida: {ruta!r}")
+            elif mensaje.type == aiohttp.WSMsgType.BINARY:
+                if len(mensaje.data) < 2:
+                    raise UnexpectedResponse("Mensaje binario sin longitud de cabecera")
+                largo = int.from_bytes(mensaje.data[:2], 'big')
+                if largo > len(mensaje.data):
+                    raise UnexpectedResponse("Cabecera más larga que el mensaje")
+                cabeceras, datos = get_headers_and_data(mensaje.data, largo)
+                if cabeceras.get(b"Path") != b"audio":
+                    raise UnexpectedResponse("Mensaje binario que no es audio")
+                if datos:
+                    yield datos
+            elif mensaje.type == aiohttp.WSMsgType.ERROR:
+                raise WebSocketError(str(mensaje.data or "Error desconocido"))
+            else:
+                # CLOSE/CLOSED: el servicio ha cerrado la conexión en mitad del turno
+                raise WebSocketError("El servicio cerró la conexión")
+
+    async def transmitir(self, texto, voz):
+        """Generador asíncrono con el MP3 de `texto` a medida que llega."""
+        partes = list(split_text_by_byte_length(escape(remove_incompatible_characters(texto)), _BYTES_PETICION))
+        configuracion = TTSConfig(voz, "+0%", "+0%", "+0Hz", "SentenceBoundary")
+        inicio = time.perf_counter()
+        conexion, reutilizada = await self._tomar()
+        medida = {
+            'voz': voz,
+            'caracteres': len(texto),
+            'reutilizada': reutilizada,
+            'preparacion': time.perf_counter() - inicio,
+            'primer_audio': None,
+            'transmision': 0.0,
+            'bytes': 0,
+        }
+        self.llamadas += 1
+
+        comienzo = time.perf_counter()
+        hechas = 0
+        ok = False
+        try:
+            while hechas < len(partes):
+                try:
+                    async for datos in self._turno(conexion.ws, mkssml(configuracion, partes[hechas])):
+                        if medida['primer_audio'] is None:
+                            medida['primer_audio'] = time.perf_counter() - comienzo
+                        medida['bytes'] += len(datos)
+                        yield datos
+                except (aiohttp.ClientError, WebSocketError, ConnectionError):
+                    if not (reutilizada and hechas == 0 and medida['bytes'] == 0):
+                        raise
+                    # La conexión guardada había caducado en el servicio: una nueva y repetir
+                    await conexion.ws.close()
+                    t = time.perf_counter()
+                    conexion, reutilizada = await self._conectar(), False
+                    medida['reutilizada'] = False
+                    medida['preparacion'] += time.perf_counter() - t
+                    continue
+                hechas += 1
+            if not medida['bytes']:
+                raise NoAudioReceived("No se recibió audio: revisa la voz y el texto")
+            ok = True
+        finally:
+            medida['transmision'] = time.perf_counter() - comienzo
+            self._registrar(medida)
+            if medida['reutilizada']:
+                self.reutilizadas += 1
+            if ok:
+                await self._devolver(conexion)
+            else:
+                # A medio turno la conexión queda desincronizada: no se reutiliza
+                await conexion.ws.close()
+
+    def estado(self):
+        """Resumen de las llamadas recientes para exponer en la API."""
+        medidas = list(self.medidas)
+        n = len(medidas) or 1
+        return {
+            'motor': self.nombre,
+            'llamadas': self.llamadas,
+            'conexiones': self.conexiones,
+            'reutilizadas': self.reutilizadas,
+            'libres': len(self._libres),
+            'preparacion_media': round(sum(m['preparacion'] for m in medidas) / n, 4),
+            'transmision_media': round(sum(m['transmision'] for m in medidas) / n, 4),
+        }
@@ -0,0 +1,194 @@
+"""
+Síntesis por segmentos
+======================
+Divide el texto de un capítulo en segmentos que terminan en fin de frase,
+los sintetiza en paralelo con edge-tts y une el audio en un único MP3,
+escribiéndolo a medida que llega.
+
+edge-tts devuelve MP3 sin cabecera (sólo tramas), así que los segmentos se
+pueden concatenar byte a byte sin recodificar. Cada segmento pasa por el
+limitador por separado, de modo que un corte de conexión sólo repite ese trozo.
+"""
+
+import asyncio
+import os
+import re
+
+TAMANO_SEGMENTO = 3000        # Caracteres máximos por petición
+CONCURRENCIA_SEGMENTOS = 4    # Segmentos de un mismo capítulo en vuelo
+
+# Fin de frase (puntuación seguida de cierres opcionales y espacio) o salto de párrafo
+_FIN_FRASE = re.compile(r'[.!?…]+["\'»”)\]]*\s+|\n\s*\n')
+# Cortes aceptables dentro de una frase demasiado larga
+_CORTE_BLANDO = re.compile(r'[,;:]\s+|\s+')
+
+
+def _partir_frase_larga(frase, tamano_max):
+    """Parte una frase que no cabe en un segmento por comas o espacios."""
+    trozos = []
+    while len(frase) > tamano_max:
+        corte = 0
+        for m in _CORTE_BLANDO.finditer(frase, 0, tamano_max):
+            corte = m.end()
+        if corte == 0:
+            corte = tamano_max  # Sin espacios: corte duro
+        trozos.append(frase[:corte].strip())
+        frase = frase[corte:]
+    if frase.strip():
+        trozos.append(frase.strip())
+    return trozos
+
+
+def dividir_en_segmentos(texto, tamano_max=TAMANO_SEGMENTO):
+    """Agrupa frases consecutivas en segmentos de como mucho `tamano_max` caracteres."""
+    segmentos = []
+    actual = []
+    largo = 0
+
+    def cerrar():
+        nonlocal actual, largo
+        if actual:
+            segmentos.append(' '.join(actual))
+        actual, largo = [], 0
+
+    inicio = 0
+    for m in _FIN_FRASE.finditer(texto):
+        frase = texto[inicio:m.end()].strip()
+        inicio = m.end()
+        if not frase:
+            continue
+        if len(frase) > tamano_max:
+            cerrar()
+            segmentos.extend(_partir_frase_larga(frase, tamano_max))
+            continue
+        if largo + len(frase) + 1 > tamano_max:
+            cerrar()
+        actual.append(frase)
+        largo += len(frase) + 1
+
+    resto = texto[inicio:].strip()
+    if resto:
+        if len(resto) > tamano_max:
+            cerrar()
+            segmentos.extend(_partir_frase_larga(resto, tamano_max))
+        else:
+            if largo + len(resto) + 1 > tamano_max:
+                cerrar()
+            actual.append(resto)
+    cerrar()
+    return segmentos
+
+
+async def transmitir_bytes(texto, voz, sintetizador=None):
+    """Generador asíncrono con el MP3 de un texto corto a medida que llega.
+
+    Con `sintetizador` (ver sintetizadores.py) se usa ese motor; sin él se
+    abre una conexión con edge-tts sólo para esta llamada.
+    """
+    if sintetizador is not None:
+        async for datos in sintetizador.transmitir(texto, voz):
+            yield datos
+        return
+    import edge_tts
+    communicate = edge_tts.Communicate(texto, voz)
+    async for chunk in communicate.stream():
+        if chunk['type'] == 'audio':
+            yield chunk['data']
+
+
+async def sintetizar_bytes(texto, voz, sintetizador=None):
+    """Sintetiza un texto corto y devuelve el MP3 en memoria."""
+    audio = bytearray()
+    async for datos in transmitir_bytes(texto, voz, sintetizador):
+        audio.extend(datos)
+    return bytes(audio)
+
+
+async def sintetizar_archivo(texto, archivo, voz, limitador,
+                             tamano_max=TAMANO_SEGMENTO,
+                             concurrencia=CONCURRENCIA_SEGMENTOS,
+                             cache=None, emision=None, sintetizador=None):
+    """Sintetiza `texto` por segmentos en paralelo y escribe un único MP3.
+
+    El archivo se escribe primero como `.part` y se renombra al final, así que
+    un MP3 con el nombre definitivo siempre está completo. El segmento que
+    toca escribir se vuelca según llega su audio; los siguientes se guardan
+    en memoria hasta que les toque. Con `emision` cada trozo escrito se
+    publica también ahí para quien esté escuchando. Con `cache` se reutiliza
+    el audio de una síntesis idéntica anterior. `sintetizador` elige el motor.
+    Devuelve False si el audio salió de la cache y True si se sintetizó.
+    """
+    if cache is not None:
+        return await cache.materializar(texto, voz, archivo, lambda ruta: sintetizar_archivo(
+            texto, ruta, voz, limitador, tamano_max, concurrencia, emision=emision, sintetizador=sintetizador
+        ))
+
+    segmentos = dividir_en_segmentos(texto, tamano_max)
+    semaforo = asyncio.Semaphore(concurrencia)
+    recibido = [bytearray() for _ in segmentos]   # Audio aún sin escribir de cada segmento
+    completos = [False] * len(segmentos)
+    escritas = 0          # Segmentos escritos enteros; el siguiente es el que se vuelca en vivo
+    en_curso = 0          # Bytes ya escritos del segmento en curso
+    temporal = f"{archivo}.part"
+
+    with open(temporal, 'wb') as f:
+        if emision is not None:
+            emision.volcar_en(temporal)
+
+        def volcar():
+            # Escribe lo recibido del segmento en curso y los siguientes ya completos
+            nonlocal escritas, en_curso
+            while escritas < len(segmentos):
+                datos = recibido[escritas]
+                if datos:
+                    f.write(datos)
+                    if emision is not None:
+                        f.flush()   # Quien se quede atrás lo leerá del disco
+                        emision.escribir(datos)
+                    en_curso += len(datos)
+                    recibido[escritas] = bytearray()
+                if not completos[escritas]:
+                    return
+                escritas += 1
+                en_curso = 0
+
+        def descartar(i):
+            # Un intento fallido no vale: su reintento empieza de cero
+            nonlocal en_curso
+            recibido[i] = bytearray()
+            if i == escritas and en_curso and not f.closed:
+                inicio = f.tell() - en_curso
+                f.seek(inicio)
+                f.truncate()
+                if emision is not None:
+                    emision.rebobinar(inicio)
+                en_curso = 0
+
+        async def intento(i, segmento):
+            try:
+                async for datos in transmitir_bytes(segmento, voz, sintetizador):
+                    recibido[i].extend(datos)
+                    if i == escritas:
+                        volcar()
+            except BaseException:
+                descartar(i)
+                raise
+
+        async def sintetizar_segmento(i, segmento):
+            async with semaforo:
+                await limitador.ejecutar(lambda: intento(i, segmento))
+            completos[i] = True
+            volcar()
+
+        tareas = [asyncio.ensure_future(sintetizar_segmento(i, s)) for i, s in enumerate(segmentos)]
+        try:
+            await asyncio.gather(*tareas)
+        except BaseException:
+            # Un segmento agotó sus reintentos: no seguir gastando peticiones
+            for tarea in tareas:
+                tarea.cancel()
+            f.close()
+            os.unlink(temporal)
+            raise
+    os.replace(temporal, archivo)
+    return True
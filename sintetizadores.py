@@ -0,0 +1,238 @@
+"""
+Motores de síntesis
+===================
+Interfaz común de los motores que convierten texto en MP3 y un motor
+offline para pruebas de carga. La aplicación y la CLI eligen el motor con
+una especificación de texto:
+
+    edge                                    servicio de Edge (por defecto)
+    edge:url=ws://localhost:8765/tts        servidor local que imita el protocolo
+    offline                                 audio local, sin red
+    offline:latencia=0.3,errores=0.05,tasa=4
+
+Opciones del motor edge (ver sesion_sintesis.py):
+    url               WebSocket al que conectarse en vez del servicio de Edge
+    max_libres        conexiones libres que se guardan para reutilizar
+    inactividad       segundos tras los que una conexión libre se descarta
+    timeout_conexion  segundos máximos para abrir una conexión
+    timeout_lectura   segundos máximos esperando cada mensaje
+
+Opciones del motor offline:
+    latencia     segundos hasta el primer audio de cada llamada
+    variacion    fracción aleatoria (±) aplicada a la latencia
+    velocidad    caracteres por segundo a los que llega el audio (0 = de golpe)
+    errores      probabilidad de que una llamada falle con un error transitorio
+    tasa         llamadas por segundo que acepta antes de limitar (0 = sin límite)
+    simultaneas  llamadas a la vez que acepta antes de limitar (0 = sin límite)
+    cps          caracteres por segundo de habla: fija la duración del audio
+    semilla      semilla de las decisiones aleatorias
+
+El motor offline es determinista: que una llamada falle depende sólo de la
+semilla, el texto, la voz y el número de intento, no del orden en que
+lleguen las peticiones, así que dos ejecuciones iguales se comportan igual.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import deque
+
+FORMATO_EDGE = "audio-24khz-48kbitrate-mono-mp3"
+
+# Trama MPEG-2 Layer III, 48 kbps, 24 kHz, mono (el formato de edge-tts): 576
+# muestras en 144 bytes. Con la información lateral a cero decodifica a silencio.
+_CABECERA_TRAMA = ((0x7FF << 21) | (2 << 19) | (1 << 17) | (1 << 16)
+                   | (6 << 12) | (1 << 10) | (3 << 6)).to_bytes(4, 'big')
+_TRAMA_SILENCIO = _CABECERA_TRAMA + bytes(140)
+_SEGUNDOS_TRAMA = 576 / 24000
+_TRAMAS_TROZO = 40          # ~1 s de audio por trozo entregado
+MEDIDAS = 1000              # Llamadas recientes cuyos tiempos se conservan
+
+
+class Sintetizador:
+    """Interfaz de un motor de síntesis.
+
+    `formato` forma parte de la clave de la cache de audio, para que el audio
+    de motores distintos no se mezcle. Cada llamada suma uno a `llamadas` y
+    deja en `medidas` sus tiempos: 'preparacion' (hasta poder pedir el audio),
+    'primer_audio' y 'transmision' (desde la petición hasta el último byte).
+    Con `al_medir`, cada medida se entrega también a esa función al terminar
+    la llamada, haya ido bien o no.
+    """
+
+    nombre = ''
+    formato = FORMATO_EDGE
+    llamadas = 0
+    medidas = ()
+    al_medir = None
+
+    async def transmitir(self, texto, voz):
+        """Generador asíncrono con el MP3 de `texto` a medida que se produce."""
+        raise NotImplementedError
+        yield
+
+    async def sintetizar(self, texto, voz):
+        """Sintetiza un texto y devuelve el MP3 en memoria."""
+        audio = bytearray()
+        async for datos in self.transmitir(texto, voz):
+            audio.extend(datos)
+        return bytes(audio)
+
+    async def cerrar(self):
+        """Libera conexiones y recursos."""
+
+    def _registrar(self, medida):
+        self.medidas.append(medida)
+        if self.al_medir is not None:
+            self.al_medir(medida)
+
+    def estado(self):
+        """Resumen para exponer en la API."""
+        return {'motor': self.nombre}
+
+
+class Limitacion(ConnectionError):
+    """El motor rechaza la llamada por exceso de peticiones (el limitador la reintenta)."""
+
+
+class ErrorSimulado(ConnectionError):
+    """Fallo transitorio del motor offline (el limitador lo reintenta)."""
+
+
+class LimitacionSimulada(ErrorSimulado, Limitacion):
+    """El motor offline rechaza la llamada por exceso de peticiones."""
+
+
+class SintetizadorOffline(Sintetizador):
+    """Silencio MP3 válido con la duración que tendría el texto hablado."""
+
+    nombre = 'offline'
+    formato = 'offline-' + FORMATO_EDGE
+
+    def __init__(self, latencia=0.1, variacion=0.0, velocidad=0.0, errores=0.0,
+                 tasa=0.0, simultaneas=0, cps=15.0, semilla=0):
+        self.latencia = latencia
+        self.variacion = variacion
+        self.velocidad = velocidad
+        self.errores = errores
+        self.tasa = tasa
+        self.simultaneas = int(simultaneas)
+        self.cps = cps
+        self.semilla = int(semilla)
+
+        self._intentos = {}            # (voz, hash del texto) -> intentos hechos
+        self._recientes = deque()      # instantes de las llamadas del último segundo
+        self.medidas = deque(maxlen=MEDIDAS)
+        self.en_curso = 0
+        self.pico = 0
+        self.llamadas = 0
+        self.fallidas = 0
+        self.limitadas = 0
+        self.bytes = 0
+
+    def _azar(self, *partes):
+        """Número en [0, 1) que sólo depende de la semilla y de `partes`."""
+        h = hashlib.blake2b(repr((self.semilla,) + partes).encode('utf-8'), digest_size=8)
+        return int.from_bytes(h.digest(), 'big') / 2 ** 64
+
+    def tramas(self, texto):
+        """Tramas de audio que corresponden a `texto` hablado a `cps` caracteres/s."""
+        return max(1, round(len(texto) / self.cps / _SEGUNDOS_TRAMA))
+
+    def _admitir(self):
+        ahora = time.monotonic()
+        while self._recientes and ahora - self._recientes[0] >= 1.0:
+            self._recientes.popleft()
+        if (self.tasa and len(self._recientes) >= self.tasa) or \
+                (self.simultaneas and self.en_curso >= self.simultaneas):
+            self.limitadas += 1
+            raise LimitacionSimulada("Motor offline: demasiadas peticiones")
+        self._recientes.append(ahora)
+
+    async def transmitir(self, texto, voz):
+        self.llamadas += 1
+        self._admitir()
+        clave = (voz, hashlib.sha1(texto.encode('utf-8')).hexdigest())
+        intento = self._intentos.get(clave, 0)
+        self._intentos[clave] = intento + 1
+
+        self.en_curso += 1
+        self.pico = max(self.pico, self.en_curso)
+        medida = {'voz': voz, 'caracteres': len(texto), 'preparacion': 0.0,
+                  'primer_audio': None, 'transmision': 0.0, 'bytes': 0}
+        comienzo = time.perf_counter()
+        try:
+            espera = self.latencia * (1 + self.variacion * (2 * self._azar('latencia', *clave, intento) - 1))
+            await asyncio.sleep(max(0.0, espera))
+            if self._azar('error', *clave, intento) < self.errores:
+                self.fallidas += 1
+                raise ErrorSimulado("Motor offline: error simulado")
+
+            pendientes = self.tramas(texto)
+            por_trama = len(texto) / pendientes
+            while pendientes:
+                n = min(_TRAMAS_TROZO, pendientes)
+                if self.velocidad:
+                    await asyncio.sleep(n * por_trama / self.velocidad)
+                pendientes -= n
+                trozo = _TRAMA_SILENCIO * n
+                if medida['primer_audio'] is None:
+                    medida['primer_audio'] = time.perf_counter() - comienzo
+                medida['bytes'] += len(trozo)
+                self.bytes += len(trozo)
+                yield trozo
+        finally:
+            self.en_curso -= 1
+            medida['transmision'] = time.perf_counter() - comienzo
+            self._registrar(medida)
+
+    def estado(self):
+        return {
+            'motor': self.nombre,
+            'llamadas': self.llamadas,
+            'fallidas': self.fallidas,
+            'limitadas': self.limitadas,
+            'en_curso': self.en_curso,
+            'pico': self.pico,
+            'bytes': self.bytes,
+        }
+
+
+def _parametros(opciones, textos=()):
+    """Opciones 'clave=valor,...' como dict; numéricas salvo las de `textos`."""
+    parametros = {}
+    for opcion in filter(None, (o.strip() for o in opciones.split(','))):
+        clave, igual, valor = opcion.partition('=')
+        clave, valor = clave.strip(), valor.strip()
+        if not igual:
+            raise ValueError(f"Opción sin valor: {opcion}")
+        if clave in textos:
+            parametros[clave] = valor
+            continue
+        try:
+            parametros[clave] = float(valor)
+        except ValueError:
+            raise ValueError(f"Valor no numérico en {opcion}") from None
+    return parametros
+
+
+def crear_sintetizador(especificacion='edge'):
+    """Motor a partir de una especificación como 'edge', 'edge:url=ws://...' u 'offline:latencia=0.2'."""
+    nombre, _, opciones = especificacion.partition(':')
+
+    if nombre == 'edge':
+        parametros = _parametros(opciones, textos=('url',))
+        try:
+            from sesion_sintesis import SesionSintesis
+        except ImportError:
+            raise ValueError("El motor edge necesita edge-tts: pip install edge-tts --user") from None
+        fabrica = SesionSintesis
+    elif nombre == 'offline':
+        parametros = _parametros(opciones)
+        fabrica = SintetizadorOffline
+    else:
+        raise ValueError(f"Motor de síntesis desconocido: {nombre}")
+    try:
+        return fabrica(**parametros)
+    except TypeError:
+        raise ValueError(f"Opciones no válidas para {nombre}: {', '.join(parametros)}") from None
@@ -0,0 +1,81 @@
+"""
+Imitación mínima del servicio de Edge TTS
+=========================================
+Servidor WebSocket local con el protocolo que usa sesion_sintesis.py:
+speech.config una vez por conexión y, por cada SSML, turn.start, audio en
+mensajes binarios y turn.end. Cuenta conexiones y turnos, puede rechazar
+las primeras conexiones con HTTP 429 y cortar las que están abiertas.
+
+    async with ServidorEdge() as servidor:
+        sesion = SesionSintesis(url=servidor.url)
+"""
+
+import re
+
+from aiohttp import WSMsgType, web
+
+from sintetizadores import _TRAMA_SILENCIO as _TRAMA   # Una por cada 100 caracteres
+
+
+class ServidorEdge:
+    def __init__(self, rechazar=0):
+        self.rechazar = rechazar      # Conexiones a rechazar con 429
+        self.conexiones = 0
+        self.rechazadas = 0
+        self.turnos = 0
+        self.url = None
+        self._abiertas = set()
+        self._runner = None
+
+    async def _manejar(self, peticion):
+        if self.rechazadas < self.rechazar:
+            self.rechazadas += 1
+            return web.Response(status=429)
+        ws = web.WebSocketResponse()
+        await ws.prepare(peticion)
+        self.conexiones += 1
+        self._abiertas.add(ws)
+        configurada = False
+        try:
+            async for mensaje in ws:
+                if mensaje.type != WSMsgType.TEXT:
+                    continue
+                if 'Path:speech.config' in mensaje.data:
+                    configurada = True
+                    continue
+                if not configurada or 'Path:ssml' not in mensaje.data:
+                    await ws.close()
+                    break
+                await self._turno(ws, mensaje.data)
+        finally:
+            self._abiertas.discard(ws)
+        return ws
+
+    async def _turno(self, ws, datos):
+        peticion = re.search(r'X-RequestId:(\w+)', datos).group(1)
+        texto = re.sub('<[^>]+>', '', datos.split('\r\n\r\n', 1)[1])
+        await ws.send_str(f'X-RequestId:{peticion}\r\nPath:turn.start\r\n\r\n{{}}')
+        cabecera = f'X-RequestId:{peticion}\r\nContent-Type:audio/mpeg\r\nPath:audio\r\n'.encode()
+        for _ in range(max(1, len(texto) // 100)):
+            await ws.send_bytes(len(cabecera).to_bytes(2, 'big') + cabecera + _TRAMA)
+        await ws.send_str(f'X-RequestId:{peticion}\r\nPath:turn.end\r\n\r\n{{}}')
+        self.turnos += 1
+
+    async def cortar(self):
+        """Cierra desde el servidor todas las conexiones abiertas."""
+        for ws in list(self._abiertas):
+            await ws.close()
+
+    async def __aenter__(self):
+        aplicacion = web.Application()
+        aplicacion.router.add_get('/tts', self._manejar)
+        self._runner = web.AppRunner(aplicacion)
+        await self._runner.setup()
+        sitio = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await sitio.start()
+        puerto = self._runner.addresses[0][1]
+        self.url = f'ws://127.0.0.1:{puerto}/tts'
+        return self
+
+    async def __aexit__(self, *error):
+        await self._runner.cleanup()
@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from cache_audio import CacheAudio
+from limitador import LimitadorAdaptativo
+from sintesis import sintetizar_archivo
+from sintetizadores import ErrorSimulado, crear_sintetizador
+
+VOZ = 'es-ES-AlvaroNeural'
+TEXTO = 'Había una vez un libro que nadie quería leer en voz alta. ' * 10
+
+
+def _generador(motor, texto=TEXTO, generados=None):
+    async def generar(ruta):
+        if generados is not None:
+            generados.append(ruta)
+        audio = await motor.sintetizar(texto, VOZ)
+        with open(ruta, 'wb') as f:
+            f.write(audio)
+    return generar
+
+
+def test_peticiones_identicas_generan_una_vez(tmp_path):
+    cache = CacheAudio(tmp_path / 'cache')
+    motor = crear_sintetizador('offline:latencia=0.05')
+    generados = []
+
+    async def principal():
+        return await asyncio.gather(*(
+            cache.materializar(TEXTO, VOZ, str(tmp_path / f'{i}.mp3'), _generador(motor, generados=generados))
+            for i in range(5)
+        ))
+
+    resultados = asyncio.run(principal())
+    assert sorted(resultados) == [False] * 4 + [True]
+    assert len(generados) == 1 and motor.llamadas == 1
+    audios = {(tmp_path / f'{i}.mp3').read_bytes() for i in range(5)}
+    assert len(audios) == 1 and audios.pop()
+    assert cache.estado() == {'entradas': 1, 'bytes': len((tmp_path / '0.mp3').read_bytes()),
+                              'aciertos': 4, 'fallos': 1}
+
+
+def test_un_error_llega_a_los_que_esperan_y_no_se_guarda(tmp_path):
+    cache = CacheAudio(tmp_path / 'cache')
+    motor = crear_sintetizador('offline:latencia=0.05,errores=1')
+
+    async def principal():
+        return await asyncio.gather(*(
+            cache.materializar(TEXTO, VOZ, str(tmp_path / f'{i}.mp3'), _generador(motor)) for i in range(3)
+        ), return_exceptions=True)
+
+    resultados = asyncio.run(principal())
+    assert all(isinstance(r, ErrorSimulado) for r in resultados)
+    assert motor.llamadas == 1
+    assert cache.estado()['entradas'] == 0
+    assert not list((tmp_path / 'cache').glob('*/*'))   # Ni el temporal queda
+
+    # El siguiente intento vuelve a generar
+    bueno = crear_sintetizador('offline:latencia=0')
+    assert asyncio.run(cache.materializar(TEXTO, VOZ, str(tmp_path / 'x.mp3'), _generador(bueno))) is True
+
+
+def test_si_se_cancela_el_primero_genera_otro(tmp_path):
+    cache = CacheAudio(tmp_path / 'cache')
+    motor = crear_sintetizador('offline:latencia=0.2')
+
+    async def principal():
+        primera = asyncio.ensure_future(cache.materializar(TEXTO, VOZ, str(tmp_path / 'a.mp3'), _generador(motor)))
+        await asyncio.sleep(0.05)
+        segunda = asyncio.ensure_future(cache.materializar(TEXTO, VOZ, str(tmp_path / 'b.mp3'), _generador(motor)))
+        await asyncio.sleep(0.05)
+        primera.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await primera
+        return await segunda
+
+    assert asyncio.run(principal()) is True
+    assert motor.llamadas == 2
+    assert (tmp_path / 'b.mp3').stat().st_size > 0
+    assert not (tmp_path / 'a.mp3').exists()
+
+
+def test_desaloja_la_menos_usada(tmp_path):
+    motor = crear_sintetizador('offline:latencia=0')
+    textos = [f'Capítulo {n}. ' + TEXTO for n in range(3)]
+    tamano = len(asyncio.run(motor.sintetizar(textos[0], VOZ)))
+    cache = CacheAudio(tmp_path / 'cache', tamano_max=2 * tamano)
+
+    def pedir(texto):
+        return asyncio.run(cache.materializar(texto, VOZ, str(tmp_path / 'salida.mp3'), _generador(motor, texto)))
+
+    assert pedir(textos[0]) is True
+    assert pedir(textos[1]) is True
+    assert pedir(textos[0]) is False        # El acierto la pone la última en salir
+    assert pedir(textos[2]) is True         # Desaloja textos[1]
+    assert cache.estado()['entradas'] == 2
+    assert pedir(textos[0]) is False
+    assert pedir(textos[1]) is True
+
+    # Otra instancia sobre la misma carpeta ve lo que queda en disco
+    otra = CacheAudio(tmp_path / 'cache', tamano_max=2 * tamano)
+    assert otra.estado()['entradas'] == 2
+
+
+def test_sintetizar_archivo_usa_la_cache(tmp_path):
+    cache = CacheAudio(tmp_path / 'cache')
+    motor = crear_sintetizador('offline:latencia=0')
+    limitador = LimitadorAdaptativo(tasa_inicial=100, tasa_max=100)
+
+    async def sintetizar(nombre):
+        return await sintetizar_archivo(TEXTO * 5, str(tmp_path / nombre), VOZ, limitador,
+                                        tamano_max=200, cache=cache, sintetizador=motor)
+
+    assert asyncio.run(sintetizar('uno.mp3')) is True
+    llamadas = motor.llamadas
+    assert llamadas > 1                     # Un segmento por cada 200 caracteres
+    assert asyncio.run(sintetizar('dos.mp3')) is False
+    assert motor.llamadas == llamadas
+    assert (tmp_path / 'uno.mp3').read_bytes() == (tmp_path / 'dos.mp3').read_bytes()
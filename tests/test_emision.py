@@ -0,0 +1,95 @@
+import asyncio
+
+from emision import EmisionAudio
+from limitador import LimitadorAdaptativo
+from sintesis import sintetizar_archivo
+from sintetizadores import ErrorSimulado, Sintetizador, crear_sintetizador
+
+VOZ = 'es-ES-AlvaroNeural'
+TEXTO = ' '.join(f'Frase número {n} del capítulo, que se oye mientras se sintetiza.' for n in range(200))
+COLA = 20_000
+
+
+class CortaElPrimerIntento(Sintetizador):
+    """Motor offline que corta cada texto a mitad de su primera transmisión."""
+
+    def __init__(self):
+        self.motor = crear_sintetizador('offline:latencia=0.005,velocidad=50000')
+        self.cortados = set()
+
+    async def transmitir(self, texto, voz):
+        async for n, datos in _enumerar(self.motor.transmitir(texto, voz)):
+            yield datos
+            if n == 1 and texto not in self.cortados:
+                self.cortados.add(texto)
+                raise ErrorSimulado("corte a mitad del audio")
+
+
+async def _enumerar(flujo):
+    n = 0
+    async for datos in flujo:
+        yield n, datos
+        n += 1
+
+
+def _emitir(tmp_path, motor, retrasos):
+    """Sintetiza TEXTO con oyentes que llegan a destiempo; devuelve (MP3 final, lo que oyó cada uno, emisión)."""
+    destino = tmp_path / 'cap.mp3'
+    emision = EmisionAudio(cola_memoria=COLA)
+    limitador = LimitadorAdaptativo(tasa_inicial=100, tasa_min=50, tasa_max=100, espera_base=0.01)
+    cola_maxima = []
+
+    async def escribir():
+        try:
+            await sintetizar_archivo(TEXTO, str(destino), VOZ, limitador, tamano_max=800,
+                                     emision=emision, sintetizador=motor)
+        finally:
+            emision.cerrar()
+
+    async def oyente(retraso):
+        await asyncio.sleep(retraso)
+        audio = bytearray()
+        async for trozo in emision.leer(respaldo=destino):
+            audio.extend(trozo)
+            cola_maxima.append(sum(map(len, emision._cola)))
+        return bytes(audio)
+
+    async def principal():
+        _, *oidos = await asyncio.gather(escribir(), *(oyente(r) for r in retrasos))
+        return oidos
+
+    oidos = asyncio.run(principal())
+    assert max(cola_maxima, default=0) <= COLA
+    return destino.read_bytes(), oidos, emision
+
+
+def test_oyentes_tardios_leen_del_disco(tmp_path):
+    motor = crear_sintetizador('offline:latencia=0.005,velocidad=50000')
+    final, oidos, emision = _emitir(tmp_path, motor, [0, 0.05, 0.2, 0.5, 1.5])
+    assert len(final) > 10 * COLA
+    assert all(oido == final for oido in oidos)
+    assert emision.bytes == len(final)
+
+
+def test_un_corte_a_mitad_de_segmento_se_rebobina(tmp_path):
+    referencia, _, _ = _emitir(tmp_path, crear_sintetizador('offline:latencia=0.005,velocidad=50000'), [])
+    motor = CortaElPrimerIntento()
+    final, oidos, _ = _emitir(tmp_path, motor, [0, 0.1, 1])
+    assert motor.cortados
+    assert final == referencia
+    assert all(oido == final for oido in oidos)
+
+
+def test_rebobinar():
+    emision = EmisionAudio(cola_memoria=10)
+
+    async def leer():
+        return b''.join([t async for t in emision.leer()])
+
+    for trozo in (b'abcd', b'efgh', b'ijkl'):
+        emision.escribir(trozo)
+    emision.rebobinar(6)
+    emision.escribir(b'XYZ')
+    emision.cerrar()
+    # Sin archivo de volcado todo queda en memoria
+    assert asyncio.run(leer()) == b'abcdefXYZ'
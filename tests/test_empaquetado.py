@@ -0,0 +1,81 @@
+import io
+import os
+import struct
+import zipfile
+import zlib
+
+from empaquetado import zip_en_flujo
+
+
+def _zip(archivos, tamano_bloque=7):
+    return b''.join(zip_en_flujo(archivos, tamano_bloque))
+
+
+def _cabeceras_locales(datos):
+    """Recorre el ZIP desde el principio, como un lector en flujo, sin mirar el directorio central."""
+    cabeceras = []
+    pos = 0
+    while datos[pos:pos + 4] == b'PK\x03\x04':
+        _, _, banderas, metodo, _, _, crc, comprimido, tamano, largo_nombre, largo_extra = \
+            struct.unpack_from('<IHHHHHIIIHH', datos, pos)
+        inicio = pos + 30 + largo_nombre + largo_extra
+        nombre = datos[pos + 30:pos + 30 + largo_nombre].decode('utf-8')
+        cabeceras.append((nombre, banderas, metodo, crc, comprimido, tamano, datos[inicio:inicio + tamano]))
+        pos = inicio + tamano
+    return cabeceras
+
+
+def test_zip_valido_en_bloques(tmp_path):
+    contenidos = {'001_capítulo uno.mp3': os.urandom(1000), '002_vacío.mp3': b'', '003_fin.mp3': b'ID3' * 50}
+    archivos = []
+    for nombre, datos in contenidos.items():
+        ruta = tmp_path / nombre
+        ruta.write_bytes(datos)
+        archivos.append((nombre, ruta))
+
+    datos = _zip(archivos)
+    with zipfile.ZipFile(io.BytesIO(datos)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == list(contenidos)
+        for info in zf.infolist():
+            assert info.compress_type == zipfile.ZIP_STORED
+            assert zf.read(info) == contenidos[info.filename]
+
+
+def test_cabeceras_locales_completas(tmp_path):
+    ruta = tmp_path / 'a.mp3'
+    ruta.write_bytes(b'audio' * 300)
+
+    cabeceras = _cabeceras_locales(_zip([('uno.mp3', ruta), ('dos.mp3', ruta)]))
+    assert [c[0] for c in cabeceras] == ['uno.mp3', 'dos.mp3']
+    for nombre, banderas, metodo, crc, comprimido, tamano, datos in cabeceras:
+        assert not banderas & 0x08               # Sin descriptor de datos
+        assert banderas & 0x800                  # Nombre en UTF-8
+        assert metodo == 0
+        assert comprimido == tamano == 1500
+        assert crc == zlib.crc32(datos) and datos == b'audio' * 300
+
+
+def test_omite_los_que_desaparecen(tmp_path):
+    ruta = tmp_path / 'a.mp3'
+    ruta.write_bytes(b'x')
+    with zipfile.ZipFile(io.BytesIO(_zip([('a.mp3', ruta), ('b.mp3', tmp_path / 'no_existe.mp3')]))) as zf:
+        assert zf.namelist() == ['a.mp3']
+
+
+def test_fechas_fuera_del_rango_dos(tmp_path):
+    antigua = tmp_path / 'antigua.mp3'
+    antigua.write_bytes(b'x')
+    os.utime(antigua, (0, 0))
+    with zipfile.ZipFile(io.BytesIO(_zip([('antigua.mp3', antigua)]))) as zf:
+        assert zf.infolist()[0].date_time == (1980, 1, 1, 0, 0, 0)
+
+
+def test_zip64_con_muchas_entradas(tmp_path):
+    ruta = tmp_path / 'a.mp3'
+    ruta.write_bytes(b'')
+    total = 0x10000
+    with zipfile.ZipFile(io.BytesIO(_zip(((f'{n:05d}.mp3', ruta) for n in range(total)), 1024))) as zf:
+        nombres = zf.namelist()
+    assert len(nombres) == total
+    assert nombres[-1] == f'{total - 1:05d}.mp3'
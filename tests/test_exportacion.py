@@ -0,0 +1,119 @@
+import asyncio
+import struct
+
+import pytest
+
+from exportacion import ErrorExportacion, analizar_mp3, etiqueta_capitulos, exportar_mp3
+from sintetizadores import crear_sintetizador
+
+VOZ = 'es-ES-AlvaroNeural'
+SEGUNDOS_TRAMA = 576 / 24000
+
+
+def _tramas_id3(datos):
+    """{identificador: [contenidos]} de una etiqueta ID3v2.3 al principio de `datos`."""
+    assert datos[:5] == b'ID3\x03\x00'
+    t = datos[6:10]
+    fin = 10 + ((t[0] << 21) | (t[1] << 14) | (t[2] << 7) | t[3])
+    tramas = {}
+    pos = 10
+    while pos < fin:
+        identificador = datos[pos:pos + 4].decode('ascii')
+        largo = struct.unpack('>I', datos[pos + 4:pos + 8])[0]
+        tramas.setdefault(identificador, []).append(datos[pos + 10:pos + 10 + largo])
+        pos += 10 + largo
+    assert pos == fin
+    return tramas, fin
+
+
+def _cadena(cuerpo):
+    assert cuerpo[0] == 1                      # UTF-16 con BOM
+    return cuerpo[1:].decode('utf-16')
+
+
+def _texto(trama):
+    """Texto de una trama TIT2 completa (con su cabecera), como las que van dentro de CHAP y CTOC."""
+    assert trama[:4] == b'TIT2'
+    largo = struct.unpack('>I', trama[4:8])[0]
+    return _cadena(trama[10:10 + largo])
+
+
+def _chap(contenido):
+    elemento, _, resto = contenido.partition(b'\x00')
+    inicio, fin, desde, hasta = struct.unpack('>IIII', resto[:16])
+    assert (desde, hasta) == (0xFFFFFFFF, 0xFFFFFFFF)
+    return elemento.decode('latin-1'), inicio, fin, _texto(resto[16:])
+
+
+def _ctoc(contenido):
+    elemento, _, resto = contenido.partition(b'\x00')
+    banderas, n = resto[0], resto[1]
+    hijos = resto[2:].split(b'\x00')[:n]
+    return elemento.decode('latin-1'), banderas, [h.decode('latin-1') for h in hijos]
+
+
+def _capitulos_offline(carpeta, textos):
+    motor = crear_sintetizador('offline:latencia=0')
+    capitulos = []
+    for n, (titulo, texto) in enumerate(textos):
+        ruta = carpeta / f'{n:03d}.mp3'
+        ruta.write_bytes(asyncio.run(motor.sintetizar(texto, VOZ)))
+        capitulos.append((titulo, ruta, motor.tramas(texto)))
+    return capitulos
+
+
+def test_exporta_con_marcas_de_capitulo(tmp_path):
+    capitulos = _capitulos_offline(tmp_path, [
+        ('Prólogo', 'Érase una vez. ' * 40),
+        ('Capítulo 1 — El viaje', 'Salieron de noche. ' * 150),
+        ('Epílogo', 'Fin. ' * 10),
+    ])
+    destino = tmp_path / 'libro.mp3'
+    marcas = exportar_mp3([(t, str(r)) for t, r, _ in capitulos], str(destino), titulo='Mi libro')
+
+    posicion = 0.0
+    for marca, (titulo, _, tramas) in zip(marcas, capitulos):
+        assert marca['titulo'] == titulo
+        assert marca['inicio'] == pytest.approx(posicion)
+        posicion += tramas * SEGUNDOS_TRAMA
+        assert marca['fin'] == pytest.approx(posicion)
+
+    datos = destino.read_bytes()
+    tramas, fin_etiqueta = _tramas_id3(datos)
+    assert _cadena(tramas['TIT2'][0]) == 'Mi libro'
+    assert _ctoc(tramas['CTOC'][0]) == ('toc', 0x03, ['chp0', 'chp1', 'chp2'])
+    chaps = [_chap(c) for c in tramas['CHAP']]
+    assert [c[3] for c in chaps] == [t for t, _, _ in capitulos]
+    assert [c[1] for c in chaps] == [int(round(m['inicio'] * 1000)) for m in marcas]
+    assert [c[2] for c in chaps] == [int(round(m['fin'] * 1000)) for m in marcas]
+
+    # El audio es la concatenación exacta de las tramas de cada capítulo
+    audio = b''.join(r.read_bytes() for _, r, _ in capitulos)
+    assert datos[fin_etiqueta:] == audio
+    inicio, fin, segundos = analizar_mp3(str(destino))
+    assert (inicio, fin) == (fin_etiqueta, len(datos))
+    assert segundos == pytest.approx(posicion)
+    assert not list(tmp_path.glob('*.part'))
+
+
+def test_mas_de_255_capitulos():
+    marcas = [{'titulo': f'Capítulo {n}', 'inicio': n, 'fin': n + 1} for n in range(300)]
+    tramas, _ = _tramas_id3(etiqueta_capitulos(None, marcas))
+    assert 'TIT2' not in tramas
+    raiz, *hijos = [_ctoc(c) for c in tramas['CTOC']]
+    assert raiz == ('toc', 0x03, ['toc0', 'toc1'])
+    assert [h[0] for h in hijos] == ['toc0', 'toc1']
+    assert all(h[1] == 0x01 for h in hijos)
+    assert hijos[0][2] + hijos[1][2] == [f'chp{n}' for n in range(300)]
+    assert len(hijos[0][2]) == 255
+    assert _chap(tramas['CHAP'][299]) == ('chp299', 299000, 300000, 'Capítulo 299')
+
+
+def test_rechaza_lo_que_no_es_mp3(tmp_path):
+    ruta = tmp_path / 'falso.mp3'
+    ruta.write_bytes(b'no es audio' * 100)
+    with pytest.raises(ErrorExportacion):
+        exportar_mp3([('Uno', str(ruta))], str(tmp_path / 'libro.mp3'))
+    with pytest.raises(ErrorExportacion):
+        exportar_mp3([], str(tmp_path / 'libro.mp3'))
+    assert not list(tmp_path.glob('libro.mp3*'))
@@ -0,0 +1,69 @@
+import zipfile
+
+from extraccion import extraer_epub, iterar_epub
+from libros_sinteticos import escribir_epub
+
+_CONTENEDOR = ('<?xml version="1.0"?><container version="1.0" '
+               'xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+               '<rootfile full-path="content.opf" media-type="application/oebps-package+xml"/>'
+               '</rootfiles></container>')
+
+
+def _xhtml(cuerpo):
+    return ('<?xml version="1.0"?><html xmlns="http://www.w3.org/1999/xhtml" '
+            f'xmlns:epub="http://www.idpf.org/2007/ops"><body>{cuerpo}</body></html>')
+
+
+def _epub(ruta, indice, documentos):
+    """EPUB 3 mínimo: `indice` [(href, título)] y `documentos` {nombre: cuerpo} en orden de spine."""
+    enlaces = ''.join(f'<li><a href="{href}">{titulo}</a></li>' for href, titulo in indice)
+    items = ''.join(f'<item id="d{n}" href="{nombre}" media-type="application/xhtml+xml"/>'
+                    for n, nombre in enumerate(documentos))
+    spine = ''.join(f'<itemref idref="d{n}"/>' for n in range(len(documentos)))
+    with zipfile.ZipFile(ruta, 'w') as zf:
+        zf.writestr('mimetype', 'application/epub+zip')
+        zf.writestr('META-INF/container.xml', _CONTENEDOR)
+        zf.writestr('content.opf', (
+            '<?xml version="1.0"?><package xmlns="http://www.idpf.org/2007/opf" version="3.0"><manifest>'
+            '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+            f'{items}</manifest><spine>{spine}</spine></package>'))
+        zf.writestr('nav.xhtml', _xhtml(f'<nav epub:type="toc"><ol>{enlaces}</ol></nav>'))
+        for nombre, cuerpo in documentos.items():
+            zf.writestr(nombre, _xhtml(cuerpo))
+    return str(ruta)
+
+
+def test_un_capitulo_por_documento(tmp_path):
+    ruta = tmp_path / 'libro.epub'
+    escribir_epub(str(ruta), 50_000, 6, ('es', 'en'))
+    texto, secciones = extraer_epub(str(ruta))
+    assert len(secciones) == 6
+    assert secciones[0]['titulo'] == 'Capítulo 1'
+    assert all(texto[s['inicio']:s['fin']].strip() for s in secciones)
+
+
+def test_parte_los_documentos_en_las_anclas_del_indice(tmp_path):
+    ruta = _epub(tmp_path / 'libro.epub', [
+        ('a.xhtml#c1', 'Uno'), ('a.xhtml#c2', 'Dos'), ('a.xhtml#c3', 'Tres'), ('b.xhtml#no_existe', 'Cuatro'),
+    ], {
+        'a.xhtml': ('<p>Prólogo sin título</p><h2 id="c1">Uno</h2><p>texto uno</p>'
+                    '<section id="c2"><h2>Dos</h2><p>texto dos</p></section><p><a name="c3"/>texto tres</p>'),
+        'b.xhtml': '<h1>Cuatro</h1><p>texto cuatro</p>',
+    })
+    assert list(iterar_epub(ruta)) == [
+        (None, 'Prólogo sin título'),
+        ('Uno', 'Uno\n\ntexto uno'),
+        ('Dos', 'Dos\n\ntexto dos'),
+        ('Tres', 'texto tres'),
+        ('Cuatro', 'Cuatro\n\ntexto cuatro'),   # Fragmento que no está: titula el documento
+    ]
+
+
+def test_documentos_fuera_del_indice_siguen_al_anterior(tmp_path):
+    ruta = _epub(tmp_path / 'libro.epub', [('portada.xhtml', 'Portada'), ('a.xhtml', 'Uno')], {
+        'portada.xhtml': '<div><img src="portada.jpg"/></div>',
+        'a.xhtml': '<p>primera mitad</p>',
+        'a2.xhtml': '<p>segunda mitad</p>',
+    })
+    # La portada sin texto pasa su título al siguiente, que ya tiene el suyo
+    assert list(iterar_epub(ruta)) == [('Uno', 'primera mitad\n\nsegunda mitad')]
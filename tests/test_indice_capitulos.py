@@ -0,0 +1,98 @@
+import random
+import re
+
+import pytest
+
+from indice_capitulos import IndiceCapitulos
+from libros_sinteticos import generar_libro
+
+
+def dividir_por_capitulos_original(texto, separador_custom=None):
+    """La división que hacía app.py antes del índice, como referencia."""
+    if separador_custom and separador_custom.strip():
+        sep = separador_custom.strip()
+        matches = list(re.finditer(f'({re.escape(sep)})', texto))
+    else:
+        patron = r'(CAP[IÍ]TULO\s+\d+|CHAPTER\s+\d+|PARTE\s+\d+|SECCI[OÓ]N\s+\d+|Cap[ií]tulo\s+\d+|Chapter\s+\d+|Parte\s+\d+)'
+        matches = list(re.finditer(patron, texto, re.IGNORECASE))
+
+    if not matches:
+        texto_limpio = texto.strip()
+        chunks = [(f"parte_{(i // 5000) + 1:03d}", texto_limpio[i:i + 5000])
+                  for i in range(0, len(texto_limpio), 5000)]
+        return chunks if chunks else [("completo", texto)]
+
+    capitulos = []
+    for i, match in enumerate(matches):
+        nombre_original = match.group(1).strip()
+        fin = matches[i + 1].start() if i + 1 < len(matches) else len(texto)
+        contenido = texto[match.end():fin].strip()
+        nombre_limpio = re.sub(r'[^\w\s]', '', nombre_original).replace(' ', '_').lower()
+        num_match = re.search(r'\d+', nombre_original)
+        num_cap = num_match.group() if num_match else str(i + 1)
+        capitulos.append({
+            'id': i,
+            'nombre': nombre_limpio if nombre_limpio else f'parte_{i+1}',
+            'titulo': f"Parte {i+1}" if separador_custom else f"Capítulo {num_cap}",
+            'chars': len(contenido),
+            'contenido': contenido
+        })
+    return capitulos
+
+
+def _con_contenido(indice, capitulos):
+    return [
+        {k: v for k, v in dict(c, contenido=indice.contenido(c)).items() if k not in ('inicio', 'fin')}
+        if isinstance(c, dict) else c
+        for c in capitulos
+    ]
+
+
+TEXTO = generar_libro(80_000, 12, ('es', 'en', 'fr'), semilla=5)
+SEPARADORES = [None, '', '   ', 'Capítulo', 'Capítulo ', 'Capítulo 1', 'Chapter', 'el', 'el ', ' el',
+               'la', 'lala', 'aa', 'aaa', '.', '..', '...', '\n\n', 'no aparece nunca']
+
+
+@pytest.mark.parametrize('separador', SEPARADORES)
+def test_igual_que_la_division_original(separador):
+    indice = IndiceCapitulos(TEXTO)
+    assert _con_contenido(indice, indice.capitulos(separador)) == dividir_por_capitulos_original(TEXTO, separador)
+
+
+def test_separadores_derivados_de_otros_ya_indexados():
+    # Un mismo índice pasando por todos los separadores: los que contienen a
+    # uno ya buscado salen de sus posiciones y deben dar lo mismo
+    indice = IndiceCapitulos(TEXTO)
+    orden = SEPARADORES + list(reversed(SEPARADORES))
+    for separador in orden:
+        assert _con_contenido(indice, indice.capitulos(separador)) == \
+            dividir_por_capitulos_original(TEXTO, separador), separador
+
+
+def test_separadores_que_se_solapan():
+    rng = random.Random(7)
+    texto = ''.join(rng.choice('ab \n') for _ in range(5000))
+    indice = IndiceCapitulos(texto)
+    for separador in ['a', 'ab', 'aba', 'abab', 'ababa', 'b', 'bab', 'ba', 'aa', 'aaa', 'a a']:
+        assert _con_contenido(indice, indice.capitulos(separador)) == \
+            dividir_por_capitulos_original(texto, separador), separador
+
+
+@pytest.mark.parametrize('texto', ['', '   \n ', 'texto corto sin capítulos', 'x' * 12_001])
+def test_sin_capitulos(texto):
+    indice = IndiceCapitulos(texto)
+    assert indice.capitulos() == dividir_por_capitulos_original(texto)
+
+
+def test_secciones_del_epub():
+    texto = 'Uno\n\nTexto uno.\n\nDos\n\nTexto dos.\n\nUno\n\nOtra vez.'
+    secciones = [{'titulo': 'Uno', 'inicio': 0, 'fin': 15},
+                 {'titulo': 'Dos', 'inicio': 17, 'fin': 32},
+                 {'titulo': 'Uno', 'inicio': 34, 'fin': len(texto)}]
+    indice = IndiceCapitulos(texto, secciones)
+    capitulos = indice.capitulos()
+    assert [c['titulo'] for c in capitulos] == ['Uno', 'Dos', 'Uno (2)']
+    assert [c['nombre'] for c in capitulos] == ['uno', 'dos', 'uno_2']
+    assert indice.contenido(capitulos[1]) == texto[17:32]
+    # Un separador explícito ignora las secciones
+    assert _con_contenido(indice, indice.capitulos('Texto')) == dividir_por_capitulos_original(texto, 'Texto')
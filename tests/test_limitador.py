@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+import pytest
+
+from limitador import LimitadorAdaptativo
+from sintetizadores import ErrorSimulado, crear_sintetizador
+
+VOZ = 'es-ES-AlvaroNeural'
+
+
+def test_tasas_no_validas():
+    with pytest.raises(ValueError):
+        LimitadorAdaptativo(tasa_min=0)
+    with pytest.raises(ValueError):
+        LimitadorAdaptativo(tasa_min=2, tasa_max=1)
+    assert LimitadorAdaptativo(tasa_inicial=50, tasa_max=4).tasa == 4
+    assert LimitadorAdaptativo(tasa_inicial=0.001, tasa_min=0.5).tasa == 0.5
+
+
+def test_aimd():
+    limitador = LimitadorAdaptativo(tasa_inicial=1.0, tasa_min=0.2, tasa_max=1.5, incremento=0.5)
+    limitador.registrar_exito()
+    assert limitador.tasa == pytest.approx(1.5)
+    limitador.registrar_exito()
+    assert limitador.tasa == 1.5                    # No pasa de la máxima
+    limitador.registrar_limitacion()
+    assert limitador.tasa == pytest.approx(0.75)    # Se reduce a la mitad
+    for _ in range(5):
+        limitador.registrar_limitacion()
+    assert limitador.tasa == 0.2                    # Ni baja de la mínima
+    assert limitador.estado() == {'tasa': 0.2, 'reintentando': 0, 'exitos': 2, 'limitaciones': 6}
+
+
+def test_espacia_los_permisos():
+    limitador = LimitadorAdaptativo(tasa_inicial=20, tasa_max=20)
+
+    async def principal():
+        inicio = time.monotonic()
+        await asyncio.gather(*(limitador.adquirir() for _ in range(5)))
+        return time.monotonic() - inicio
+
+    # El primer permiso es inmediato y los otros cuatro llegan cada 1/20 s
+    assert asyncio.run(principal()) >= 0.18
+
+
+def test_reintenta_las_limitaciones_del_motor():
+    motor = crear_sintetizador('offline:latencia=0,tasa=2')
+    pausas = []
+    limitador = LimitadorAdaptativo(tasa_inicial=100, tasa_max=100, espera_base=0.3, al_pausar=pausas.append)
+
+    async def principal():
+        return await asyncio.gather(*(
+            limitador.ejecutar(lambda t=t: motor.sintetizar(t, VOZ)) for t in ('uno', 'dos', 'tres', 'cuatro')
+        ))
+
+    audios = asyncio.run(principal())
+    assert all(audios)
+    assert motor.limitadas == limitador.limitaciones > 0
+    assert limitador.exitos == 4
+    assert limitador.tasa < 100
+    # Las pausas se abren y se cierran alternando, aunque varias llamadas esperen a la vez
+    assert pausas and pausas == [True, False] * (len(pausas) // 2)
+    assert limitador.estado()['reintentando'] == 0
+
+
+def test_agota_los_reintentos():
+    motor = crear_sintetizador('offline:latencia=0,errores=1')
+    limitador = LimitadorAdaptativo(tasa_inicial=100, tasa_max=100, reintentos=2, espera_base=0.001)
+
+    with pytest.raises(ErrorSimulado):
+        asyncio.run(limitador.ejecutar(lambda: motor.sintetizar('hola', VOZ)))
+    assert motor.fallidas == 3
+    assert limitador.limitaciones == 3
+    assert limitador.exitos == 0
+
+
+def test_no_reintenta_otros_errores():
+    limitador = LimitadorAdaptativo(tasa_inicial=100, tasa_max=100, espera_base=0.001)
+    intentos = []
+
+    async def fallar():
+        intentos.append(1)
+        raise ValueError("texto no válido")
+
+    with pytest.raises(ValueError):
+        asyncio.run(limitador.ejecutar(fallar))
+    assert len(intentos) == 1
+    assert limitador.limitaciones == 0
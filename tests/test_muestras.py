@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+import pytest
+
+from bucle import BucleCompartido
+from muestras import GeneradorMuestras
+
+VOZ = 'es-ES-AlvaroNeural'
+
+
+def _generador(tmp_path, sintetizar):
+    return GeneradorMuestras(tmp_path, sintetizar, {'es': 'Hola'}, 'Hello', bucle=BucleCompartido())
+
+
+def test_solo_cuenta_las_generadas(tmp_path):
+    llamadas = []
+
+    async def sintetizar(texto, archivo, voz_id):
+        llamadas.append(voz_id)
+        if len(llamadas) == 1:
+            raise RuntimeError("sin conexión")
+        with open(archivo, 'wb') as f:
+            f.write(b'mp3')
+
+    generador = _generador(tmp_path, sintetizar)
+    with pytest.raises(RuntimeError):
+        generador.obtener(VOZ, timeout=5)
+    assert generador.generadas == 0
+    assert generador.obtener(VOZ, timeout=5).read_bytes() == b'mp3'
+    assert generador.generadas == 1
+    # Ya en disco: no se vuelve a generar
+    generador.obtener(VOZ, timeout=5)
+    assert (len(llamadas), generador.generadas) == (2, 1)
+
+
+def test_una_generacion_cancelada_no_deja_esperando(tmp_path):
+    async def sintetizar(texto, archivo, voz_id):
+        await asyncio.sleep(60)
+
+    generador = _generador(tmp_path, sintetizar)
+    futuro = generador._lanzar(VOZ)
+    time.sleep(0.1)
+    loop = generador.bucle.obtener()
+    loop.call_soon_threadsafe(lambda: [t.cancel() for t in asyncio.all_tasks(loop)])
+    with pytest.raises(asyncio.CancelledError):
+        futuro.result(timeout=5)
+    assert generador.generadas == 0
+    assert VOZ not in generador._en_vuelo
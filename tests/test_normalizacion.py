@@ -0,0 +1,58 @@
+import random
+import re
+
+import pytest
+
+from libros_sinteticos import VOCABULARIO, generar_libro
+from normalizacion import Normalizador, idioma_de_voz, normalizador, normalizar
+
+
+def limpiar_texto_original(texto):
+    """La limpieza que hacía app.py antes del normalizador, como referencia."""
+    texto = re.sub(r'\n{3,}', '\n\n', texto)
+    texto = re.sub(r'[—–]', ', ', texto)
+    texto = re.sub(r'[^\w\s.,;:!?¿¡\'\"()áéíóúüñÁÉÍÓÚÜÑ\-]', ' ', texto)
+    return re.sub(r' +', ' ', texto).strip()
+
+
+# Letras, signos conservados y descartados, guiones y espacios de todo tipo
+_ALFABETO = ("abcñáü ZÑ09_ .,;:!?¿¡'\"()-—–«»“”…*#@/&%[]{}<>|~^`$€ "
+             "\n\n\n\t\r\x0b\x0c\u00a0\u2009\u3000\u200b\ufeff 日本語 ¼²٣ 😀")
+
+
+def _textos_aleatorios(n, semilla=0):
+    rng = random.Random(semilla)
+    for _ in range(n):
+        yield ''.join(rng.choice(_ALFABETO) for _ in range(rng.randint(0, 300)))
+
+
+@pytest.mark.parametrize('idiomas', [('es',), ('en', 'fr', 'de'), ('ru', 'ja'), tuple(VOCABULARIO)])
+def test_igual_que_la_limpieza_original_en_libros(idiomas):
+    texto = generar_libro(60_000, 5, idiomas, semilla=3)
+    assert normalizar(texto, 'es') == limpiar_texto_original(texto)
+
+
+def test_igual_que_la_limpieza_original_en_textos_aleatorios():
+    normalizador_es = Normalizador()
+    for texto in _textos_aleatorios(3000):
+        assert normalizador_es(texto) == limpiar_texto_original(texto), repr(texto)
+
+
+def test_las_rachas_memorizadas_no_cambian_el_resultado():
+    normalizador_es = Normalizador()
+    textos = list(_textos_aleatorios(200, semilla=1))
+    primera = [normalizador_es(t) for t in textos]
+    assert [normalizador_es(t) for t in textos] == primera
+
+
+def test_reglas_por_idioma():
+    assert normalizar('«Bonjour» — dit-il…', 'fr') == '«Bonjour» , dit-il…'
+    assert normalizar('«Bonjour» — dit-il…', 'es') == 'Bonjour , dit-il'
+    assert normalizar('こんにちは、世界。', 'ja') == 'こんにちは、世界。'
+    assert normalizar('こんにちは、世界。', 'es') == 'こんにちは 世界'
+    assert normalizador('xx') is normalizador('es')
+
+
+def test_idioma_de_voz():
+    assert idioma_de_voz('es-MX-JorgeNeural') == 'es'
+    assert idioma_de_voz('fr-FR-DeniseNeural') == 'fr'
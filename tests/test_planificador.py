@@ -0,0 +1,70 @@
+from planificador import Planificador
+
+
+def _turnos(planificador, peticiones):
+    """Pide un turno por cada cliente de `peticiones` y devuelve [(cliente, Future)]."""
+    return [(cliente, planificador.pedir_turno(cliente)) for cliente in peticiones]
+
+
+def _rueda(planificador, turnos):
+    """Libera huecos de uno en uno y devuelve el orden en que se conceden los turnos."""
+    orden = []
+    pendientes = [t for t in turnos if not t[1].done()]
+    while pendientes:
+        planificador.liberar_turno()
+        concedidos = [t for t in pendientes if t[1].done()]
+        assert len(concedidos) == 1
+        orden.append(concedidos[0][0])
+        pendientes.remove(concedidos[0])
+    return orden
+
+
+def test_trabajos_en_cola_fifo():
+    planificador = Planificador(max_trabajos=2)
+    lanzados = []
+    for job_id in 'abcd':
+        planificador.encolar(job_id, lambda j=job_id: lanzados.append(j))
+    assert lanzados == ['a', 'b']
+    assert planificador.posicion('c') == 1 and planificador.posicion('d') == 2
+    assert planificador.posicion('a') is None
+    assert planificador.ocupado()
+
+    planificador.terminar('b')
+    assert lanzados == ['a', 'b', 'c']
+    assert planificador.posicion('d') == 1
+    for job_id in 'acd':
+        planificador.terminar(job_id)
+    assert lanzados == ['a', 'b', 'c', 'd']
+    assert not planificador.ocupado()
+    assert planificador.estado()['corriendo'] == 0
+
+
+def test_turnos_libres_sin_esperar():
+    planificador = Planificador(max_capitulos=2)
+    turnos = _turnos(planificador, ['a', 'a', 'a'])
+    assert [f.done() for _, f in turnos] == [True, True, False]
+    assert planificador.estado()['capitulos_libres'] == 0
+
+
+def test_turno_rotatorio_entre_clientes():
+    planificador = Planificador(max_capitulos=1)
+    ocupado = planificador.pedir_turno('libro_largo')
+    assert ocupado.done()
+
+    # Un cliente con muchos capítulos pedidos antes no acapara los huecos
+    turnos = _turnos(planificador, ['libro_largo'] * 4 + ['b', 'b', 'c'])
+    assert _rueda(planificador, turnos) == [
+        'libro_largo', 'b', 'c', 'libro_largo', 'b', 'libro_largo', 'libro_largo'
+    ]
+
+
+def test_un_turno_cancelado_no_gasta_el_hueco():
+    planificador = Planificador(max_capitulos=1)
+    planificador.pedir_turno('a')
+    (_, cancelado), (_, siguiente) = _turnos(planificador, ['b', 'c'])
+    assert cancelado.cancel()
+
+    planificador.liberar_turno()
+    assert siguiente.done() and not siguiente.cancelled()
+    assert planificador.estado() == {'en_cola': 0, 'corriendo': 0, 'capitulos_libres': 0,
+                                     'clientes_esperando': 0}
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from limitador import LimitadorAdaptativo
+from sintetizadores import Limitacion, crear_sintetizador
+from servidor_edge import ServidorEdge
+
+VOZ = 'es-ES-AlvaroNeural'
+TEXTO = 'Hola mundo, esto es una prueba. ' * 20
+
+
+def _ejecutar(prueba, **opciones):
+    """Corre prueba(servidor, sesion) contra un ServidorEdge y devuelve (servidor, sesion, resultado)."""
+    async def principal():
+        async with ServidorEdge(**opciones) as servidor:
+            sesion = crear_sintetizador(f'edge:url={servidor.url}')
+            try:
+                resultado = await prueba(servidor, sesion)
+            finally:
+                await sesion.cerrar()
+        return servidor, sesion, resultado
+    return asyncio.run(principal())
+
+
+def test_url_desde_la_especificacion():
+    sesion = crear_sintetizador('edge:url=ws://127.0.0.1:1/tts,max_libres=2')
+    assert sesion.url == 'ws://127.0.0.1:1/tts'
+    assert sesion.max_libres == 2
+    with pytest.raises(ValueError):
+        crear_sintetizador('edge:max_libres=muchas')
+    with pytest.raises(ValueError):
+        crear_sintetizador('edge:puerto=5')
+
+
+def test_reutiliza_la_conexion():
+    async def prueba(servidor, sesion):
+        return [await sesion.sintetizar(TEXTO, VOZ) for _ in range(5)]
+
+    servidor, sesion, audios = _ejecutar(prueba)
+    assert all(audios)
+    assert servidor.conexiones == 1
+    assert servidor.turnos == 5
+    assert sesion.estado()['reutilizadas'] == 4
+
+
+def test_llamadas_simultaneas_abren_conexiones_y_las_guardan():
+    async def prueba(servidor, sesion):
+        await asyncio.gather(*(sesion.sintetizar(TEXTO, VOZ) for _ in range(3)))
+        await sesion.sintetizar(TEXTO, VOZ)
+
+    servidor, sesion, _ = _ejecutar(prueba)
+    assert servidor.conexiones == 3
+    assert sesion.estado()['libres'] == 0   # cerrar() las suelta
+
+
+def test_reconecta_si_el_servidor_corta():
+    async def prueba(servidor, sesion):
+        primero = await sesion.sintetizar(TEXTO, VOZ)
+        await servidor.cortar()
+        segundo = await sesion.sintetizar(TEXTO, VOZ)
+        return primero, segundo
+
+    servidor, sesion, (primero, segundo) = _ejecutar(prueba)
+    assert primero == segundo
+    assert servidor.conexiones == 2
+    assert sesion.medidas[-1]['reutilizada'] is False
+
+
+def test_429_es_una_limitacion():
+    async def prueba(servidor, sesion):
+        with pytest.raises(Limitacion):
+            await sesion.sintetizar(TEXTO, VOZ)
+
+    servidor, _, _ = _ejecutar(prueba, rechazar=1)
+    assert servidor.rechazadas == 1
+    assert servidor.conexiones == 0
+
+
+def test_el_limitador_reintenta_tras_un_429():
+    limitador = LimitadorAdaptativo(tasa_inicial=100, tasa_max=100, espera_base=0.01)
+
+    async def prueba(servidor, sesion):
+        return await limitador.ejecutar(lambda: sesion.sintetizar(TEXTO, VOZ))
+
+    servidor, _, audio = _ejecutar(prueba, rechazar=2)
+    assert audio
+    assert servidor.rechazadas == 2
+    assert limitador.limitaciones == 2
+    assert limitador.tasa < 100
+
+
+def test_no_cambia_de_loop_sin_cerrar():
+    async def principal():
+        async with ServidorEdge() as servidor:
+            sesion = crear_sintetizador(f'edge:url={servidor.url}')
+            await sesion.sintetizar(TEXTO, VOZ)
+            # Otro loop (en otro hilo) no puede heredar la sesión abierta
+            otro = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: asyncio.run(_intentar(sesion)))
+            await sesion.cerrar()
+            despues = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: asyncio.run(_intentar(sesion)))
+        return otro, despues
+
+    async def _intentar(sesion):
+        try:
+            return bool(await sesion.sintetizar(TEXTO, VOZ))
+        except RuntimeError:
+            return 'rechazada'
+        finally:
+            if sesion._loop is asyncio.get_running_loop():
+                await sesion.cerrar()
+
+    assert asyncio.run(principal()) == ('rechazada', True)
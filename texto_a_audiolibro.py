@@ -3,20 +3,26 @@
 Conversor de Libros a Audiolibros usando Microsoft Edge TTS
 ============================================================
 Convierte archivos .txt o .pdf en audiolibros MP3 divididos por capítulos.
+Con una carpeta o un patrón (glob) convierte todos los libros en lote.
 """
 
 import asyncio
+import contextvars
+import glob
+import json
 import re
 import os
 import argparse
+import time
 from pathlib import Path
 
-try:
-    import edge_tts
-except ImportError:
-    print("❌ Error: edge-tts no está instalado.")
-    print("   Instálalo con: pip install edge-tts --user")
-    exit(1)
+import extraccion
+from cache_audio import CacheAudio
+from exportacion import exportar_mp3
+from limitador import LimitadorAdaptativo
+from normalizacion import normalizar, idioma_de_voz
+from sintesis import sintetizar_archivo
+from sintetizadores import crear_sintetizador
 
 # Voces recomendadas (masculinas por defecto)
 VOCES = {
@@ -28,42 +34,79 @@ VOCES = {
 
 VOZ_DEFECTO = "jorge"
 
+EXTENSIONES = (".txt", ".pdf")
+MARCA_COMPLETO = ".completo.json"   # En la carpeta de salida de un libro ya convertido
+TASA_MIN = 0.05   # Peticiones/s por debajo de las que el limitador no baja (salvo --tasa menor)
 
-def extraer_texto_pdf(ruta_pdf: str) -> str:
-    """Extrae texto de un archivo PDF."""
+# Medidas del motor de la síntesis en curso. Cada capítulo corre en su propia
+# tarea (con --jobs varios a la vez), así que cada uno ve sólo las suyas; las
+# tareas de sus segmentos heredan la misma lista.
+_medidas_capitulo = contextvars.ContextVar("medidas_capitulo", default=None)
+
+
+def _anotar_medida(medida: dict):
+    medidas = _medidas_capitulo.get()
+    if medidas is not None:
+        medidas.append(medida)
+
+
+# Motor de síntesis (--sintetizador); el de Edge reutiliza la conexión de capítulo en capítulo.
+# Se crea al empezar a convertir, así el motor offline no necesita edge-tts instalado.
+SINTETIZADOR_DEFECTO = os.environ.get("VOCO_SINTETIZADOR", "edge")
+sintetizador = None
+
+# Audio ya sintetizado (la misma carpeta que usa la interfaz web)
+CARPETA_CACHE = Path(__file__).parent / "cache"
+cache = None
+
+
+def usar_sintetizador(especificacion: str = SINTETIZADOR_DEFECTO):
+    """Cambia el motor de síntesis y la cache de audio que le corresponde.
+
+    Lanza ValueError si la especificación no es válida o falta edge-tts.
+    """
+    global sintetizador, cache
+    sintetizador = crear_sintetizador(especificacion)
+    sintetizador.al_medir = _anotar_medida
+    cache = CacheAudio(CARPETA_CACHE, formato=sintetizador.formato)
+
+
+def extraer_texto_pdf(ruta_pdf: str, workers: int = None) -> str:
+    """Extrae texto de un archivo PDF repartiendo las páginas entre procesos."""
     try:
-        from PyPDF2 import PdfReader
+        import PyPDF2  # noqa: F401
     except ImportError:
-        print("❌ Error: PyPDF2 no está instalado.")
-        print("   Instálalo con: pip install pypdf2 --user")
-        exit(1)
+        raise ValueError("PyPDF2 no está instalado. Instálalo con: pip install pypdf2 --user")
     
     print(f"📄 Leyendo PDF: {ruta_pdf}")
-    reader = PdfReader(ruta_pdf)
-    texto = ""
-    for i, pagina in enumerate(reader.pages):
-        texto += pagina.extract_text() or ""
-        if (i + 1) % 50 == 0:
-            print(f"   Procesadas {i + 1}/{len(reader.pages)} páginas...")
-    
-    print(f"   ✔ Total: {len(reader.pages)} páginas extraídas")
-    return texto
+    avisadas = 0
+
+    def progreso(paginas: int, total: int):
+        nonlocal avisadas
+        if paginas - avisadas >= 50 and paginas < total:
+            avisadas = paginas
+            print(f"   Procesadas {paginas}/{total} páginas...")
+        elif paginas == total:
+            print(f"   ✔ Total: {total} páginas extraídas")
 
+    return extraccion.extraer_texto_pdf(ruta_pdf, workers, progreso)
 
-def leer_archivo(ruta: str) -> str:
-    """Lee el contenido de un archivo .txt o .pdf."""
+
+def leer_archivo(ruta: str, workers: int = None) -> str:
+    """Lee el contenido de un archivo .txt o .pdf.
+
+    Un formato que no se puede leer lanza ValueError: en lote sólo falla ese libro.
+    """
     ruta = Path(ruta)
     
     if ruta.suffix.lower() == ".pdf":
-        return extraer_texto_pdf(str(ruta))
+        return extraer_texto_pdf(str(ruta), workers)
     elif ruta.suffix.lower() == ".txt":
         print(f"📄 Leyendo TXT: {ruta}")
         with open(ruta, "r", encoding="utf-8") as f:
             return f.read()
     else:
-        print(f"❌ Formato no soportado: {ruta.suffix}")
-        print("   Usa archivos .txt o .pdf")
-        exit(1)
+        raise ValueError(f"Formato no soportado: {ruta.suffix}. Usa archivos .txt o .pdf")
 
 
 def dividir_por_capitulos(texto: str) -> list[tuple[str, str]]:
@@ -107,28 +150,35 @@ def dividir_por_capitulos(texto: str) -> list[tuple[str, str]]:
     return capitulos
 
 
-def limpiar_texto_para_voz(texto: str) -> str:
-    """Limpia el texto para mejor pronunciación."""
-    # Eliminar saltos de línea múltiples
-    texto = re.sub(r'\n{3,}', '\n\n', texto)
-    
-    # Reemplazar guiones de diálogo por pausas
-    texto = re.sub(r'—', ', ', texto)
-    texto = re.sub(r'–', ', ', texto)
-    
-    # Eliminar caracteres extraños pero mantener puntuación
-    texto = re.sub(r'[^\w\s.,;:!?¿¡\'\"()áéíóúüñÁÉÍÓÚÜÑ\-]', ' ', texto)
-    
-    # Eliminar espacios múltiples
-    texto = re.sub(r' +', ' ', texto)
-    
-    return texto.strip()
+def limpiar_texto_para_voz(texto: str, idioma: str = "es") -> str:
+    """Limpia el texto para mejor pronunciación (reglas de normalizacion.py)."""
+    return normalizar(texto, idioma)
+
+
+def formatear_duracion(segundos: float) -> str:
+    """Duración legible: 45.2s, 3m 05s, 2h 07m."""
+    if segundos < 60:
+        return f"{segundos:.1f}s"
+    minutos, segundos = divmod(int(segundos), 60)
+    if minutos < 60:
+        return f"{minutos}m {segundos:02d}s"
+    horas, minutos = divmod(minutos, 60)
+    return f"{horas}h {minutos:02d}m"
 
 
-async def texto_a_audio(texto: str, archivo_salida: str, voz: str):
-    """Convierte texto a audio usando edge-tts."""
-    communicate = edge_tts.Communicate(texto, voz)
-    await communicate.save(archivo_salida)
+async def texto_a_audio(texto: str, archivo_salida: str, voz: str, limitador=None) -> list:
+    """Convierte texto a audio con el motor elegido, reutilizando la cache si ya existe.
+
+    Igual que la interfaz web (ver sintesis.py): el texto se parte en
+    segmentos que se sintetizan en paralelo, y cada uno pasa por el
+    `limitador` (su tasa y sus reintentos). Devuelve las medidas de las
+    llamadas al motor (ninguna si venía de la cache).
+    """
+    medidas = []
+    _medidas_capitulo.set(medidas)
+    await sintetizar_archivo(texto, archivo_salida, voz, limitador or crear_limitador(),
+                             cache=cache, sintetizador=sintetizador)
+    return medidas
 
 
 async def procesar_capitulo(
@@ -137,37 +187,168 @@ async def procesar_capitulo(
     contenido: str, 
     carpeta_salida: Path, 
     voz: str,
-    total_capitulos: int
+    total_capitulos: int,
+    salida: list = None,
+    limitador=None
 ):
-    """Procesa un capítulo individual."""
-    # Limpiar contenido
-    contenido_limpio = limpiar_texto_para_voz(contenido)
+    """Procesa un capítulo individual.
+
+    Devuelve (ruta del MP3, caracteres sintetizados); la ruta es None si el
+    capítulo es demasiado corto para convertirlo y False si falló.
+    Con `salida` los mensajes se guardan en esa lista en vez de imprimirse,
+    para mostrarlos en orden cuando hay varios capítulos a la vez.
+    """
+    decir = print if salida is None else salida.append
+
+    # Limpiar contenido (en un hilo, para no frenar a los otros capítulos en curso)
+    contenido_limpio = await asyncio.get_running_loop().run_in_executor(
+        None, limpiar_texto_para_voz, contenido, idioma_de_voz(voz)
+    )
     
     if len(contenido_limpio) < 50:
-        print(f"   ⚠️  Capítulo {numero} muy corto, omitiendo...")
-        return False
+        decir(f"   ⚠️  Capítulo {numero} muy corto, omitiendo...")
+        return None, 0
     
-    # Nombre del archivo de salida
+    # Nombre del archivo de salida: numerado por su posición en el libro
     archivo_salida = carpeta_salida / f"capitulo_{numero:03d}_{nombre}.mp3"
     
-    print(f"   🎙️  [{numero}/{total_capitulos}] Convirtiendo: {nombre}")
-    print(f"       Caracteres: {len(contenido_limpio):,}")
+    decir(f"   🎙️  [{numero}/{total_capitulos}] Convirtiendo: {nombre}")
+    decir(f"       Caracteres: {len(contenido_limpio):,}")
     
     try:
-        await texto_a_audio(contenido_limpio, str(archivo_salida), voz)
-        print(f"       ✔ Guardado: {archivo_salida.name}")
-        return True
+        medidas = await texto_a_audio(contenido_limpio, str(archivo_salida), voz, limitador)
+        decir(f"       ✔ Guardado: {archivo_salida.name}")
+        if medidas:
+            # Los segmentos van en paralelo: son tiempos sumados, no de reloj
+            reutilizadas = sum(1 for m in medidas if m.get("reutilizada"))
+            conexiones = f" ({reutilizadas} con conexión reutilizada)" if reutilizadas else ""
+            decir(f"       ⏱️  {len(medidas)} peticiones{conexiones}"
+                  f" · conexión {sum(m['preparacion'] for m in medidas):.2f}s"
+                  f" · síntesis {sum(m['transmision'] for m in medidas):.1f}s")
+        return archivo_salida, len(contenido_limpio)
     except Exception as e:
-        print(f"       ❌ Error: {e}")
+        decir(f"       ❌ Error: {e}")
+        return False, 0
+
+
+async def convertir_capitulos(capitulos: list, carpeta_salida: Path, voz: str, jobs: int = 1, limitador=None):
+    """Convierte los capítulos con hasta `jobs` sintetizándose a la vez.
+
+    Con `limitador` todas las llamadas al motor comparten su tasa y sus reintentos.
+
+    Los mensajes de cada capítulo se imprimen en el orden del libro, en cuanto
+    han terminado él y todos los anteriores. Devuelve ([(título, ruta)] de
+    los que se generaron, en orden, el total de caracteres sintetizados y
+    cuántos capítulos fallaron).
+    """
+    semaforo = asyncio.Semaphore(jobs)
+
+    async def convertir(numero: int, nombre: str, contenido: str):
+        async with semaforo:
+            salida = [] if jobs > 1 else None
+            resultado, caracteres = await procesar_capitulo(
+                numero, nombre, contenido, carpeta_salida, voz, len(capitulos), salida, limitador
+            )
+            return resultado, caracteres, salida or []
+
+    tareas = [
+        asyncio.ensure_future(convertir(i, nombre, contenido))
+        for i, (nombre, contenido) in enumerate(capitulos, 1)
+    ]
+    exitosos = []
+    total = 0
+    fallidos = 0
+    try:
+        for (nombre, _), tarea in zip(capitulos, tareas):
+            resultado, caracteres, salida = await tarea
+            for linea in salida:
+                print(linea)
+            if resultado:
+                exitosos.append((titulo_capitulo(nombre), resultado))
+                total += caracteres
+            elif resultado is False:
+                fallidos += 1
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+    return exitosos, total, fallidos
+
+
+def crear_limitador(tasa: float = None) -> LimitadorAdaptativo:
+    """Limitador compartido por todos los capítulos: hasta `tasa` peticiones/s si se indica.
+
+    Una tasa por debajo del mínimo del limitador pasa a ser también el mínimo.
+    """
+    if tasa:
+        return LimitadorAdaptativo(tasa_inicial=min(1.0, tasa), tasa_min=min(TASA_MIN, tasa), tasa_max=tasa)
+    return LimitadorAdaptativo()
+
+
+def titulo_capitulo(nombre: str) -> str:
+    return nombre.replace('_', ' ').capitalize()
+
+
+def carpeta_libro(ruta_entrada: Path, carpeta_salida: str = None, lote: bool = False) -> Path:
+    """Carpeta de salida de un libro. En lote, `carpeta_salida` contiene la de cada libro."""
+    if carpeta_salida and not lote:
+        return Path(carpeta_salida)
+    base = Path(carpeta_salida) if carpeta_salida else ruta_entrada.parent
+    return base / f"{ruta_entrada.stem}_audiolibro"
+
+
+def libro_completo(ruta_entrada: Path, carpeta_salida: Path, voz: str) -> bool:
+    """True si la carpeta tiene la marca de una conversión completa de este mismo archivo y voz."""
+    try:
+        with open(carpeta_salida / MARCA_COMPLETO, encoding="utf-8") as f:
+            marca = json.load(f)
+        origen = ruta_entrada.stat()
+    except (OSError, ValueError):
         return False
+    return (marca.get("tamano") == origen.st_size and marca.get("modificado") == origen.st_mtime
+            and marca.get("voz") == voz)
+
+
+def marcar_completo(ruta_entrada: Path, carpeta_salida: Path, voz: str, capitulos: int):
+    """Deja la marca de que el libro se convirtió entero (sin capítulos fallidos)."""
+    origen = ruta_entrada.stat()
+    with open(carpeta_salida / MARCA_COMPLETO, "w", encoding="utf-8") as f:
+        json.dump({
+            "archivo": ruta_entrada.name,
+            "tamano": origen.st_size,
+            "modificado": origen.st_mtime,
+            "voz": voz,
+            "capitulos": capitulos,
+        }, f, ensure_ascii=False)
+
+
+def exportar_libro(exitosos: list, carpeta_salida: Path, nombre: str):
+    """Une los capítulos generados en un único MP3 con marcas de capítulo."""
+    destino = carpeta_salida / f"{nombre}.mp3"
+    marcas = exportar_mp3(exitosos, destino, nombre)
+    horas, resto = divmod(int(marcas[-1]['fin']), 3600)
+    print(f"\n📚 Libro completo: {destino.name}")
+    print(f"   {len(marcas)} capítulos, {horas}h {resto // 60:02d}m")
 
 
 async def convertir_libro(
     ruta_entrada: str, 
     carpeta_salida: str = None, 
-    voz: str = VOZ_DEFECTO
+    voz: str = VOZ_DEFECTO,
+    workers: int = None,
+    exportar: bool = False,
+    jobs: int = 1,
+    tasa: float = None
 ):
-    """Función principal de conversión."""
+    """Función principal de conversión.
+
+    Con `exportar` se une además todo en un único MP3 con marcas de capítulo.
+    `jobs` es el número de capítulos que se sintetizan a la vez; todos
+    comparten un limitador (hasta `tasa` peticiones/s), como en lote.
+    """
+    inicio = time.perf_counter()
+    if sintetizador is None:
+        usar_sintetizador()
     ruta_entrada = Path(ruta_entrada)
     
     if not ruta_entrada.exists():
@@ -175,10 +356,7 @@ async def convertir_libro(
         return
     
     # Configurar carpeta de salida
-    if carpeta_salida:
-        carpeta_salida = Path(carpeta_salida)
-    else:
-        carpeta_salida = ruta_entrada.parent / f"{ruta_entrada.stem}_audiolibro"
+    carpeta_salida = carpeta_libro(ruta_entrada, carpeta_salida)
     
     carpeta_salida.mkdir(parents=True, exist_ok=True)
     print(f"📁 Carpeta de salida: {carpeta_salida}")
@@ -188,23 +366,180 @@ async def convertir_libro(
     print(f"🗣️  Voz seleccionada: {voz_id}")
     
     # Leer y procesar texto
-    texto = leer_archivo(str(ruta_entrada))
+    try:
+        texto = leer_archivo(str(ruta_entrada), workers)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        exit(1)
     capitulos = dividir_por_capitulos(texto)
     
     # Procesar cada capítulo
-    print("\n🎵 Iniciando conversión a audio...\n")
+    if jobs > 1:
+        print(f"\n🎵 Iniciando conversión a audio ({jobs} capítulos a la vez)...\n")
+    else:
+        print("\n🎵 Iniciando conversión a audio...\n")
     
-    exitosos = 0
-    for i, (nombre, contenido) in enumerate(capitulos, 1):
-        resultado = await procesar_capitulo(
-            i, nombre, contenido, carpeta_salida, voz_id, len(capitulos)
+    limitador = crear_limitador(tasa)
+    comienzo = time.perf_counter()
+    try:
+        exitosos, caracteres, fallidos = await convertir_capitulos(
+            capitulos, carpeta_salida, voz_id, jobs, limitador
         )
-        if resultado:
-            exitosos += 1
+    finally:
+        await sintetizador.cerrar()
+    conversion = time.perf_counter() - comienzo
     
     print(f"\n✅ Conversión completada!")
-    print(f"   Capítulos procesados: {exitosos}/{len(capitulos)}")
+    print(f"   Capítulos procesados: {len(exitosos)}/{len(capitulos)}")
+    print(f"   Caracteres: {caracteres:,} · {caracteres / max(conversion, 1e-9):,.0f} caracteres/s")
+    print(f"   Tiempo total: {formatear_duracion(time.perf_counter() - inicio)}"
+          f" (síntesis {formatear_duracion(conversion)})")
     print(f"   Ubicación: {carpeta_salida}")
+    if limitador.limitaciones:
+        print(f"   Limitador: {limitador.limitaciones} reintentos, tasa final {limitador.estado()['tasa']} pet/s")
+    if not fallidos:
+        marcar_completo(ruta_entrada, carpeta_salida, voz_id, len(capitulos))
+
+    if exportar and exitosos:
+        exportar_libro(exitosos, carpeta_salida, ruta_entrada.stem)
+
+
+def buscar_libros(patron: str) -> list:
+    """Libros (.txt/.pdf) de una carpeta o de un patrón glob, en orden alfabético."""
+    ruta = Path(patron)
+    if ruta.is_dir():
+        candidatos = ruta.iterdir()
+    else:
+        candidatos = (Path(p) for p in glob.glob(patron))
+    return sorted(p for p in candidatos if p.is_file() and p.suffix.lower() in EXTENSIONES)
+
+
+def es_lote(entrada: str) -> bool:
+    """True si la entrada es una carpeta o un patrón con comodines.
+
+    Un archivo que existe nunca es un lote, aunque su nombre tenga
+    corchetes o comodines (como «libro [1].txt»).
+    """
+    ruta = Path(entrada)
+    if ruta.is_file():
+        return False
+    return ruta.is_dir() or any(c in entrada for c in "*?[")
+
+
+async def convertir_lote(
+    libros: list,
+    carpeta_salida: str = None,
+    voz: str = VOZ_DEFECTO,
+    workers: int = None,
+    exportar: bool = False,
+    jobs: int = 1,
+    tasa: float = None
+):
+    """Convierte varios libros con una única cola de capítulos.
+
+    Los capítulos de todos los libros pasan por una cola acotada que atienden
+    `jobs` trabajadores, y todas las llamadas al motor comparten un mismo
+    limitador (hasta `tasa` peticiones/s). Un libro sólo se lee cuando hay
+    sitio en la cola, y los que ya tienen su conversión completa se omiten.
+    """
+    inicio = time.perf_counter()
+    if sintetizador is None:
+        usar_sintetizador()
+    voz_id = VOCES.get(voz.lower(), voz)
+    limitador = crear_limitador(tasa)
+    loop = asyncio.get_running_loop()
+    cola = asyncio.Queue(maxsize=jobs * 2)
+    resumen = {"convertidos": 0, "incompletos": 0, "omitidos": 0, "caracteres": 0}
+
+    print(f"📚 {len(libros)} libros · {jobs} capítulos a la vez · voz {voz_id}\n")
+
+    def leer(ruta: Path) -> list:
+        return dividir_por_capitulos(leer_archivo(str(ruta), workers))
+
+    async def terminar_libro(libro: dict):
+        # Un fallo aquí (disco lleno, permisos...) sólo afecta a este libro, no al lote
+        exitosos = [r for r in libro["resultados"] if r]
+        fallidos = libro["resultados"].count(False)
+        ruta = libro["ruta"]
+        if fallidos:
+            resumen["incompletos"] += 1
+            print(f"⚠️  {ruta.name}: {fallidos} capítulos con error, se reintentará en la próxima pasada")
+        else:
+            try:
+                marcar_completo(ruta, libro["carpeta"], voz_id, len(libro["resultados"]))
+            except OSError as e:
+                resumen["incompletos"] += 1
+                print(f"❌ {ruta.name}: no se pudo marcar como convertido ({e}), se repetirá en la próxima pasada")
+            else:
+                resumen["convertidos"] += 1
+                print(f"✅ {ruta.name}: {len(exitosos)} capítulos en {libro['carpeta']}")
+        if exportar and exitosos:
+            try:
+                await loop.run_in_executor(None, exportar_libro, exitosos, libro["carpeta"], ruta.stem)
+            except Exception as e:
+                print(f"❌ {ruta.name}: no se pudo exportar el libro completo: {e}")
+
+    async def productor():
+        for ruta in libros:
+            carpeta = carpeta_libro(ruta, carpeta_salida, lote=True)
+            if libro_completo(ruta, carpeta, voz_id):
+                resumen["omitidos"] += 1
+                print(f"⏭️  {ruta.name}: ya convertido, se omite")
+                continue
+            try:
+                capitulos = await loop.run_in_executor(None, leer, ruta)
+            except Exception as e:
+                resumen["incompletos"] += 1
+                print(f"❌ {ruta.name}: {e}")
+                continue
+            carpeta.mkdir(parents=True, exist_ok=True)
+            libro = {"ruta": ruta, "carpeta": carpeta, "resultados": [None] * len(capitulos),
+                     "pendientes": len(capitulos)}
+            for i, (nombre, contenido) in enumerate(capitulos, 1):
+                await cola.put((libro, i, nombre, contenido))
+        for _ in range(jobs):
+            await cola.put(None)
+
+    async def trabajador():
+        while True:
+            tarea = await cola.get()
+            if tarea is None:
+                return
+            libro, numero, nombre, contenido = tarea
+            salida = []
+            resultado, caracteres = await procesar_capitulo(
+                numero, nombre, contenido, libro["carpeta"], voz_id, len(libro["resultados"]),
+                salida, limitador
+            )
+            # Los mensajes de un capítulo salen juntos, bajo el nombre de su libro
+            print(f"📖 {libro['ruta'].name}")
+            for linea in salida:
+                print(linea)
+            resumen["caracteres"] += caracteres
+            libro["resultados"][numero - 1] = (titulo_capitulo(nombre), resultado) if resultado else resultado
+            libro["pendientes"] -= 1
+            if not libro["pendientes"]:
+                await terminar_libro(libro)
+
+    comienzo = time.perf_counter()
+    tareas = [asyncio.ensure_future(productor())] + [asyncio.ensure_future(trabajador()) for _ in range(jobs)]
+    try:
+        await asyncio.gather(*tareas)
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        await sintetizador.cerrar()
+    conversion = time.perf_counter() - comienzo
+
+    print(f"\n✅ Lote terminado!")
+    print(f"   Libros: {resumen['convertidos']} convertidos, {resumen['omitidos']} ya estaban,"
+          f" {resumen['incompletos']} con errores")
+    print(f"   Caracteres: {resumen['caracteres']:,} · "
+          f"{resumen['caracteres'] / max(conversion, 1e-9):,.0f} caracteres/s")
+    print(f"   Tiempo total: {formatear_duracion(time.perf_counter() - inicio)}")
+    print(f"   Limitador: {limitador.estado()['limitaciones']} reintentos, tasa final"
+          f" {limitador.estado()['tasa']} pet/s")
 
 
 def listar_voces():
@@ -225,6 +560,11 @@ Ejemplos:
   python texto_a_audiolibro.py libro.pdf
   python texto_a_audiolibro.py libro.txt --voz alonso
   python texto_a_audiolibro.py libro.pdf --salida ./mis_audiolibros
+  python texto_a_audiolibro.py libro.pdf --exportar
+  python texto_a_audiolibro.py libro.txt --jobs 4
+  python texto_a_audiolibro.py ./bandeja --jobs 8 --tasa 4
+  python texto_a_audiolibro.py "libros/*.pdf" --salida ./audiolibros
+  python texto_a_audiolibro.py libro.txt --sintetizador offline:latencia=0.5,errores=0.1
   python texto_a_audiolibro.py --voces
         """
     )
@@ -232,7 +572,7 @@ Ejemplos:
     parser.add_argument(
         "archivo", 
         nargs="?",
-        help="Archivo de entrada (.txt o .pdf)"
+        help="Archivo de entrada (.txt o .pdf), o carpeta o patrón para convertir en lote"
     )
     parser.add_argument(
         "--voz", "-v",
@@ -241,7 +581,35 @@ Ejemplos:
     )
     parser.add_argument(
         "--salida", "-o",
-        help="Carpeta de salida (defecto: [nombre]_audiolibro/)"
+        help="Carpeta de salida (defecto: [nombre]_audiolibro/). En lote, carpeta donde "
+             "se crea la de cada libro"
+    )
+    parser.add_argument(
+        "--workers", "-w",
+        type=int,
+        help="Procesos para extraer PDFs (defecto: núcleos de la CPU)"
+    )
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=1,
+        help="Capítulos que se sintetizan a la vez (defecto: 1). En lote, entre todos los libros"
+    )
+    parser.add_argument(
+        "--tasa", "-t",
+        type=float,
+        help="Máximo de peticiones por segundo al motor entre todos los capítulos (y libros, "
+             "en lote) (defecto: la del limitador adaptativo)"
+    )
+    parser.add_argument(
+        "--exportar", "-e",
+        action="store_true",
+        help="Unir además los capítulos en un solo MP3 con marcas de capítulo"
+    )
+    parser.add_argument(
+        "--sintetizador", "-s",
+        help="Motor de síntesis: edge (defecto) u offline[:latencia=0.2,errores=0.05,tasa=4,...] "
+             "para pruebas sin red"
     )
     parser.add_argument(
         "--voces",
@@ -260,15 +628,52 @@ Ejemplos:
         print("\n❌ Error: Debes especificar un archivo de entrada")
         return
     
+    if args.jobs < 1:
+        print("❌ Error: --jobs debe ser 1 o más")
+        return
+
+    if args.tasa is not None and args.tasa <= 0:
+        print("❌ Error: --tasa debe ser mayor que 0")
+        return
+
+    try:
+        usar_sintetizador(args.sintetizador or SINTETIZADOR_DEFECTO)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return
+
     print("=" * 60)
     print("🎧 CONVERSOR DE LIBROS A AUDIOLIBROS")
-    print("   Usando Microsoft Edge Neural TTS")
+    if sintetizador.nombre == "edge":
+        print("   Usando Microsoft Edge Neural TTS")
+    else:
+        print(f"   Usando el motor {sintetizador.nombre} (sin red)")
     print("=" * 60 + "\n")
     
+    if es_lote(args.archivo):
+        libros = buscar_libros(args.archivo)
+        if not libros:
+            print(f"❌ No hay libros (.txt o .pdf) en: {args.archivo}")
+            return
+        asyncio.run(convertir_lote(
+            libros,
+            args.salida,
+            args.voz,
+            args.workers,
+            args.exportar,
+            args.jobs,
+            args.tasa
+        ))
+        return
+
     asyncio.run(convertir_libro(
         args.archivo,
         args.salida,
-        args.voz
+        args.voz,
+        args.workers,
+        args.exportar,
+        args.jobs,
+        args.tasa
     ))
 
 